@@ -1,10 +1,59 @@
-"""Generate PowerPoint presentation for the smiles-js-eval study."""
+"""
+Generate PowerPoint presentation for the smiles-js-eval study.
+
+The narrative slides are fixed; the batch-results, across-models and cost slides
+are generated from results/: the per-run results/<task>_<condition>[_<tag>].json
+files (or their .cols/ copies), with results/summary[_<tag>].json layered on top
+so hf_scoring.py's bootstrap intervals show up when they exist. One results slide
+per model tag, so a nightly sweep over many models adds slides, not edits.
+
+Every slide has a content hash over what it shows plus the code that draws it,
+recorded in docs/high-heels-study.slides.json. A rerun opens the existing deck,
+keeps the slides whose hash is unchanged, rebuilds the rest, drops slides whose
+results are gone, and does not touch the deck at all when nothing changed.
+Edits to the shared helpers or palette are not hashed; use --force after those.
+
+Usage:
+  python make_pptx.py
+  python make_pptx.py --force
+"""
+
+import argparse
+import glob
+import hashlib
+import inspect
+import json
+import math
+import os
+import sys
 
 from pptx import Presentation
-from pptx.util import Inches, Pt, Emu
-from pptx.enum.text import PP_ALIGN, MSO_ANCHOR
+from pptx.chart.data import CategoryChartData
+from pptx.enum.chart import XL_CHART_TYPE, XL_LEGEND_POSITION
+from pptx.util import Inches, Pt
+from pptx.enum.text import PP_ALIGN
 from pptx.dml.color import RGBColor
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src", "eval"))
+from hf_scoring import parse_filename  # noqa: E402
+
+OUT = os.path.join("docs", "high-heels-study.pptx")
+RESULTS_DIR = "results"
+# Untagged result files predate the "model" field; they are the Sonnet 4.5 batch run.
+DEFAULT_MODEL = "Sonnet 4.5"
+
+CONDITIONS = [("smiles", "SMILES"), ("code", "Code"), ("code+relabel", "Code+Relabel")]
+# task: (row label, headline key in the JS scores, matching hf_scoring bootstrap metric)
+HEADLINES = {
+    "ring-count": ("Ring Count", "accuracy", "exactMatch"),
+    "aromatic-rings": ("Aromatic Rings", "accuracy", "exactMatch"),
+    "hbond": ("H-bond Count", "accuracy", "exactMatch"),
+    "bbbp": ("BBBP (bal. acc)", "balancedAccuracy", "balancedAccuracy"),
+    "func-group": ("Func Groups (F1)", "f1", "f1"),
+    "smiles-repair": ("SMILES Repair", "exactMatchRate", None),
+}
+COST_ROWS_PER_SLIDE = 14
+
 # ── Colour palette ──────────────────────────────────────────────────
 BG        = RGBColor(0x0D, 0x11, 0x17)   # near-black
 WHITE     = RGBColor(0xFF, 0xFF, 0xFF)
@@ -16,12 +65,6 @@ GREEN     = RGBColor(0x55, 0xFF, 0x88)
 BLUE      = RGBColor(0x55, 0x99, 0xFF)
 YELLOW    = RGBColor(0xFF, 0xDD, 0x57)
 
-prs = Presentation()
-prs.slide_width  = Inches(13.333)
-prs.slide_height = Inches(7.5)
-W = prs.slide_width
-H = prs.slide_height
-
 # ── Helpers ─────────────────────────────────────────────────────────
 def solid_bg(slide, color=BG):
     bg = slide.background
@@ -70,59 +113,162 @@ def add_table(slide, rows, cols, data, left, top, width, height, header_color=AC
             cell.fill.fore_color.rgb = RGBColor(0x1A, 0x1E, 0x24) if i == 0 else RGBColor(0x12, 0x16, 0x1C)
     return table
 
-# ── SLIDE 1: Title ──────────────────────────────────────────────────
-slide = prs.slides.add_slide(prs.slide_layouts[6])  # blank
-solid_bg(slide)
-add_text(slide, 1, 1.5, 11, 1.2, "High Heels for Haiku", size=44, bold=True, color=ACCENT, align=PP_ALIGN.CENTER)
-add_text(slide, 1, 2.8, 11, 0.8, "When does code representation help LLMs", size=24, color=WHITE, align=PP_ALIGN.CENTER)
-add_text(slide, 1, 3.4, 11, 0.8, "reason about molecules?", size=24, color=WHITE, align=PP_ALIGN.CENTER)
-add_text(slide, 1, 4.8, 11, 0.5, "smiles-js-eval  ·  15 qualitative probes  ·  Haiku", size=16, color=GREY, align=PP_ALIGN.CENTER)
-add_text(slide, 1, 5.5, 11, 0.5, "February 2026", size=14, color=GREY, align=PP_ALIGN.CENTER)
-
-# ── SLIDE 2: The Question ───────────────────────────────────────────
-slide = prs.slides.add_slide(prs.slide_layouts[6])
-solid_bg(slide)
-add_text(slide, 0.8, 0.4, 11, 0.7, "The Question", size=32, bold=True, color=ACCENT)
-tf = add_text(slide, 0.8, 1.3, 11.5, 1, "Can we help LLMs reason about chemistry by converting", size=22, color=WHITE)
-add_para(tf, "SMILES strings into composable JavaScript code?", size=22, color=YELLOW, bold=True, space_before=4)
-add_para(tf, "", size=12)
-add_para(tf, "SMILES (string):", size=16, color=GREY, space_before=16)
-add_para(tf, "  CNc1ncnc2c1ncn2Cc1ccccc1", size=18, color=RED)
-add_para(tf, "", size=8)
-add_para(tf, "smiles-js Code (tree):", size=16, color=GREY, space_before=8)
-add_para(tf, "  pyrimidine = Fragment('c1ncncc1')", size=18, color=GREEN)
-add_para(tf, "  imidazole  = Fragment('c2cncn2')", size=18, color=GREEN)
-add_para(tf, "  purine     = pyrimidine.fuse(4, imidazole)", size=18, color=GREEN)
-add_para(tf, "  benzene    = Fragment('c1ccccc1')", size=18, color=GREEN)
-add_para(tf, "  molecule   = Molecule([purine, benzene])", size=18, color=GREEN)
-
-# ── SLIDE 3: Study Design ───────────────────────────────────────────
-slide = prs.slides.add_slide(prs.slide_layouts[6])
-solid_bg(slide)
-add_text(slide, 0.8, 0.4, 11, 0.7, "Study Design", size=32, bold=True, color=ACCENT)
-tf = add_text(slide, 0.8, 1.3, 5.5, 5, "Method", size=20, bold=True, color=ACCENT2)
-add_para(tf, "", size=6)
-add_para(tf, "• Same molecule, same question", size=17, color=WHITE, space_before=8)
-add_para(tf, "• Give Haiku the SMILES string", size=17, color=WHITE, space_before=4)
-add_para(tf, "• Give Haiku the smiles-js code", size=17, color=WHITE, space_before=4)
-add_para(tf, "• Compare answers against ground truth", size=17, color=WHITE, space_before=4)
-add_para(tf, "• 15 probes × 6 task types", size=17, color=WHITE, space_before=4)
-
-tf2 = add_text(slide, 7, 1.3, 5.5, 5, "Task Types", size=20, bold=True, color=ACCENT2)
-add_para(tf2, "", size=6)
-add_para(tf2, "1. Aromatic ring counting", size=17, color=WHITE, space_before=8)
-add_para(tf2, "2. Scaffold recognition", size=17, color=WHITE, space_before=4)
-add_para(tf2, "3. Functional group detection", size=17, color=WHITE, space_before=4)
-add_para(tf2, "4. H-bond donor/acceptor counting", size=17, color=WHITE, space_before=4)
-add_para(tf2, "5. Stereocenter counting", size=17, color=WHITE, space_before=4)
-add_para(tf2, "6. Ring size discrimination", size=17, color=WHITE, space_before=4)
-
-# ── SLIDE 4: Scorecard ──────────────────────────────────────────────
-slide = prs.slides.add_slide(prs.slide_layouts[6])
-solid_bg(slide)
-add_text(slide, 0.8, 0.4, 11, 0.7, "Scorecard: Code Wins 7 – SMILES Wins 4 – Tie 4", size=30, bold=True, color=ACCENT)
-
-data = [
+def add_bar_chart(slide, categories, series, left, top, width, height):
+    """series = list of (name, values); values are fractions, None where missing."""
+    chart_data = CategoryChartData(number_format='0%')
+    chart_data.categories = categories
+    for name, values in series:
+        chart_data.add_series(name, values)
+    chart = slide.shapes.add_chart(XL_CHART_TYPE.COLUMN_CLUSTERED, Inches(left), Inches(top), Inches(width),
+                                   Inches(height), chart_data).chart
+    chart.has_legend = True
+    chart.legend.position = XL_LEGEND_POSITION.TOP
+    chart.legend.include_in_layout = False
+    chart.legend.font.color.rgb = WHITE
+    chart.category_axis.tick_labels.font.color.rgb = GREY
+    chart.category_axis.tick_labels.font.size = Pt(11)
+    chart.value_axis.tick_labels.font.color.rgb = GREY
+    chart.value_axis.maximum_scale = 1.0
+    chart.value_axis.has_major_gridlines = False
+    for plot_series, color in zip(chart.plots[0].series, [RED, GREEN, BLUE]):
+        plot_series.format.fill.solid()
+        plot_series.format.fill.fore_color.rgb = color
+    return chart
+
+# ── Results ─────────────────────────────────────────────────────────
+def load_results(results_dir=RESULTS_DIR):
+    """
+    {tag: {"model", "scores": {task: {condition: scores}}, "perf": {task: {condition: perf}}}}
+    from the run-level blocks of every result file; summary[_<tag>].json entries
+    (which carry hf_scoring's "bootstrap" blocks) override the per-file scores.
+    Columnar results are read from their meta.json only.
+    """
+    runs = {}
+    paths = sorted(glob.glob(os.path.join(results_dir, "*.json")))
+    paths += [p for p in sorted(glob.glob(os.path.join(results_dir, "*.cols"))) if p[:-len(".cols")] + ".json" not in paths]
+    summaries = {}
+    for path in paths:
+        name = os.path.basename(path)
+        if name == "summary.json" or name.startswith("summary_"):
+            summaries[os.path.splitext(name)[0][len("summary_"):]] = path
+            continue
+        parsed = parse_filename(path)
+        if parsed is None or parsed[0] not in HEADLINES:
+            continue
+        task, condition, tag = parsed
+        with open(os.path.join(path, "meta.json") if path.endswith(".cols") else path) as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            continue
+        run = runs.setdefault(tag, {"model": None, "scores": {}, "perf": {}})
+        run["model"] = run["model"] or data.get("model")
+        if data.get("scores"):
+            run["scores"].setdefault(task, {})[condition] = data["scores"]
+        if data.get("perf"):
+            run["perf"].setdefault(task, {})[condition] = data["perf"]
+    for tag, path in summaries.items():
+        with open(path) as f:
+            summary = json.load(f)
+        run = runs.setdefault(tag, {"model": None, "scores": {}, "perf": {}})
+        for task, conditions in summary.items():
+            for condition, entry in (conditions or {}).items():
+                if task in HEADLINES and entry:
+                    run["scores"].setdefault(task, {}).setdefault(condition, {}).update(entry)
+    return runs
+
+def model_name(tag, run):
+    """Display name of a run: the model, plus the tag's variant suffix (e.g. " (loglik)") if any."""
+    if not run["model"]:
+        return tag or DEFAULT_MODEL
+    model = run["model"].split("/")[-1]
+    variant = tag[len(model):].strip("_") if tag.startswith(model.lower()) else ""
+    return f"{model} ({variant.replace('_', ', ')})" if variant else model
+
+def defined(value):
+    """Undefined metrics are null (older summaries may still hold NaN)."""
+    return value is not None and math.isfinite(value)
+
+def headline(task, scores):
+    """(value, ciLow, ciHigh) of the task's headline metric; the bootstrap block wins when it is defined."""
+    _, key, metric = HEADLINES[task]
+    boot = (scores.get("bootstrap") or {}).get("metrics", {}).get(metric)
+    if boot and defined(boot["value"]):
+        ci = (boot["ciLow"], boot["ciHigh"]) if defined(boot["ciLow"]) and defined(boot["ciHigh"]) else (None, None)
+        return (boot["value"], *ci)
+    if not defined(scores.get(key)):
+        return None
+    return scores[key], None, None
+
+def pct(value):
+    return f"{round(value * 100)}%"
+
+def format_cell(score):
+    if score is None:
+        return "—"
+    value, low, high = score
+    return pct(value) if low is None else f"{pct(value)} [{round(low * 100)}–{round(high * 100)}]"
+
+def results_table(run):
+    """Header + one row per task, and the winning condition per task."""
+    data = [["Task", *(label for _, label in CONDITIONS), "Winner"]]
+    winners = []
+    for task, (label, _, _) in HEADLINES.items():
+        conditions = run["scores"].get(task)
+        if not conditions:
+            continue
+        scores = [headline(task, conditions[c]) if c in conditions else None for c, _ in CONDITIONS]
+        present = [(s[0], name) for s, (_, name) in zip(scores, CONDITIONS) if s is not None]
+        best = max(v for v, _ in present)
+        leaders = [name for v, name in present if v == best]
+        winners.append("—" if len(present) < 2 else leaders[0] if len(leaders) == 1 else "Tie")
+        data.append([label, *(format_cell(s) for s in scores), winners[-1]])
+    return data, winners
+
+# ── Slides ──────────────────────────────────────────────────────────
+# Each slide is (key, inputs, build): build(slide, inputs) draws it on a blank slide.
+
+def slide_title(slide, _):
+    add_text(slide, 1, 1.5, 11, 1.2, "High Heels for Haiku", size=44, bold=True, color=ACCENT, align=PP_ALIGN.CENTER)
+    add_text(slide, 1, 2.8, 11, 0.8, "When does code representation help LLMs", size=24, color=WHITE, align=PP_ALIGN.CENTER)
+    add_text(slide, 1, 3.4, 11, 0.8, "reason about molecules?", size=24, color=WHITE, align=PP_ALIGN.CENTER)
+    add_text(slide, 1, 4.8, 11, 0.5, "smiles-js-eval  ·  15 qualitative probes  ·  Haiku", size=16, color=GREY, align=PP_ALIGN.CENTER)
+    add_text(slide, 1, 5.5, 11, 0.5, "February 2026", size=14, color=GREY, align=PP_ALIGN.CENTER)
+
+def slide_question(slide, _):
+    add_text(slide, 0.8, 0.4, 11, 0.7, "The Question", size=32, bold=True, color=ACCENT)
+    tf = add_text(slide, 0.8, 1.3, 11.5, 1, "Can we help LLMs reason about chemistry by converting", size=22, color=WHITE)
+    add_para(tf, "SMILES strings into composable JavaScript code?", size=22, color=YELLOW, bold=True, space_before=4)
+    add_para(tf, "", size=12)
+    add_para(tf, "SMILES (string):", size=16, color=GREY, space_before=16)
+    add_para(tf, "  CNc1ncnc2c1ncn2Cc1ccccc1", size=18, color=RED)
+    add_para(tf, "", size=8)
+    add_para(tf, "smiles-js Code (tree):", size=16, color=GREY, space_before=8)
+    add_para(tf, "  pyrimidine = Fragment('c1ncncc1')", size=18, color=GREEN)
+    add_para(tf, "  imidazole  = Fragment('c2cncn2')", size=18, color=GREEN)
+    add_para(tf, "  purine     = pyrimidine.fuse(4, imidazole)", size=18, color=GREEN)
+    add_para(tf, "  benzene    = Fragment('c1ccccc1')", size=18, color=GREEN)
+    add_para(tf, "  molecule   = Molecule([purine, benzene])", size=18, color=GREEN)
+
+def slide_design(slide, _):
+    add_text(slide, 0.8, 0.4, 11, 0.7, "Study Design", size=32, bold=True, color=ACCENT)
+    tf = add_text(slide, 0.8, 1.3, 5.5, 5, "Method", size=20, bold=True, color=ACCENT2)
+    add_para(tf, "", size=6)
+    add_para(tf, "• Same molecule, same question", size=17, color=WHITE, space_before=8)
+    add_para(tf, "• Give Haiku the SMILES string", size=17, color=WHITE, space_before=4)
+    add_para(tf, "• Give Haiku the smiles-js code", size=17, color=WHITE, space_before=4)
+    add_para(tf, "• Compare answers against ground truth", size=17, color=WHITE, space_before=4)
+    add_para(tf, "• 15 probes × 6 task types", size=17, color=WHITE, space_before=4)
+
+    tf2 = add_text(slide, 7, 1.3, 5.5, 5, "Task Types", size=20, bold=True, color=ACCENT2)
+    add_para(tf2, "", size=6)
+    add_para(tf2, "1. Aromatic ring counting", size=17, color=WHITE, space_before=8)
+    add_para(tf2, "2. Scaffold recognition", size=17, color=WHITE, space_before=4)
+    add_para(tf2, "3. Functional group detection", size=17, color=WHITE, space_before=4)
+    add_para(tf2, "4. H-bond donor/acceptor counting", size=17, color=WHITE, space_before=4)
+    add_para(tf2, "5. Stereocenter counting", size=17, color=WHITE, space_before=4)
+    add_para(tf2, "6. Ring size discrimination", size=17, color=WHITE, space_before=4)
+
+SCORECARD = [
     ["#", "Task", "Molecule", "Truth", "SMILES", "Code", "Winner"],
     ["1", "Ring count", "Purine + 2 benzenes", "4", "3 ✗", "4 ✓", "Code"],
     ["2", "Ring count", "Benzodifuran", "3", "2 ✗", "3 ✓", "Code"],
@@ -140,197 +286,342 @@ data = [
     ["14", "Amide count", "Pentapeptide", "5", "5 ✓", "3 ✗", "SMILES"],
     ["15", "Ring size", "Mixed 5/6-mem", "4 rings", "✓", "✓", "Tie"],
 ]
-add_table(slide, 16, 7, data, 0.3, 1.1, 12.7, 6.2, font_size=10)
-
-# ── SLIDE 5: Pattern 1 – Fused Ring Counting ────────────────────────
-slide = prs.slides.add_slide(prs.slide_layouts[6])
-solid_bg(slide)
-add_text(slide, 0.8, 0.4, 11, 0.7, "Pattern 1: Fused Ring Counting", size=32, bold=True, color=ACCENT)
-add_text(slide, 0.8, 1.0, 11, 0.5, "Code wins 4/5 hard cases  vs  SMILES wins 2/5", size=18, color=ACCENT2)
-
-tf = add_text(slide, 0.8, 1.8, 5.5, 4.5, "The Problem with SMILES", size=20, bold=True, color=RED)
-add_para(tf, "", size=6)
-add_para(tf, "SMILES compresses fused rings:", size=16, color=WHITE, space_before=8)
-add_para(tf, "  c1c2ccoc2cc2ccc(=O)oc12", size=16, color=RED, space_before=4)
-add_para(tf, "", size=4)
-add_para(tf, "Ring closure digits (c1...c12) are", size=16, color=WHITE, space_before=8)
-add_para(tf, "nested and hard to parse.", size=16, color=WHITE)
-add_para(tf, "Haiku sees 2 rings. Truth: 3.", size=16, color=YELLOW, space_before=8)
-
-tf2 = add_text(slide, 7, 1.8, 5.5, 4.5, "How Code Helps", size=20, bold=True, color=GREEN)
-add_para(tf2, "", size=6)
-add_para(tf2, "Code enumerates each ring:", size=16, color=WHITE, space_before=8)
-add_para(tf2, "  ring1 = Fragment('c1cccoc1')", size=14, color=GREEN, space_before=4)
-add_para(tf2, "  ring2 = Fragment('c2occc2')", size=14, color=GREEN, space_before=2)
-add_para(tf2, "  ring3 = Fragment('c2cccoc2')", size=14, color=GREEN, space_before=2)
-add_para(tf2, "  FusedRing([ring1, ring2, ring3])", size=14, color=GREEN, space_before=2)
-add_para(tf2, "", size=4)
-add_para(tf2, "3 Fragments in FusedRing = 3 rings.", size=16, color=YELLOW, space_before=8)
-add_para(tf2, "Counting nodes in a tree is easy.", size=16, color=WHITE, space_before=4)
-
-# ── SLIDE 6: Pattern 2 – Scaffold Recognition ───────────────────────
-slide = prs.slides.add_slide(prs.slide_layouts[6])
-solid_bg(slide)
-add_text(slide, 0.8, 0.4, 11, 0.7, "Pattern 2: Scaffold Recognition", size=32, bold=True, color=ACCENT)
-add_text(slide, 0.8, 1.0, 11, 0.5, "Code correctly names scaffolds that SMILES obscures", size=18, color=ACCENT2)
-
-tf = add_text(slide, 0.8, 1.8, 5.5, 4.5, "SMILES → Wrong Answer", size=20, bold=True, color=RED)
-add_para(tf, "", size=6)
-add_para(tf, "Nc1nc(N)c2c(...)cccc2n1", size=15, color=RED, space_before=8)
-add_para(tf, "", size=4)
-add_para(tf, 'Haiku says: "benzimidazole"', size=16, color=WHITE, space_before=8)
-add_para(tf, "Truth: quinazoline", size=16, color=YELLOW, space_before=4)
-add_para(tf, "", size=8)
-add_para(tf, "The fused ring looks like one blob.", size=16, color=GREY, space_before=8)
-add_para(tf, "Haiku can't tell pyrimidine+benzene", size=16, color=GREY, space_before=2)
-add_para(tf, "from imidazole+benzene.", size=16, color=GREY, space_before=2)
-
-tf2 = add_text(slide, 7, 1.8, 5.5, 4.5, "Code → Correct Answer", size=20, bold=True, color=GREEN)
-add_para(tf2, "", size=6)
-add_para(tf2, "diaminopyrimidine = Fragment(...)", size=15, color=GREEN, space_before=8)
-add_para(tf2, "benzene = Fragment('c1ccccc1')", size=15, color=GREEN, space_before=2)
-add_para(tf2, "core = diaminopyrimidine.fuse(benzene)", size=15, color=GREEN, space_before=2)
-add_para(tf2, "", size=4)
-add_para(tf2, 'Haiku says: "quinazoline" ✓', size=16, color=WHITE, space_before=8)
-add_para(tf2, "", size=8)
-add_para(tf2, "pyrimidine.fuse(benzene) is the", size=16, color=GREY, space_before=8)
-add_para(tf2, "textbook definition of quinazoline.", size=16, color=GREY, space_before=2)
-add_para(tf2, "Code makes the recipe visible.", size=16, color=GREY, space_before=2)
-
-# ── SLIDE 7: Pattern 3 – Repeating Units ────────────────────────────
-slide = prs.slides.add_slide(prs.slide_layouts[6])
-solid_bg(slide)
-add_text(slide, 0.8, 0.4, 11, 0.7, "Pattern 3: Counting in Long Chains", size=32, bold=True, color=ACCENT)
-add_text(slide, 0.8, 1.0, 11, 0.5, "Peptide H-bond counting: Code nails it, SMILES overcounts", size=18, color=ACCENT2)
-
-tf = add_text(slide, 0.8, 1.8, 5.5, 4.5, "SMILES: Wall of Text", size=20, bold=True, color=RED)
-add_para(tf, "", size=6)
-add_para(tf, "Cc1cccc(NC(=O)N[C@@H](Cc2", size=14, color=RED, space_before=8)
-add_para(tf, "ccccc2)C(=O)N[C@H](CC(C)C", size=14, color=RED, space_before=2)
-add_para(tf, ")C(=O)N[C@@H](...) ...", size=14, color=RED, space_before=2)
-add_para(tf, "", size=4)
-add_para(tf, "Haiku says: hbd = 12", size=16, color=WHITE, space_before=8)
-add_para(tf, "Truth:      hbd = 7", size=16, color=YELLOW, space_before=4)
-add_para(tf, "", size=4)
-add_para(tf, "Double-counted NH donors in the", size=16, color=GREY, space_before=8)
-add_para(tf, "repetitive peptide backbone.", size=16, color=GREY, space_before=2)
-
-tf2 = add_text(slide, 7, 1.8, 5.5, 4.5, "Code: Structured Decomposition", size=20, bold=True, color=GREEN)
-add_para(tf2, "", size=6)
-add_para(tf2, "backbone = Fragment('NCN...NCN...')", size=14, color=GREEN, space_before=8)
-add_para(tf2, "carbonyl1 = Linear(['O'], ['='])", size=14, color=GREEN, space_before=2)
-add_para(tf2, "carbonyl2 = Linear(['O'], ['='])", size=14, color=GREEN, space_before=2)
-add_para(tf2, "...6 carbonyls total...", size=14, color=GREEN, space_before=2)
-add_para(tf2, "", size=4)
-add_para(tf2, "Haiku says: hbd = 7, hba = 6  ✓", size=16, color=WHITE, space_before=8)
-add_para(tf2, "", size=4)
-add_para(tf2, "Each carbonyl is a discrete countable", size=16, color=GREY, space_before=8)
-add_para(tf2, "node. No double-counting possible.", size=16, color=GREY, space_before=2)
-
-# ── SLIDE 8: When SMILES Wins ────────────────────────────────────────
-slide = prs.slides.add_slide(prs.slide_layouts[6])
-solid_bg(slide)
-add_text(slide, 0.8, 0.4, 11, 0.7, "When SMILES Wins (4 cases)", size=32, bold=True, color=ACCENT)
-
-tf = add_text(slide, 0.8, 1.3, 5.5, 5, "Pattern A: Functional Groups", size=20, bold=True, color=RED)
-add_para(tf, "", size=6)
-add_para(tf, "SMILES keeps groups inline:", size=16, color=WHITE, space_before=8)
-add_para(tf, "  C(=O)N  → amide  (obvious)", size=15, color=YELLOW, space_before=4)
-add_para(tf, "  C(=O)O  → carboxyl", size=15, color=YELLOW, space_before=2)
-add_para(tf, "  [N+](=O)[O-] → nitro", size=15, color=YELLOW, space_before=2)
-add_para(tf, "", size=4)
-add_para(tf, "Code splits these across fragments:", size=16, color=WHITE, space_before=8)
-add_para(tf, "  Fragment('NC') → looks like methylamine", size=15, color=RED, space_before=4)
-add_para(tf, "  Linear(['O'],['=']) → could be anything", size=15, color=RED, space_before=2)
-add_para(tf, "", size=4)
-add_para(tf, "→ Code hallucinated amine, ester", size=16, color=GREY, space_before=8)
-
-tf2 = add_text(slide, 7, 1.3, 5.5, 5, "Pattern B: Atom-Level Annotations", size=20, bold=True, color=RED)
-add_para(tf2, "", size=6)
-add_para(tf2, "Stereocenters: [C@H], [C@@H]", size=16, color=WHITE, space_before=8)
-add_para(tf2, "These are SMILES annotations.", size=16, color=WHITE, space_before=4)
-add_para(tf2, "", size=4)
-add_para(tf2, "Code fragments still contain the", size=16, color=GREY, space_before=8)
-add_para(tf2, "same [C@H] notation internally.", size=16, color=GREY, space_before=2)
-add_para(tf2, "No structural advantage.", size=16, color=GREY, space_before=2)
-add_para(tf2, "", size=4)
-add_para(tf2, "SMILES: counted 3 stereocenters ✓", size=16, color=GREEN, space_before=8)
-add_para(tf2, "Code:   hallucinated 1425 ✗", size=16, color=RED, space_before=4)
-
-# ── SLIDE 9: The Fundamental Tradeoff ────────────────────────────────
-slide = prs.slides.add_slide(prs.slide_layouts[6])
-solid_bg(slide)
-add_text(slide, 0.8, 0.4, 11, 0.7, "The Fundamental Tradeoff", size=32, bold=True, color=ACCENT)
-
-tf = add_text(slide, 1.5, 1.5, 10, 1.5, "Code is a tree decomposition of a string.", size=28, bold=True, color=YELLOW, align=PP_ALIGN.CENTER)
-add_para(tf, "", size=12)
-add_para(tf, "Trees are better for counting nodes.", size=24, color=GREEN, space_before=12, align=PP_ALIGN.CENTER)
-add_para(tf, "(rings, repeating units, building blocks)", size=18, color=GREY, space_before=4, align=PP_ALIGN.CENTER)
-add_para(tf, "", size=12)
-add_para(tf, "Strings are better for pattern matching.", size=24, color=RED, space_before=12, align=PP_ALIGN.CENTER)
-add_para(tf, "(functional groups, stereocenters, bond patterns)", size=18, color=GREY, space_before=4, align=PP_ALIGN.CENTER)
-
-# ── SLIDE 10: Sonnet 4.5 Batch Results (context) ────────────────────
-slide = prs.slides.add_slide(prs.slide_layouts[6])
-solid_bg(slide)
-add_text(slide, 0.8, 0.4, 11, 0.7, "Earlier: Sonnet 4.5 Batch Results (n=100)", size=30, bold=True, color=ACCENT)
-add_text(slide, 0.8, 1.0, 11, 0.5, "Quantitative baseline before the qualitative probing", size=18, color=GREY)
-
-data = [
-    ["Task", "SMILES", "Code", "Code+Relabel", "Winner"],
-    ["Ring Count", "92%", "76%", "74%", "SMILES"],
-    ["BBBP (bal. acc)", "59%", "54%", "62%", "Code+Relabel"],
-    ["SMILES Repair", "28%", "0%", "0%", "SMILES"],
-]
-add_table(slide, 4, 5, data, 1.5, 1.8, 10, 2.2, font_size=16)
-
-tf = add_text(slide, 0.8, 4.3, 11, 2.5, "Key takeaway from batch run:", size=18, bold=True, color=ACCENT2)
-add_para(tf, "", size=4)
-add_para(tf, "SMILES won 2/3 tasks. Hypothesis not broadly supported.", size=17, color=WHITE, space_before=8)
-add_para(tf, "But this hid the nuance: code helps on specific sub-problems.", size=17, color=WHITE, space_before=4)
-add_para(tf, "The qualitative probing found where those sub-problems live.", size=17, color=YELLOW, space_before=4)
-
-# ── SLIDE 11: Implications ──────────────────────────────────────────
-slide = prs.slides.add_slide(prs.slide_layouts[6])
-solid_bg(slide)
-add_text(slide, 0.8, 0.4, 11, 0.7, "Implications for smiles-js", size=32, bold=True, color=ACCENT)
-
-tf = add_text(slide, 0.8, 1.3, 11, 5.5, "", size=18, color=WHITE)
-p = tf.paragraphs[0]
-p.text = "1. FusedRing() is the killer feature"
-p.font.size = Pt(22)
-p.font.bold = True
-p.font.color.rgb = GREEN
-p.font.name = "Consolas"
-add_para(tf, "   Primary driver of code advantage — explicitly enumerates rings", size=16, color=WHITE, space_before=4)
-
-add_para(tf, "", size=8)
-add_para(tf, "2. Fragment granularity matters", size=22, bold=True, color=YELLOW, space_before=12)
-add_para(tf, "   Splitting C(=O)O → Fragment('CO') + Linear(['O'],['='])", size=16, color=WHITE, space_before=4)
-add_para(tf, "   destroys the carboxyl pattern. Preserve functional group boundaries.", size=16, color=WHITE, space_before=2)
-
-add_para(tf, "", size=8)
-add_para(tf, "3. Code+Relabel is underrated", size=22, bold=True, color=BLUE, space_before=12)
-add_para(tf, "   Forcing semantic naming (pyrimidineRing, benzeneRing) before", size=16, color=WHITE, space_before=4)
-add_para(tf, "   reasoning fixed code's overcounting problem. Worth testing at scale.", size=16, color=WHITE, space_before=2)
-
-add_para(tf, "", size=8)
-add_para(tf, "4. Best of both worlds?", size=22, bold=True, color=ACCENT, space_before=12)
-add_para(tf, "   Hybrid: SMILES for atom-level patterns + code tree for topology.", size=16, color=WHITE, space_before=4)
-add_para(tf, "   Or: larger fragments that preserve functional groups.", size=16, color=WHITE, space_before=2)
-
-# ── SLIDE 12: Closing ───────────────────────────────────────────────
-slide = prs.slides.add_slide(prs.slide_layouts[6])
-solid_bg(slide)
-add_text(slide, 1, 2.0, 11, 1.2, '"High Heels"', size=48, bold=True, color=ACCENT, align=PP_ALIGN.CENTER)
-add_text(slide, 1, 3.3, 11, 1, "Code doesn't make Haiku taller.", size=24, color=WHITE, align=PP_ALIGN.CENTER)
-add_text(slide, 1, 3.9, 11, 1, "It gives it a boost exactly where it needs one:", size=24, color=WHITE, align=PP_ALIGN.CENTER)
-add_text(slide, 1, 4.7, 11, 0.8, "counting structural units in compressed notation.", size=24, bold=True, color=YELLOW, align=PP_ALIGN.CENTER)
-
-tf = add_text(slide, 2, 5.8, 9, 1, "github.com/Ghost---Shadow/smiles-js-eval", size=14, color=GREY, align=PP_ALIGN.CENTER)
-add_para(tf, "data/haiku-probes.json  ·  docs/observations.md", size=12, color=GREY, space_before=4, align=PP_ALIGN.CENTER)
-
-# ── Save ─────────────────────────────────────────────────────────────
-out = "docs/high-heels-study.pptx"
-prs.save(out)
-print(f"Saved: {out}")
+
+def slide_scorecard(slide, data):
+    add_text(slide, 0.8, 0.4, 11, 0.7, "Scorecard: Code Wins 7 – SMILES Wins 4 – Tie 4", size=30, bold=True, color=ACCENT)
+    add_table(slide, len(data), len(data[0]), data, 0.3, 1.1, 12.7, 6.2, font_size=10)
+
+def slide_fused_rings(slide, _):
+    add_text(slide, 0.8, 0.4, 11, 0.7, "Pattern 1: Fused Ring Counting", size=32, bold=True, color=ACCENT)
+    add_text(slide, 0.8, 1.0, 11, 0.5, "Code wins 4/5 hard cases  vs  SMILES wins 2/5", size=18, color=ACCENT2)
+
+    tf = add_text(slide, 0.8, 1.8, 5.5, 4.5, "The Problem with SMILES", size=20, bold=True, color=RED)
+    add_para(tf, "", size=6)
+    add_para(tf, "SMILES compresses fused rings:", size=16, color=WHITE, space_before=8)
+    add_para(tf, "  c1c2ccoc2cc2ccc(=O)oc12", size=16, color=RED, space_before=4)
+    add_para(tf, "", size=4)
+    add_para(tf, "Ring closure digits (c1...c12) are", size=16, color=WHITE, space_before=8)
+    add_para(tf, "nested and hard to parse.", size=16, color=WHITE)
+    add_para(tf, "Haiku sees 2 rings. Truth: 3.", size=16, color=YELLOW, space_before=8)
+
+    tf2 = add_text(slide, 7, 1.8, 5.5, 4.5, "How Code Helps", size=20, bold=True, color=GREEN)
+    add_para(tf2, "", size=6)
+    add_para(tf2, "Code enumerates each ring:", size=16, color=WHITE, space_before=8)
+    add_para(tf2, "  ring1 = Fragment('c1cccoc1')", size=14, color=GREEN, space_before=4)
+    add_para(tf2, "  ring2 = Fragment('c2occc2')", size=14, color=GREEN, space_before=2)
+    add_para(tf2, "  ring3 = Fragment('c2cccoc2')", size=14, color=GREEN, space_before=2)
+    add_para(tf2, "  FusedRing([ring1, ring2, ring3])", size=14, color=GREEN, space_before=2)
+    add_para(tf2, "", size=4)
+    add_para(tf2, "3 Fragments in FusedRing = 3 rings.", size=16, color=YELLOW, space_before=8)
+    add_para(tf2, "Counting nodes in a tree is easy.", size=16, color=WHITE, space_before=4)
+
+def slide_scaffolds(slide, _):
+    add_text(slide, 0.8, 0.4, 11, 0.7, "Pattern 2: Scaffold Recognition", size=32, bold=True, color=ACCENT)
+    add_text(slide, 0.8, 1.0, 11, 0.5, "Code correctly names scaffolds that SMILES obscures", size=18, color=ACCENT2)
+
+    tf = add_text(slide, 0.8, 1.8, 5.5, 4.5, "SMILES → Wrong Answer", size=20, bold=True, color=RED)
+    add_para(tf, "", size=6)
+    add_para(tf, "Nc1nc(N)c2c(...)cccc2n1", size=15, color=RED, space_before=8)
+    add_para(tf, "", size=4)
+    add_para(tf, 'Haiku says: "benzimidazole"', size=16, color=WHITE, space_before=8)
+    add_para(tf, "Truth: quinazoline", size=16, color=YELLOW, space_before=4)
+    add_para(tf, "", size=8)
+    add_para(tf, "The fused ring looks like one blob.", size=16, color=GREY, space_before=8)
+    add_para(tf, "Haiku can't tell pyrimidine+benzene", size=16, color=GREY, space_before=2)
+    add_para(tf, "from imidazole+benzene.", size=16, color=GREY, space_before=2)
+
+    tf2 = add_text(slide, 7, 1.8, 5.5, 4.5, "Code → Correct Answer", size=20, bold=True, color=GREEN)
+    add_para(tf2, "", size=6)
+    add_para(tf2, "diaminopyrimidine = Fragment(...)", size=15, color=GREEN, space_before=8)
+    add_para(tf2, "benzene = Fragment('c1ccccc1')", size=15, color=GREEN, space_before=2)
+    add_para(tf2, "core = diaminopyrimidine.fuse(benzene)", size=15, color=GREEN, space_before=2)
+    add_para(tf2, "", size=4)
+    add_para(tf2, 'Haiku says: "quinazoline" ✓', size=16, color=WHITE, space_before=8)
+    add_para(tf2, "", size=8)
+    add_para(tf2, "pyrimidine.fuse(benzene) is the", size=16, color=GREY, space_before=8)
+    add_para(tf2, "textbook definition of quinazoline.", size=16, color=GREY, space_before=2)
+    add_para(tf2, "Code makes the recipe visible.", size=16, color=GREY, space_before=2)
+
+def slide_long_chains(slide, _):
+    add_text(slide, 0.8, 0.4, 11, 0.7, "Pattern 3: Counting in Long Chains", size=32, bold=True, color=ACCENT)
+    add_text(slide, 0.8, 1.0, 11, 0.5, "Peptide H-bond counting: Code nails it, SMILES overcounts", size=18, color=ACCENT2)
+
+    tf = add_text(slide, 0.8, 1.8, 5.5, 4.5, "SMILES: Wall of Text", size=20, bold=True, color=RED)
+    add_para(tf, "", size=6)
+    add_para(tf, "Cc1cccc(NC(=O)N[C@@H](Cc2", size=14, color=RED, space_before=8)
+    add_para(tf, "ccccc2)C(=O)N[C@H](CC(C)C", size=14, color=RED, space_before=2)
+    add_para(tf, ")C(=O)N[C@@H](...) ...", size=14, color=RED, space_before=2)
+    add_para(tf, "", size=4)
+    add_para(tf, "Haiku says: hbd = 12", size=16, color=WHITE, space_before=8)
+    add_para(tf, "Truth:      hbd = 7", size=16, color=YELLOW, space_before=4)
+    add_para(tf, "", size=4)
+    add_para(tf, "Double-counted NH donors in the", size=16, color=GREY, space_before=8)
+    add_para(tf, "repetitive peptide backbone.", size=16, color=GREY, space_before=2)
+
+    tf2 = add_text(slide, 7, 1.8, 5.5, 4.5, "Code: Structured Decomposition", size=20, bold=True, color=GREEN)
+    add_para(tf2, "", size=6)
+    add_para(tf2, "backbone = Fragment('NCN...NCN...')", size=14, color=GREEN, space_before=8)
+    add_para(tf2, "carbonyl1 = Linear(['O'], ['='])", size=14, color=GREEN, space_before=2)
+    add_para(tf2, "carbonyl2 = Linear(['O'], ['='])", size=14, color=GREEN, space_before=2)
+    add_para(tf2, "...6 carbonyls total...", size=14, color=GREEN, space_before=2)
+    add_para(tf2, "", size=4)
+    add_para(tf2, "Haiku says: hbd = 7, hba = 6  ✓", size=16, color=WHITE, space_before=8)
+    add_para(tf2, "", size=4)
+    add_para(tf2, "Each carbonyl is a discrete countable", size=16, color=GREY, space_before=8)
+    add_para(tf2, "node. No double-counting possible.", size=16, color=GREY, space_before=2)
+
+def slide_smiles_wins(slide, _):
+    add_text(slide, 0.8, 0.4, 11, 0.7, "When SMILES Wins (4 cases)", size=32, bold=True, color=ACCENT)
+
+    tf = add_text(slide, 0.8, 1.3, 5.5, 5, "Pattern A: Functional Groups", size=20, bold=True, color=RED)
+    add_para(tf, "", size=6)
+    add_para(tf, "SMILES keeps groups inline:", size=16, color=WHITE, space_before=8)
+    add_para(tf, "  C(=O)N  → amide  (obvious)", size=15, color=YELLOW, space_before=4)
+    add_para(tf, "  C(=O)O  → carboxyl", size=15, color=YELLOW, space_before=2)
+    add_para(tf, "  [N+](=O)[O-] → nitro", size=15, color=YELLOW, space_before=2)
+    add_para(tf, "", size=4)
+    add_para(tf, "Code splits these across fragments:", size=16, color=WHITE, space_before=8)
+    add_para(tf, "  Fragment('NC') → looks like methylamine", size=15, color=RED, space_before=4)
+    add_para(tf, "  Linear(['O'],['=']) → could be anything", size=15, color=RED, space_before=2)
+    add_para(tf, "", size=4)
+    add_para(tf, "→ Code hallucinated amine, ester", size=16, color=GREY, space_before=8)
+
+    tf2 = add_text(slide, 7, 1.3, 5.5, 5, "Pattern B: Atom-Level Annotations", size=20, bold=True, color=RED)
+    add_para(tf2, "", size=6)
+    add_para(tf2, "Stereocenters: [C@H], [C@@H]", size=16, color=WHITE, space_before=8)
+    add_para(tf2, "These are SMILES annotations.", size=16, color=WHITE, space_before=4)
+    add_para(tf2, "", size=4)
+    add_para(tf2, "Code fragments still contain the", size=16, color=GREY, space_before=8)
+    add_para(tf2, "same [C@H] notation internally.", size=16, color=GREY, space_before=2)
+    add_para(tf2, "No structural advantage.", size=16, color=GREY, space_before=2)
+    add_para(tf2, "", size=4)
+    add_para(tf2, "SMILES: counted 3 stereocenters ✓", size=16, color=GREEN, space_before=8)
+    add_para(tf2, "Code:   hallucinated 1425 ✗", size=16, color=RED, space_before=4)
+
+def slide_tradeoff(slide, _):
+    add_text(slide, 0.8, 0.4, 11, 0.7, "The Fundamental Tradeoff", size=32, bold=True, color=ACCENT)
+
+    tf = add_text(slide, 1.5, 1.5, 10, 1.5, "Code is a tree decomposition of a string.", size=28, bold=True, color=YELLOW, align=PP_ALIGN.CENTER)
+    add_para(tf, "", size=12)
+    add_para(tf, "Trees are better for counting nodes.", size=24, color=GREEN, space_before=12, align=PP_ALIGN.CENTER)
+    add_para(tf, "(rings, repeating units, building blocks)", size=18, color=GREY, space_before=4, align=PP_ALIGN.CENTER)
+    add_para(tf, "", size=12)
+    add_para(tf, "Strings are better for pattern matching.", size=24, color=RED, space_before=12, align=PP_ALIGN.CENTER)
+    add_para(tf, "(functional groups, stereocenters, bond patterns)", size=18, color=GREY, space_before=4, align=PP_ALIGN.CENTER)
+
+def slide_batch_results(slide, inputs):
+    add_text(slide, 0.8, 0.4, 11, 0.7, inputs["title"], size=30, bold=True, color=ACCENT)
+    add_text(slide, 0.8, 1.0, 11, 0.5, inputs["subtitle"], size=18, color=GREY)
+
+    data = inputs["table"]
+    height = 0.55 * len(data)
+    add_table(slide, len(data), len(data[0]), data, 1.5, 1.8, 10, height, font_size=16 if len(data) <= 4 else 14)
+
+    tf = add_text(slide, 0.8, 2.1 + height, 11, 2.5, "Key takeaway from batch run:", size=18, bold=True, color=ACCENT2)
+    add_para(tf, "", size=4)
+    for i, line in enumerate(inputs["takeaway"]):
+        last = i == len(inputs["takeaway"]) - 1 and i > 0
+        add_para(tf, line, size=17, color=YELLOW if last else WHITE, space_before=8 if i == 0 else 4)
+
+def batch_results_slide(tag, run):
+    data, winners = results_table(run)
+    n = max((s.get("total", 0) for conditions in run["scores"].values() for s in conditions.values()), default=0)
+    model = model_name(tag, run)
+    smiles_wins = winners.count("SMILES")
+    takeaway = [f"SMILES won {smiles_wins}/{len(winners)} tasks."
+                + (" Hypothesis not broadly supported." if 2 * smiles_wins > len(winners) else "")]
+    if tag:
+        title = f"{model} Batch Results (n={n})"
+        subtitle = f"results/*_{tag}.json"
+    else:
+        title = f"Earlier: {model} Batch Results (n={n})"
+        subtitle = "Quantitative baseline before the qualitative probing"
+        takeaway += ["But this hid the nuance: code helps on specific sub-problems.",
+                     "The qualitative probing found where those sub-problems live."]
+    inputs = {"title": title, "subtitle": subtitle, "table": data, "takeaway": takeaway}
+    return f"results:{tag or 'default'}", inputs, slide_batch_results
+
+def slide_across_models(slide, inputs):
+    add_text(slide, 0.8, 0.4, 11, 0.7, "Across Models", size=32, bold=True, color=ACCENT)
+    add_text(slide, 0.8, 1.0, 11, 0.5, "Headline metric per task and condition", size=18, color=GREY)
+    add_bar_chart(slide, inputs["categories"], inputs["series"], 0.8, 1.6, 11.7, 5.5)
+
+def across_models_slide(runs):
+    categories = []
+    series = {condition: [] for condition, _ in CONDITIONS}
+    for tag, run in runs:
+        for task, (label, _, _) in HEADLINES.items():
+            conditions = run["scores"].get(task)
+            if not conditions:
+                continue
+            categories.append(f"{model_name(tag, run)} · {label}")
+            for condition, values in series.items():
+                score = headline(task, conditions[condition]) if condition in conditions else None
+                values.append(None if score is None else round(score[0], 4))
+    inputs = {"categories": categories, "series": [[label, series[c]] for c, label in CONDITIONS]}
+    return "across-models", inputs, slide_across_models
+
+def slide_cost(slide, inputs):
+    add_text(slide, 0.8, 0.4, 11, 0.7, inputs["title"], size=30, bold=True, color=ACCENT)
+    add_text(slide, 0.8, 1.0, 11, 0.5, "Run-level perf blocks of the local (hf_runner.py) runs", size=18, color=GREY)
+    data = inputs["table"]
+    add_table(slide, len(data), len(data[0]), data, 0.5, 1.7, 12.3, 0.38 * len(data), font_size=12)
+
+def cost_slides(runs):
+    rows = []
+    for tag, run in runs:
+        for task, conditions in run["perf"].items():
+            for condition, perf in conditions.items():
+                rows.append([model_name(tag, run), task, condition, perf["promptTokens"], perf["generatedTokens"],
+                             perf["latencyP50Ms"], perf["latencyP95Ms"], perf.get("generatedTokensPerSec", "—")])
+    header = ["Model", "Task", "Condition", "Prompt tok", "Gen tok", "p50 ms", "p95 ms", "tok/s"]
+    pages = [rows[i:i + COST_ROWS_PER_SLIDE] for i in range(0, len(rows), COST_ROWS_PER_SLIDE)]
+    slides = []
+    for page, chunk in enumerate(pages, 1):
+        title = "Cost per Run" + (f" ({page}/{len(pages)})" if len(pages) > 1 else "")
+        slides.append((f"cost:{page}", {"title": title, "table": [header, *chunk]}, slide_cost))
+    return slides
+
+def slide_implications(slide, _):
+    add_text(slide, 0.8, 0.4, 11, 0.7, "Implications for smiles-js", size=32, bold=True, color=ACCENT)
+
+    tf = add_text(slide, 0.8, 1.3, 11, 5.5, "", size=18, color=WHITE)
+    p = tf.paragraphs[0]
+    p.text = "1. FusedRing() is the killer feature"
+    p.font.size = Pt(22)
+    p.font.bold = True
+    p.font.color.rgb = GREEN
+    p.font.name = "Consolas"
+    add_para(tf, "   Primary driver of code advantage — explicitly enumerates rings", size=16, color=WHITE, space_before=4)
+
+    add_para(tf, "", size=8)
+    add_para(tf, "2. Fragment granularity matters", size=22, bold=True, color=YELLOW, space_before=12)
+    add_para(tf, "   Splitting C(=O)O → Fragment('CO') + Linear(['O'],['='])", size=16, color=WHITE, space_before=4)
+    add_para(tf, "   destroys the carboxyl pattern. Preserve functional group boundaries.", size=16, color=WHITE, space_before=2)
+
+    add_para(tf, "", size=8)
+    add_para(tf, "3. Code+Relabel is underrated", size=22, bold=True, color=BLUE, space_before=12)
+    add_para(tf, "   Forcing semantic naming (pyrimidineRing, benzeneRing) before", size=16, color=WHITE, space_before=4)
+    add_para(tf, "   reasoning fixed code's overcounting problem. Worth testing at scale.", size=16, color=WHITE, space_before=2)
+
+    add_para(tf, "", size=8)
+    add_para(tf, "4. Best of both worlds?", size=22, bold=True, color=ACCENT, space_before=12)
+    add_para(tf, "   Hybrid: SMILES for atom-level patterns + code tree for topology.", size=16, color=WHITE, space_before=4)
+    add_para(tf, "   Or: larger fragments that preserve functional groups.", size=16, color=WHITE, space_before=2)
+
+def slide_closing(slide, _):
+    add_text(slide, 1, 2.0, 11, 1.2, '"High Heels"', size=48, bold=True, color=ACCENT, align=PP_ALIGN.CENTER)
+    add_text(slide, 1, 3.3, 11, 1, "Code doesn't make Haiku taller.", size=24, color=WHITE, align=PP_ALIGN.CENTER)
+    add_text(slide, 1, 3.9, 11, 1, "It gives it a boost exactly where it needs one:", size=24, color=WHITE, align=PP_ALIGN.CENTER)
+    add_text(slide, 1, 4.7, 11, 0.8, "counting structural units in compressed notation.", size=24, bold=True, color=YELLOW, align=PP_ALIGN.CENTER)
+
+    tf = add_text(slide, 2, 5.8, 9, 1, "github.com/Ghost---Shadow/smiles-js-eval", size=14, color=GREY, align=PP_ALIGN.CENTER)
+    add_para(tf, "data/haiku-probes.json  ·  docs/observations.md", size=12, color=GREY, space_before=4, align=PP_ALIGN.CENTER)
+
+def deck_slides(results_dir=RESULTS_DIR):
+    """The deck in order, as (key, inputs, build)."""
+    runs = sorted(load_results(results_dir).items(), key=lambda item: (item[0] != "", item[0]))
+    runs = [(tag, run) for tag, run in runs if run["scores"] or run["perf"]]
+    slides = [
+        ("title", None, slide_title),
+        ("question", None, slide_question),
+        ("design", None, slide_design),
+        ("scorecard", SCORECARD, slide_scorecard),
+        ("pattern-fused-rings", None, slide_fused_rings),
+        ("pattern-scaffolds", None, slide_scaffolds),
+        ("pattern-long-chains", None, slide_long_chains),
+        ("smiles-wins", None, slide_smiles_wins),
+        ("tradeoff", None, slide_tradeoff),
+    ]
+    slides += [batch_results_slide(tag, run) for tag, run in runs if run["scores"]]
+    if sum(1 for _, run in runs if run["scores"]) > 1:
+        slides.append(across_models_slide([(tag, run) for tag, run in runs if run["scores"]]))
+    slides += cost_slides(runs)
+    slides += [("implications", None, slide_implications), ("closing", None, slide_closing)]
+    return slides
+
+# ── Incremental build ───────────────────────────────────────────────
+def slide_hash(key, inputs, build):
+    payload = json.dumps([key, inputs], sort_keys=True, ensure_ascii=False) + inspect.getsource(build)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+def manifest_path(out):
+    return os.path.splitext(out)[0] + ".slides.json"
+
+def new_presentation():
+    prs = Presentation()
+    prs.slide_width  = Inches(13.333)
+    prs.slide_height = Inches(7.5)
+    return prs
+
+def drop_slide(prs, slide):
+    id_list = prs.slides._sldIdLst
+    for sld_id in id_list:
+        if prs.part.related_part(sld_id.rId) is slide.part:
+            rId = sld_id.rId
+            id_list.remove(sld_id)
+            prs.part.drop_rel(rId)
+            return
+
+def reorder_slides(prs, slides):
+    id_list = prs.slides._sldIdLst
+    by_part = {prs.part.related_part(sld_id.rId): sld_id for sld_id in id_list}
+    for slide in slides:
+        id_list.append(by_part[slide.part])  # lxml moves the element to the end
+    # New slides are named slide<count + 1>.xml, which can collide after a drop_slide.
+    prs.part.rename_slide_parts([sld_id.rId for sld_id in id_list])
+
+def build_deck(out=OUT, results_dir=RESULTS_DIR, force=False):
+    """Bring the deck at `out` up to date; returns the keys of the slides that were (re)built."""
+    slides = deck_slides(results_dir)
+    hashes = {key: slide_hash(key, inputs, build) for key, inputs, build in slides}
+    previous = {}
+    if not force and os.path.exists(out) and os.path.exists(manifest_path(out)):
+        with open(manifest_path(out)) as f:
+            previous = json.load(f)["slides"]
+    prs = Presentation(out) if previous else new_presentation()
+    existing = {slide.name: slide for slide in prs.slides} if previous else {}
+
+    rebuilt = []
+    for key, inputs, build in slides:
+        if key in existing and previous.get(key) == hashes[key]:
+            continue
+        if key in existing:
+            drop_slide(prs, existing.pop(key))
+        slide = prs.slides.add_slide(prs.slide_layouts[6])  # blank
+        slide._element.cSld.name = key
+        solid_bg(slide)
+        build(slide, inputs)
+        existing[key] = slide
+        rebuilt.append(key)
+    stale = [key for key in existing if key not in hashes]
+    for key in stale:
+        drop_slide(prs, existing.pop(key))
+
+    order = list(hashes)
+    if not rebuilt and not stale and [slide.name for slide in prs.slides] == order:
+        return rebuilt
+    reorder_slides(prs, [existing[key] for key in order])
+    prs.save(out)
+    tmp = manifest_path(out) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"slides": hashes}, f, indent=2)
+    os.replace(tmp, manifest_path(out))
+    return rebuilt
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--results", type=str, default=RESULTS_DIR)
+    parser.add_argument("--out", type=str, default=OUT)
+    parser.add_argument("--force", action="store_true", help="Rebuild every slide")
+    args = parser.parse_args(argv)
+
+    rebuilt = build_deck(args.out, args.results, args.force)
+    if rebuilt:
+        print(f"Saved: {args.out} (rebuilt {len(rebuilt)} slides: {', '.join(rebuilt)})")
+    else:
+        print(f"Up to date: {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
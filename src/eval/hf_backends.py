@@ -0,0 +1,196 @@
+"""
+Model-loading backends for hf_runner.py.
+
+  cuda-nf4  4-bit NF4 weights via bitsandbytes, placed with device_map="auto" (needs a CUDA GPU)
+  cpu       native bfloat16/float32 weights, or int8 via dynamic quantization of every
+            nn.Linear, with explicit torch thread counts and optional core affinity
+  auto      cuda-nf4 when a GPU is visible, cpu otherwise
+
+Every backend returns (model, tokenizer) with the same generate()/forward interface,
+so result files do not depend on the backend.
+
+Snapshots: `hf_runner.py snapshot` saves the weights as a backend produces them
+(NF4-quantized on CUDA, converted to bfloat16/float32 on CPU) to
+cache/snapshots/<model>_<backend>_<key>/ as safetensors. The key hashes the
+model id, quantization config and torch/transformers/bitsandbytes versions, and
+load() uses a matching snapshot instead of the original checkpoint. Safetensors
+are memory-mapped, so weights are paged in as they are first used and no
+quantization pass runs at startup. int8 is still quantized after loading, since
+dynamically quantized layers have no safetensors format; its snapshot holds the
+float32 weights it starts from.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+
+# torch and transformers are imported inside the loaders so that parsing backend
+# arguments (hf_runner.py --help, --dry-run) does not pay for them.
+
+BACKENDS = ["auto", "cuda-nf4", "cpu"]
+CPU_DTYPES = ["bfloat16", "float32", "int8"]
+SNAPSHOT_DIR = os.path.join("cache", "snapshots")
+NF4_CONFIG = {"load_in_4bit": True, "bnb_4bit_compute_dtype": "float16", "bnb_4bit_quant_type": "nf4"}
+
+
+def parse_cores(spec):
+    """'0-3,8' -> {0, 1, 2, 3, 8}"""
+    cores = set()
+    for part in spec.split(","):
+        start, _, end = part.partition("-")
+        cores.update(range(int(start), int(end or start) + 1))
+    return cores
+
+
+def load_cuda_nf4(model_id, prequantized=False):
+    """NF4 model on the GPU; a prequantized snapshot carries its quantization config in config.json."""
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig
+
+    if prequantized:
+        print(f"Loading pre-quantized snapshot {model_id}...")
+        quantization = {}
+    else:
+        print(f"Loading {model_id} with 4-bit quantization...")
+        quantization = {"quantization_config": BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_compute_dtype=torch.float16,
+            bnb_4bit_quant_type="nf4",
+        )}
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    model = AutoModelForCausalLM.from_pretrained(
+        model_id,
+        device_map="auto",
+        **quantization,
+    )
+    return model, tokenizer
+
+
+def configure_cpu(threads=None, cores=None):
+    """Pin the process to `cores` (e.g. '0-15') and size torch's thread pools to match."""
+    import torch
+
+    if cores:
+        os.sched_setaffinity(0, parse_cores(cores))
+    threads = threads or len(os.sched_getaffinity(0))
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only settable before the first parallel op; a second model load keeps the first value.
+        pass
+    return threads
+
+
+def quantize_cpu(model, cpu_dtype):
+    """int8 dynamic quantization of the Linear layers (weights int8, activations quantized per call)."""
+    import torch
+
+    if cpu_dtype != "int8":
+        return model
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_cpu_weights(model_id, cpu_dtype="bfloat16"):
+    """Unquantized CPU model in the dtype the backend runs (or, for int8, quantizes) in."""
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    # Dynamic quantization converts from float32 weights.
+    torch_dtype = torch.bfloat16 if cpu_dtype == "bfloat16" else torch.float32
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    model = AutoModelForCausalLM.from_pretrained(model_id, dtype=torch_dtype, low_cpu_mem_usage=True)
+    return model.eval(), tokenizer
+
+
+def load_cpu(model_id, cpu_dtype="bfloat16", threads=None, cores=None):
+    threads = configure_cpu(threads, cores)
+    print(f"Loading {model_id} on CPU ({cpu_dtype}, {threads} threads)...")
+    model, tokenizer = load_cpu_weights(model_id, cpu_dtype)
+    return quantize_cpu(model, cpu_dtype), tokenizer
+
+
+def resolve_backend(backend):
+    if backend == "auto":
+        import torch
+
+        return "cuda-nf4" if torch.cuda.is_available() else "cpu"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend}. Valid: {', '.join(BACKENDS)}")
+    return backend
+
+
+def library_versions():
+    from importlib import metadata
+
+    versions = {}
+    for package in ("torch", "transformers", "bitsandbytes"):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def snapshot_info(model_id, backend, cpu_dtype="bfloat16"):
+    """What a snapshot's weights depend on; backend must already be resolved."""
+    if backend == "cuda-nf4":
+        quantization = NF4_CONFIG
+    else:
+        quantization = {"dtype": "float32" if cpu_dtype == "int8" else cpu_dtype}
+    return {"model": model_id, "backend": backend, "quantization": quantization, "versions": library_versions()}
+
+
+def snapshot_path(model_id, backend, cpu_dtype="bfloat16", snapshot_dir=SNAPSHOT_DIR):
+    info = snapshot_info(model_id, backend, cpu_dtype)
+    key = hashlib.sha256(json.dumps(info, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    name = model_id.rstrip("/").split("/")[-1].lower()
+    return os.path.join(snapshot_dir, f"{name}_{backend}_{key}")
+
+
+def has_snapshot(path):
+    return os.path.exists(os.path.join(path, "snapshot.json"))
+
+
+def save_snapshot(model_id, backend="auto", cpu_dtype="bfloat16", snapshot_dir=SNAPSHOT_DIR):
+    """Load model_id through the backend and save its converted weights as a snapshot; returns its path."""
+    backend = resolve_backend(backend)
+    path = snapshot_path(model_id, backend, cpu_dtype, snapshot_dir)
+    if backend == "cuda-nf4":
+        model, tokenizer = load_cuda_nf4(model_id)
+    else:
+        print(f"Loading {model_id} on CPU ({cpu_dtype})...")
+        model, tokenizer = load_cpu_weights(model_id, cpu_dtype)
+    tmp = f"{path}.tmp{os.getpid()}"
+    model.save_pretrained(tmp, safe_serialization=True)
+    tokenizer.save_pretrained(tmp)
+    # Written last: a snapshot directory without it is incomplete and ignored.
+    with open(os.path.join(tmp, "snapshot.json"), "w") as f:
+        json.dump(snapshot_info(model_id, backend, cpu_dtype), f, indent=2)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    return path
+
+
+def load(model_id, backend="auto", cpu_dtype="bfloat16", threads=None, cores=None, snapshot_dir=SNAPSHOT_DIR):
+    """(model, tokenizer) for the backend, from a matching snapshot in snapshot_dir when there is one."""
+    backend = resolve_backend(backend)
+    path = snapshot_path(model_id, backend, cpu_dtype, snapshot_dir) if snapshot_dir else None
+    if path and has_snapshot(path):
+        model_id = path
+    if backend == "cuda-nf4":
+        return load_cuda_nf4(model_id, prequantized=model_id == path)
+    return load_cpu(model_id, cpu_dtype, threads, cores)
+
+
+def main(argv=None):
+    import hf_runner
+
+    parser = argparse.ArgumentParser(prog="hf_runner.py snapshot")
+    parser.add_argument("--model", type=str, default=hf_runner.DEFAULT_MODEL)
+    hf_runner.add_backend_args(parser)
+    args = parser.parse_args(argv)
+    path = save_snapshot(args.model, args.backend, args.cpu_dtype, args.snapshot_dir or SNAPSHOT_DIR)
+    print(f"Wrote {path}")
@@ -0,0 +1,215 @@
+"""
+Columnar result files: results/<name>.cols/ next to (or instead of) results/<name>.json.
+
+Every leaf field of the records becomes one column, named by its path
+(e.g. perf.prefillMs, candidateProbs.yes, parsed.hbd):
+
+  int / float / bool   <n>.npy, a typed array; consumers np.load(..., mmap_mode="r")
+                       only the columns they read
+  category             <n>.npy int32 codes into meta.json's "categories" (short
+                       repeated strings such as parsed yes/no, group lists)
+  text / json          <n>.z, the zlib-compressed UTF-8 values back to back, and
+                       <n>.offsets.npy; used for rawResponse, relabeled, samples,
+                       error, and any mixed-type field (stored as JSON)
+
+A column whose rows are not all present also gets <n>.state.npy (int8: 0 = key
+absent, 1 = null, 2 = value), so records() rebuilds the exact records.
+meta.json holds the model, the run-level blocks ("perf", "scores") and the column
+list. to_json() writes the {"model", "results", ...} JSON the JS tools read.
+
+Usage:
+  python src/eval/hf_columns.py to-columns results/*.json
+  python src/eval/hf_columns.py to-json results/*.cols
+"""
+
+import json
+import os
+import shutil
+import sys
+import zlib
+
+import numpy as np
+
+from hf_results import columns_path
+
+# Long free-form text: always compressed, never categorical.
+TEXT_FIELDS = {"rawResponse", "relabeled", "samples", "error"}
+CATEGORY_LIMIT = 256
+ABSENT, NULL, VALUE = 0, 1, 2
+
+
+def flatten(record, prefix=()):
+    """{path tuple: leaf value}; dicts are walked, everything else (lists included) is a leaf."""
+    leaves = {}
+    for key, value in record.items():
+        path = (*prefix, key)
+        if isinstance(value, dict) and value:
+            leaves.update(flatten(value, path))
+        else:
+            leaves[path] = value
+    return leaves
+
+
+def column_kind(path, values):
+    if path[0] in TEXT_FIELDS:
+        return "text" if all(isinstance(v, str) for v in values) else "json"
+    if values and all(isinstance(v, bool) for v in values):
+        return "bool"
+    if values and all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        return "int"
+    if values and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+        return "float"
+    if len({json.dumps(v, sort_keys=True) for v in values}) <= CATEGORY_LIMIT:
+        return "category"
+    return "json"
+
+
+def write_text(path, strings):
+    data = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(data) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(d) for d in data])
+    with open(path + ".z", "wb") as f:
+        f.write(zlib.compress(b"".join(data), 6))
+    np.save(path + ".offsets.npy", offsets)
+
+
+def read_text(path):
+    with open(path + ".z", "rb") as f:
+        data = zlib.decompress(f.read())
+    offsets = np.load(path + ".offsets.npy")
+    return [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+
+def write_columns(records, path, model_id=None, **blocks):
+    """Write records as a column directory at `path` (atomically replacing it); blocks go to meta.json."""
+    rows = [flatten(r) for r in records]
+    paths = list(dict.fromkeys(p for row in rows for p in row))
+    tmp = f"{path}.tmp{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    columns = []
+    for n, p in enumerate(paths):
+        state = np.array([ABSENT if p not in row else NULL if row[p] is None else VALUE for row in rows], dtype=np.int8)
+        values = [row[p] for row in rows if row.get(p) is not None]
+        kind = column_kind(p, values)
+        name = f"c{n:03d}"
+        base = os.path.join(tmp, name)
+        column = {"path": list(p), "name": name, "kind": kind}
+        # Rows without a value hold a placeholder and are masked out by the state array.
+        filled = [row[p] if state[i] == VALUE else None for i, row in enumerate(rows)]
+        if kind in ("int", "float", "bool"):
+            dtype = {"int": np.int64, "float": np.float64, "bool": np.bool_}[kind]
+            np.save(base + ".npy", np.array([0 if v is None else v for v in filled], dtype=dtype))
+        elif kind == "category":
+            categories = list(dict.fromkeys(json.dumps(v, sort_keys=True) for v in values))
+            codes = {c: k for k, c in enumerate(categories)}
+            np.save(base + ".npy", np.array(
+                [-1 if v is None else codes[json.dumps(v, sort_keys=True)] for v in filled], dtype=np.int32))
+            column["categories"] = [json.loads(c) for c in categories]
+        else:
+            write_text(base, ["" if v is None else v if kind == "text" else json.dumps(v) for v in filled])
+        if (state != VALUE).any():
+            np.save(base + ".state.npy", state)
+        columns.append(column)
+    meta = {"model": model_id, "rows": len(rows), "columns": columns, **blocks}
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+
+
+class ColumnStore:
+    """Read side of a .cols directory; numeric and category columns are memory-mapped."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.by_name = {".".join(c["path"]): c for c in self.meta["columns"]}
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def columns(self):
+        return list(self.by_name)
+
+    def state(self, name):
+        base = os.path.join(self.path, self.by_name[name]["name"])
+        if os.path.exists(base + ".state.npy"):
+            return np.load(base + ".state.npy", mmap_mode="r")
+        return np.full(len(self), VALUE, dtype=np.int8)
+
+    def array(self, name):
+        """Typed array of an int/float/bool column, or the int32 codes of a category column."""
+        column = self.by_name[name]
+        if column["kind"] in ("text", "json"):
+            raise ValueError(f"{name} is a {column['kind']} column; use values()")
+        return np.load(os.path.join(self.path, column["name"] + ".npy"), mmap_mode="r")
+
+    def values(self, name):
+        """Python values of any column, None where the row has no value."""
+        column = self.by_name[name]
+        state = self.state(name)
+        if column["kind"] in ("text", "json"):
+            raw = read_text(os.path.join(self.path, column["name"]))
+            decoded = raw if column["kind"] == "text" else [json.loads(v) if v else None for v in raw]
+        elif column["kind"] == "category":
+            decoded = [column["categories"][c] if c >= 0 else None for c in self.array(name)]
+        else:
+            decoded = self.array(name).tolist()
+        return [v if s == VALUE else None for v, s in zip(decoded, state)]
+
+    def records(self):
+        records = [{} for _ in range(len(self))]
+        for name, column in self.by_name.items():
+            state = self.state(name)
+            for record, value, s in zip(records, self.values(name), state):
+                if s == ABSENT:
+                    continue
+                node = record
+                for key in column["path"][:-1]:
+                    node = node.setdefault(key, {})
+                node[column["path"][-1]] = value
+        return records
+
+    def to_dict(self):
+        """The {"model", "results", ...} layout of the JSON result files."""
+        blocks = {k: v for k, v in self.meta.items() if k not in ("model", "rows", "columns")}
+        return {"model": self.meta["model"], "results": self.records(), **blocks}
+
+    def to_json(self, json_path):
+        tmp = json_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp, json_path)
+
+
+def from_json(json_path, path=None):
+    """Write the columnar copy of a JSON result file; returns its path."""
+    with open(json_path) as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        data = {"results": data}
+    path = path or columns_path(json_path)
+    blocks = {k: v for k, v in data.items() if k not in ("model", "results")}
+    write_columns(data["results"], path, data.get("model"), **blocks)
+    return path
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) < 2 or argv[0] not in ("to-columns", "to-json"):
+        print("Usage: python src/eval/hf_columns.py to-columns <file.json>... | to-json <dir.cols>...", file=sys.stderr)
+        return 1
+    for source in argv[1:]:
+        if argv[0] == "to-columns":
+            print(f"Wrote {from_json(source)}")
+        else:
+            target = os.path.splitext(source.rstrip("/"))[0] + ".json"
+            ColumnStore(source).to_json(target)
+            print(f"Wrote {target}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
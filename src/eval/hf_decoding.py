@@ -0,0 +1,128 @@
+"""
+Task-aware decoding limits for hf_runner.py.
+
+Each task's answer format defines:
+  - a stop pattern: generation ends once the decoded reply so far is nothing but a
+    complete answer (prose that merely mentions "no" or a number never matches)
+  - a finite answer set: decoding can be constrained to it with prefix_allowed_tokens_fn,
+    which also bounds max_new_tokens to the longest tokenized answer
+
+The per-task max_new_tokens bound only applies under --constrain, where the reply is
+guaranteed to be just the answer. Without it (no flags, or --stop-on-answer alone) a
+model may reason before answering and the parsers read the last line, so a budget
+cut to the answer length would truncate the reply before its answer; those runs keep
+hf_runner.MAX_TOKENS and rely on EOS or the stop pattern to end early.
+"""
+
+import itertools
+import re
+
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList
+
+MAX_COUNT = 20
+FUNC_GROUPS = ["hydroxyl", "carboxyl", "amine", "amide", "ester", "ether", "nitro", "halide"]
+
+_GROUP = "(?:" + "|".join(FUNC_GROUPS) + ")"
+
+
+def answer_only(answer, end=r"[.!]?[ \t]*\n|[.!]"):
+    """
+    Matches (with fullmatch) a reply that is one answer, optionally in **bold**, plus a
+    terminator. The terminator keeps "1" from stopping before "12"; integers only end
+    at a newline so "3." cannot stop before "3.5".
+    """
+    return re.compile(rf"\s*\**(?:{answer})\**[ \t]*(?:{end})\s*", re.IGNORECASE)
+
+
+# The parsers read the last line / last number of a reply, so stopping on an answer
+# embedded in prose ("There is no...", "I count 3 rings but...") would record the wrong one.
+STOP_PATTERNS = {
+    "bbbp": answer_only(r"yes|no"),
+    "aromatic-rings": answer_only(r"\d+", end=r"\.?[ \t]*\n"),
+    "ring-count": answer_only(r"\d+", end=r"\.?[ \t]*\n"),
+    "hbond": answer_only(r"donors?\s*[=:]\s*\d+\s*,\s*acceptors?\s*[=:]\s*\d+"),
+    "func-group": answer_only(rf"{_GROUP}(?:\s*,\s*{_GROUP})*", end=r"\.?[ \t]*\n"),
+}
+
+
+def answer_strings(task):
+    """Every well-formed answer for a task, or None if the answer space is open."""
+    counts = [str(n) for n in range(MAX_COUNT + 1)]
+    if task == "bbbp":
+        return ["yes", "no"]
+    if task in ("aromatic-rings", "ring-count"):
+        return counts
+    if task == "hbond":
+        return [f"donors={d}, acceptors={a}" for d in counts for a in counts]
+    if task == "func-group":
+        subsets = itertools.chain.from_iterable(
+            itertools.combinations(FUNC_GROUPS, k) for k in range(1, len(FUNC_GROUPS) + 1)
+        )
+        return [", ".join(s) for s in subsets]
+    return None
+
+
+class AnswerTrie:
+    """Token-id prefix tree over a task's answer strings, ending each answer at EOS."""
+
+    def __init__(self, tokenizer, strings):
+        self.eos_token_id = tokenizer.eos_token_id
+        self.root = {}
+        self.depth = 0
+        for s in strings:
+            ids = tokenizer(s, add_special_tokens=False).input_ids + [self.eos_token_id]
+            self.depth = max(self.depth, len(ids))
+            node = self.root
+            for token_id in ids:
+                node = node.setdefault(token_id, {})
+
+    def allowed(self, prefix):
+        node = self.root
+        for token_id in prefix:
+            if token_id not in node:
+                # Off the trie (only reachable after EOS padding): keep emitting EOS.
+                return [self.eos_token_id]
+            node = node[token_id]
+        return list(node) or [self.eos_token_id]
+
+
+class AnswerStoppingCriteria(StoppingCriteria):
+    """Stops each row once its decoded reply is a complete answer."""
+
+    def __init__(self, tokenizer, pattern, prompt_len):
+        self.tokenizer = tokenizer
+        self.pattern = pattern
+        self.prompt_len = prompt_len
+
+    def __call__(self, input_ids, scores, **kwargs):
+        done = [
+            bool(self.pattern.fullmatch(self.tokenizer.decode(row[self.prompt_len:], skip_special_tokens=True)))
+            for row in input_ids
+        ]
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+
+class Decoding:
+    """Per-task generate() settings: token budget, answer stopping and answer constraint."""
+
+    def __init__(self, tokenizer, task, max_new_tokens, stop_on_answer=False, constrain=False):
+        self.tokenizer = tokenizer
+        self.max_new_tokens = max_new_tokens
+        self.pattern = STOP_PATTERNS.get(task) if stop_on_answer else None
+        strings = answer_strings(task) if constrain else None
+        self.trie = AnswerTrie(tokenizer, strings) if strings else None
+        if self.trie:
+            # The answer format bounds the reply length, so the budget follows from it.
+            self.max_new_tokens = min(max_new_tokens, self.trie.depth)
+
+    def generate_kwargs(self, prompt_len):
+        kwargs = {"max_new_tokens": self.max_new_tokens}
+        if self.pattern:
+            kwargs["stopping_criteria"] = StoppingCriteriaList(
+                [AnswerStoppingCriteria(self.tokenizer, self.pattern, prompt_len)]
+            )
+        if self.trie:
+            trie = self.trie
+            kwargs["prefix_allowed_tokens_fn"] = lambda batch_id, ids: trie.allowed(ids[prompt_len:].tolist())
+        return kwargs
@@ -0,0 +1,217 @@
+"""
+Performance instrumentation for hf_runner.py, plus a cost-table aggregator.
+
+Every result record carries a "perf" block (prompt/generated tokens, prefill and
+decode time, tokens/sec, peak memory) and every result file a run-level "perf"
+summary. Running this module collects those summaries from results/*.json into
+results/cost.json, one row per run/task/condition, where the run is the result
+file's tag: the model plus any variant suffix (_loglik, _molecule-last, _n5, ...).
+
+In a batched run (--batch-size > 1) every row of a batch shares one generate()
+call, so a row's prefillMs/decodeMs are the whole batch's times (the latency that
+row saw) and its tokensPerSec is its own tokens over the batch's decode time, an
+understatement of throughput. The run-level generatedTokensPerSec is the one to
+compare across batch sizes.
+
+Usage:
+  python src/eval/hf_perf.py
+"""
+
+import glob
+import json
+import math
+import os
+import resource
+import sys
+import time
+
+import torch
+from transformers import StoppingCriteria
+
+from hf_scoring import parse_filename
+
+COST_FILE = os.path.join("results", "cost.json")
+
+
+class StepTimer(StoppingCriteria):
+    """
+    Never stops generation; records when the first token is ready, which splits a
+    generate() call into prefill (prompt forward pass) and decode (remaining steps).
+    """
+
+    def __init__(self, device):
+        self.device = device
+        self.start = None
+        self.first_token = None
+
+    def begin(self):
+        reset_peak_memory(self.device)
+        self.start = time.perf_counter()
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.first_token is None:
+            synchronize(self.device)
+            self.first_token = time.perf_counter()
+        return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
+    def finish(self):
+        """(prefill_ms, decode_ms) for the call; all time is prefill if no step ran."""
+        synchronize(self.device)
+        end = time.perf_counter()
+        first = self.first_token or end
+        return (first - self.start) * 1000, (end - first) * 1000
+
+
+class ForwardCounter:
+    """Counts forward passes of a model during generate(), e.g. target vs draft in assisted decoding."""
+
+    def __init__(self, model):
+        self.calls = 0
+        self.handle = model.register_forward_hook(self._hook)
+
+    def _hook(self, module, args, output):
+        self.calls += 1
+
+    def remove(self):
+        self.handle.remove()
+
+
+def draft_perf(generated_tokens, target_forwards, draft_forwards):
+    """
+    Assisted-decoding counters for one row. Each target forward verifies the drafted
+    tokens and adds one of its own, so tokens beyond the target forward count were
+    accepted drafts; each draft forward proposes one token.
+    """
+    accepted = max(0, generated_tokens - target_forwards)
+    return {
+        "targetForwards": target_forwards,
+        "draftForwards": draft_forwards,
+        "draftAcceptanceRate": round(accepted / draft_forwards, 4) if draft_forwards else 0,
+    }
+
+
+def draft_summary(perfs):
+    """Acceptance across rows, or {} when no row used a draft model."""
+    drafted = [p for p in perfs if "draftForwards" in p]
+    if not drafted:
+        return {}
+    generated = sum(p["generatedTokens"] for p in drafted)
+    target_forwards = sum(p["targetForwards"] for p in drafted)
+    draft_forwards = sum(p["draftForwards"] for p in drafted)
+    return {
+        "draftAcceptanceRate": round(max(0, generated - target_forwards) / draft_forwards, 4) if draft_forwards else 0,
+        "tokensPerTargetForward": round(generated / target_forwards, 2) if target_forwards else 0,
+    }
+
+
+def synchronize(device):
+    if torch.device(device).type == "cuda":
+        torch.cuda.synchronize(device)
+
+
+def reset_peak_memory(device):
+    if torch.device(device).type == "cuda":
+        torch.cuda.reset_peak_memory_stats(device)
+
+
+def peak_memory_mb(device):
+    """Peak CUDA allocation since the last reset, or the process's peak RSS on CPU."""
+    if torch.device(device).type == "cuda":
+        return torch.cuda.max_memory_allocated(device) / 2**20
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+
+def row_perf(prompt_tokens, generated_tokens, prefill_ms, decode_ms, peak_mb):
+    """Per-row perf block; for a batched row the times are the whole batch's (see module docstring)."""
+    return {
+        "promptTokens": prompt_tokens,
+        "generatedTokens": generated_tokens,
+        "prefillMs": round(prefill_ms, 2),
+        "decodeMs": round(decode_ms, 2),
+        "tokensPerSec": round(generated_tokens / (decode_ms / 1000), 2) if decode_ms > 0 else 0,
+        "peakMemoryMb": round(peak_mb, 1),
+    }
+
+
+def percentile(values, q):
+    """Nearest-rank percentile; 0 for an empty list."""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def run_summary(records, wall_seconds=None):
+    """
+    Run-level perf block from the per-row perf of every record that has one. Without a
+    wall time of its own (a --matrix file, whose rows interleave with every other
+    file's), wallSeconds and generatedTokensPerSec are left out rather than guessed.
+    """
+    perfs = []
+    for r in records:
+        perfs.extend(p for p in (r.get("relabelPerf"), r.get("perf")) if p)
+    latencies = [p["prefillMs"] + p["decodeMs"] for p in perfs]
+    prompt_tokens = sum(p["promptTokens"] for p in perfs)
+    generated_tokens = sum(p["generatedTokens"] for p in perfs)
+    summary = {
+        "rows": len(records),
+        "calls": len(perfs),
+        "promptTokens": prompt_tokens,
+        "generatedTokens": generated_tokens,
+        "latencyP50Ms": round(percentile(latencies, 50), 2),
+        "latencyP95Ms": round(percentile(latencies, 95), 2),
+        "prefillP50Ms": round(percentile([p["prefillMs"] for p in perfs], 50), 2),
+        "prefillP95Ms": round(percentile([p["prefillMs"] for p in perfs], 95), 2),
+        "peakMemoryMb": max((p["peakMemoryMb"] for p in perfs), default=0),
+        **draft_summary(perfs),
+    }
+    if wall_seconds is not None:
+        summary["wallSeconds"] = round(wall_seconds, 2)
+        summary["generatedTokensPerSec"] = round(generated_tokens / wall_seconds, 2) if wall_seconds > 0 else 0
+    return summary
+
+
+def cost_table(results_dir="results"):
+    """
+    {run: {task: {condition: perf summary}}} for every result file that has a run-level
+    perf block; run is the file's tag (model plus variant suffixes), or the model id
+    for an untagged file, so variants of one model never overwrite each other.
+    """
+    table = {}
+    # Columnar results keep the run-level blocks in meta.json, so no rows are read.
+    paths = glob.glob(os.path.join(results_dir, "*.json")) + glob.glob(os.path.join(results_dir, "*.cols", "meta.json"))
+    for path in sorted(paths):
+        with open(path) as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or "perf" not in data:
+            continue
+        if path.endswith(os.path.join(".cols", "meta.json")):
+            path = os.path.dirname(path)
+        parsed = parse_filename(path)
+        if parsed is None:
+            continue
+        task, condition, tag = parsed
+        run = tag or data.get("model", "unknown")
+        table.setdefault(run, {}).setdefault(task, {})[condition] = data["perf"]
+    return table
+
+
+def main():
+    table = cost_table()
+    with open(COST_FILE, "w") as f:
+        json.dump(table, f, indent=2)
+
+    print(f"{'run':<32} {'task':<16} {'condition':<14} {'prompt tok':>10} {'gen tok':>8} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'tok/s':>8}")
+    for run, tasks in table.items():
+        for task, conditions in tasks.items():
+            for condition, perf in conditions.items():
+                print(f"{run:<32} {task:<16} {condition:<14} {perf['promptTokens']:>10} {perf['generatedTokens']:>8} "
+                      f"{perf['latencyP50Ms']:>9} {perf['latencyP95Ms']:>9} {perf.get('generatedTokensPerSec', '-'):>8}")
+    print(f"\nWrote {COST_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Whole-matrix job planner for hf_runner.py --plan / --matrix.
+
+Expands TASKS x CONDITIONS x rows into one job list and dedupes byte-identical
+prompts before anything is generated:
+
+  relabel   the relabel prompt depends only on a row's code, so a molecule that
+            appears in several datasets is relabeled once for all of them
+  answer    the task prompt is generated once per distinct text, e.g. for a
+            molecule repeated within a dataset
+
+The unique answer prompts of every task/condition then go through one
+generate_many call, so length bucketing packs batches across the whole matrix,
+and each response is fanned back out to the per-file JSONL writers. Records that
+reuse another row's response are marked "deduplicated" and carry no perf block,
+so run-level cost is not double-counted.
+"""
+
+import time
+
+import hf_runner
+from hf_results import done_indices, result_complete, result_exists
+
+# Rough chars-per-token for the dry-run estimate; the exact count needs the tokenizer.
+CHARS_PER_TOKEN = 4
+
+
+class MatrixPlan:
+    """
+    Every pending (file, index) job of a run, keyed by the prompt it needs.
+
+    files     {filename: (task, condition)} in run order
+    answers   {prompt: [(filename, index)]} for smiles/code jobs
+    relabels  {code: [(filename, index)]} for code+relabel jobs, whose answer
+              prompt is only known once the relabel is generated
+    rows      {(filename, index): dataset row}
+    """
+
+    def __init__(self, molecule_last=False):
+        self.molecule_last = molecule_last
+        self.files = {}
+        self.answers = {}
+        self.relabels = {}
+        self.rows = {}
+
+    def add(self, filename, task, condition, dataset, done=()):
+        self.files[filename] = (task, condition)
+        for i, row in enumerate(dataset):
+            if i in done:
+                continue
+            job = (filename, i)
+            self.rows[job] = row
+            if condition == "code+relabel":
+                self.relabels.setdefault(row["code"], []).append(job)
+            else:
+                prompt = hf_runner.get_prompt(task, condition, row, self.molecule_last)
+                self.answers.setdefault(prompt, []).append(job)
+
+    def jobs(self):
+        return len(self.rows)
+
+    def summary(self, decode_budget):
+        """Job and unique-prompt counts, with a chars/CHARS_PER_TOKEN estimate of the token volume."""
+        relabel_chars = sum(len(hf_runner.PROMPTS["relabel"].format(code=code)) for code in self.relabels)
+        # Relabeled code is about as long as the original, so its answer prompt is estimated from the code condition.
+        relabel_answers = {
+            hf_runner.get_prompt(self.files[f][0], "code", self.rows[(f, i)], self.molecule_last)
+            for jobs in self.relabels.values()
+            for f, i in jobs
+        }
+        prompt_chars = relabel_chars + sum(len(p) for p in self.answers) + sum(len(p) for p in relabel_answers)
+        calls = len(self.relabels) + len(self.answers) + len(relabel_answers)
+        return {
+            "files": len(self.files),
+            "jobs": self.jobs(),
+            "uniqueAnswerPrompts": len(self.answers) + len(relabel_answers),
+            "uniqueRelabels": len(self.relabels),
+            "relabelJobs": sum(len(jobs) for jobs in self.relabels.values()),
+            "estPromptTokens": prompt_chars // CHARS_PER_TOKEN,
+            "maxDecodeTokens": calls * decode_budget,
+        }
+
+
+def plan_matrix(tasks, conditions, load_dataset, filename_for, limit=None, skip_existing=False, resume=False,
+                molecule_last=False):
+    """
+    MatrixPlan for every task/condition file. Existing files are left out with
+    skip_existing, and with resume finished files and rows already streamed
+    to a file's JSONL or compacted result.
+    """
+    plan = MatrixPlan(molecule_last)
+    for task in tasks:
+        dataset = load_dataset(task)
+        if limit:
+            dataset = dataset[:limit]
+        for condition in conditions:
+            filename = filename_for(task, condition)
+            if skip_existing and result_exists(filename):
+                continue
+            done = set()
+            if resume:
+                if result_complete(filename, len(dataset)):
+                    continue
+                done = done_indices(filename)
+            plan.add(filename, task, condition, dataset, done)
+    return plan
+
+
+def print_plan(plan, decode_budget):
+    summary = plan.summary(decode_budget)
+    print(f"{'file':<60} {'jobs':>6}")
+    counts = {}
+    for filename, _ in plan.rows:
+        counts[filename] = counts.get(filename, 0) + 1
+    for filename in plan.files:
+        print(f"{filename:<60} {counts.get(filename, 0):>6}")
+    print(f"\n{summary['jobs']} jobs over {summary['files']} files")
+    print(f"  relabel: {summary['relabelJobs']} jobs -> {summary['uniqueRelabels']} unique prompts")
+    print(f"  answer:  {summary['jobs']} jobs -> {summary['uniqueAnswerPrompts']} unique prompts")
+    print(f"  ~{summary['estPromptTokens']} prompt tokens, at most {summary['maxDecodeTokens']} decode tokens "
+          f"({decode_budget} per call)")
+    return summary
+
+
+def run_matrix(model, tokenizer, plan, writers, batch_size=1, relabel_store=None, stop_on_answer=False,
+               constrain=False, samples=1):
+    """
+    Run every job of the plan and append its record to writers[filename].
+    Returns the wall time of the whole matrix. Rows of all files interleave, so no
+    single file has a wall time of its own.
+    """
+    from hf_decoding import Decoding
+
+    started = time.perf_counter()
+    answers = {prompt: list(jobs) for prompt, jobs in plan.answers.items()}
+    relabeled = {}
+    relabel_perf = {}
+
+    def emit(job, answer, perf=None, duplicate=False):
+        filename, i = job
+        record = hf_runner.build_record(i, answer, relabeled.get(job), perf=perf,
+                                        relabel_perf=relabel_perf.get(job))
+        if duplicate:
+            record["deduplicated"] = True
+        writers[filename].write(record)
+
+    if plan.relabels:
+        codes = list(plan.relabels)
+        unique = {k: {"code": code} for k, code in enumerate(codes)}
+        unique_perf = {}
+        responses = hf_runner.relabel_rows(model, tokenizer, unique, batch_size, relabel_store, desc="matrix relabel",
+                                           perf=unique_perf)
+        for k, code in enumerate(codes):
+            for n, job in enumerate(plan.relabels[code]):
+                if isinstance(responses[k], Exception):
+                    emit(job, responses[k])
+                    continue
+                relabeled[job] = responses[k]
+                if n == 0 and k in unique_perf:
+                    relabel_perf[job] = unique_perf[k]
+                task = plan.files[job[0]][0]
+                prompt = hf_runner.get_prompt(task, "code", {**plan.rows[job], "code": responses[k]},
+                                              plan.molecule_last)
+                answers.setdefault(prompt, []).append(job)
+
+    # Decoding only differs between tasks when it stops on or constrains the task's answer.
+    groups = {}
+    for prompt, jobs in answers.items():
+        key = plan.files[jobs[0][0]][0] if stop_on_answer or constrain else None
+        groups.setdefault(key, []).append(prompt)
+
+    for task, prompts in groups.items():
+        decoding = Decoding(tokenizer, task, hf_runner.MAX_TOKENS, stop_on_answer, constrain)
+        indexed = dict(enumerate(prompts))
+        perf = {}
+
+        def fan_out(k, answer):
+            for n, job in enumerate(answers[indexed[k]]):
+                emit(job, answer, perf.get(k) if n == 0 else None, duplicate=n > 0)
+
+        hf_runner.generate_many(model, tokenizer, indexed, batch_size, desc=f"matrix {task or 'answer'}",
+                                decoding=decoding, on_response=fan_out, perf=perf, samples=samples)
+
+    return time.perf_counter() - started
@@ -0,0 +1,148 @@
+"""
+Result files for hf_runner.py.
+
+Rows are appended to results/<name>.jsonl as they finish, so a crash keeps
+everything written so far. compact_results() turns the JSONL into the
+{"model", "results"} JSON file that score-results.js reads, and/or its columnar
+copy (see hf_columns.py). With --resume, reopen_results() turns a compacted
+result back into a JSONL so a resumed run keeps its finished rows.
+"""
+
+import json
+import os
+
+
+def jsonl_path(json_path):
+    return os.path.splitext(json_path)[0] + ".jsonl"
+
+
+def read_jsonl(path):
+    """Records from a JSONL file, ignoring a torn last line left by a crash."""
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return records
+
+
+class JsonlResultWriter:
+    """Appends one JSON record per line, flushing and fsyncing every sync_every rows."""
+
+    def __init__(self, path, resume=False, sync_every=16):
+        self.path = path
+        self.resume = resume
+        self.sync_every = sync_every
+        self.pending = 0
+        records = read_jsonl(path) if resume else []
+        # Error rows are retried on resume; compaction keeps the latest record per index.
+        self.done = {r["index"] for r in records if "error" not in r}
+        self.f = open(path, "w" if not resume else "a+")
+        if resume:
+            self._truncate_torn_tail()
+
+    def _truncate_torn_tail(self):
+        self.f.seek(0)
+        content = self.f.read()
+        end = content.rfind("\n") + 1
+        if end != len(content):
+            self.f.truncate(len(content[:end].encode("utf-8")))
+        self.f.seek(0, os.SEEK_END)
+
+    def write(self, record):
+        self.f.write(json.dumps(record) + "\n")
+        self.pending += 1
+        if self.pending >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.pending = 0
+
+    def close(self):
+        self.sync()
+        self.f.close()
+
+
+RESULT_FORMATS = ["json", "columns", "both"]
+
+
+def columns_path(json_path):
+    return os.path.splitext(json_path)[0] + ".cols"
+
+
+def result_exists(json_path):
+    """Whether a run already wrote this result, as JSON or as columns."""
+    return os.path.exists(json_path) or os.path.exists(os.path.join(columns_path(json_path), "meta.json"))
+
+
+def read_results(json_path):
+    """Records of a compacted result, from the JSON or else the columns; [] if there is none."""
+    if os.path.exists(json_path):
+        with open(json_path) as f:
+            return json.load(f)["results"]
+    if os.path.exists(os.path.join(columns_path(json_path), "meta.json")):
+        import hf_columns
+
+        return hf_columns.ColumnStore(columns_path(json_path)).records()
+    return []
+
+
+def done_indices(json_path):
+    """
+    Non-error row indices a --resume run can skip: those in the JSONL of an
+    unfinished run, or else those of the compacted result.
+    """
+    partial = jsonl_path(json_path)
+    records = read_jsonl(partial) if os.path.exists(partial) else read_results(json_path)
+    return {r["index"] for r in records if "error" not in r}
+
+
+def result_complete(json_path, rows):
+    """Whether a compacted result, with no unfinished JSONL, has a non-error row for each of the first rows indices."""
+    return not os.path.exists(jsonl_path(json_path)) and done_indices(json_path).issuperset(range(rows))
+
+
+def reopen_results(json_path):
+    """Copy a compacted result's rows back into its JSONL, unless a JSONL is already there."""
+    partial = jsonl_path(json_path)
+    if os.path.exists(partial):
+        return
+    records = read_results(json_path)
+    if not records:
+        return
+    tmp = partial + ".tmp"
+    with open(tmp, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    os.replace(tmp, partial)
+
+
+def compact_results(path, json_path, model_id, summarize=None, result_format="json"):
+    """
+    Write the JSONL rows as {"model", "results"} JSON ordered by index, then drop the JSONL.
+    summarize(results), when given, adds a run-level "perf" block.
+    result_format "columns" writes the columnar copy (<name>.cols/) instead, "both" writes both.
+    """
+    by_index = {r["index"]: r for r in read_jsonl(path)}
+    results = [by_index[i] for i in sorted(by_index)]
+    output = {"model": model_id, "results": results}
+    if summarize:
+        output["perf"] = summarize(results)
+    if result_format in ("json", "both"):
+        tmp = json_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(output, f, indent=2)
+        os.replace(tmp, json_path)
+    if result_format in ("columns", "both"):
+        import hf_columns
+
+        blocks = {k: v for k, v in output.items() if k not in ("model", "results")}
+        hf_columns.write_columns(results, columns_path(json_path), model_id, **blocks)
+    os.remove(path)
+    return results
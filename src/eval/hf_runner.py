@@ -1,28 +1,65 @@
 """
 Local HuggingFace model runner for smiles-js-eval.
-Loads model with 4-bit quantization, runs inference on GPU.
+Loads model with 4-bit quantization on GPU, or on CPU via --backend cpu (see hf_backends.py).
 JS scoring module handles scoring separately.
 
 Usage (run via conda):
   conda run -n base python src/eval/hf_runner.py --task ring-count --condition smiles --limit 5
   conda run -n base python src/eval/hf_runner.py --task ring-count
+  conda run -n base python src/eval/hf_runner.py --task bbbp --batch-size 16
+  conda run -n base python src/eval/hf_runner.py --task bbbp --scoring loglik
+  conda run -n base python src/eval/hf_runner.py --task hbond --stop-on-answer --constrain
+  conda run -n base python src/eval/hf_runner.py --task func-group --condition code+relabel --resume
+  conda run -n base python src/eval/hf_runner.py --task func-group --condition code --prefix-cache --molecule-last
+  conda run -n base python src/eval/hf_runner.py --task hbond --samples 5
+  conda run -n base python src/eval/hf_runner.py --condition code+relabel --draft-model Qwen/Qwen2.5-1.5B-Instruct
+  conda run -n base python src/eval/hf_runner.py --model Qwen/Qwen2.5-1.5B-Instruct --backend cpu --cpu-dtype int8 --cpu-cores 0-15
+  conda run -n base python src/eval/hf_runner.py --backend cpu --workers 8
+  conda run -n base python src/eval/hf_runner.py --skip-existing --dry-run
+  conda run -n base python src/eval/hf_runner.py --plan
+  conda run -n base python src/eval/hf_runner.py --results-format both
+  conda run -n base python src/eval/hf_runner.py --matrix --batch-size 16
   conda run -n base python src/eval/hf_runner.py
+  conda run -n base python src/eval/hf_runner.py serve --model Qwen/Qwen2.5-1.5B-Instruct
+  conda run -n base python src/eval/hf_runner.py snapshot --model Qwen/Qwen2.5-7B-Instruct   # once, for fast startup
+  python src/eval/hf_perf.py    # cross-model/condition cost table -> results/cost.json
+  python src/eval/hf_tokens.py  # pre-tokenize every task/condition, print prompt-length stats
+  python src/eval/hf_scoring.py # scores with paired-bootstrap 95% CIs -> results/summary.json
+  python src/eval/hf_columns.py to-json results/*.cols   # JSON export of columnar results
 """
 
 import argparse
+import copy
+import fcntl
+import hashlib
 import json
 import os
 import sys
+import time
 
-import torch
-from tqdm import tqdm
-from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig
+import hf_backends
+from hf_results import (RESULT_FORMATS, JsonlResultWriter, compact_results, done_indices, jsonl_path, reopen_results,
+                        result_complete, result_exists)
+
+# torch, transformers, tqdm and the modules built on them (hf_decoding, hf_perf) are
+# imported where a model is used, so --help, --dry-run, --plan and runs that skip
+# every file start without them.
 
 DEFAULT_MODEL = "Qwen/Qwen2.5-7B-Instruct"
 MAX_TOKENS = 1024
+TEMPERATURE = 0.1
+RELABEL_CACHE_DIR = os.path.join("cache", "relabels")
+TOKEN_CACHE_DIR = os.path.join("cache", "tokens")
 
 TASKS = ["bbbp", "func-group", "aromatic-rings", "hbond"]
 CONDITIONS = ["smiles", "code", "code+relabel"]
+SCORING_MODES = ["generate", "loglik"]
+
+# Closed answer spaces for --scoring loglik; other tasks always generate.
+LOGLIK_CANDIDATES = {
+    "bbbp": ["yes", "no"],
+    "aromatic-rings": [str(n) for n in range(11)],
+}
 
 PROMPTS = {
     "bbbp": 'Does the following molecule penetrate the blood-brain barrier?\n\n{molecule}\n\nRespond with "yes" or "no".\n\nAnswer:',
@@ -32,107 +69,765 @@ PROMPTS = {
     "hbond": "How many hydrogen bond donors and hydrogen bond acceptors does this molecule have?\n\n{molecule}\n\nRespond in the format: donors=X, acceptors=Y\n\nAnswer:",
 }
 
+# Same instructions with the molecule moved to the end, so everything before it is a
+# prefix shared by every row and its KV cache can be computed once (--molecule-last).
+MOLECULE_LAST_PROMPTS = {
+    "bbbp": 'Does the molecule below penetrate the blood-brain barrier? Respond with "yes" or "no".\n\n{molecule}\n\nAnswer:',
+    "func-group": 'Which of the following functional groups are present in the molecule below?\n\nPossible groups: hydroxyl (-OH), carboxyl (-COOH), amine (-NH2), amide (-C(=O)NH-), ester (-C(=O)O-C), ether (C-O-C), nitro (-NO2), halide (-F/-Cl/-Br/-I)\n\nRespond with ONLY a comma-separated list of the group names that are present. For example: hydroxyl, amine, halide\n\n{molecule}\n\nAnswer:',
+    "aromatic-rings": "How many aromatic rings are in the molecule below? Respond with a single integer.\n\n{molecule}\n\nAnswer:",
+    "hbond": "How many hydrogen bond donors and hydrogen bond acceptors does the molecule below have? Respond in the format: donors=X, acceptors=Y\n\n{molecule}\n\nAnswer:",
+}
+
+
+def generation_params():
+    return {"max_new_tokens": MAX_TOKENS, "temperature": TEMPERATURE, "do_sample": True}
+
+
+class RelabelStore:
+    """
+    Persistent relabel outputs for one model, keyed by a hash of the molecule code.
+    The relabel prompt does not depend on the task, so every task's code+relabel
+    pass can share one entry per molecule. The file is discarded when the model
+    id or generation params differ from the ones it was built with.
+    """
+
+    def __init__(self, model_id, params, cache_dir=RELABEL_CACHE_DIR):
+        self.model_id = model_id
+        self.params = params
+        model_tag = model_id.split("/")[-1].lower()
+        self.path = os.path.join(cache_dir, f"{model_tag}.json")
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                stored = json.load(f)
+            if stored.get("model") == model_id and stored.get("params") == params:
+                self.entries = stored["entries"]
+            else:
+                print(f"  Relabel cache {self.path} built with other model/params, evicting")
+
+    @staticmethod
+    def key(code):
+        return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+    def get(self, code):
+        return self.entries.get(self.key(code))
 
-def load_model(model_id):
-    print(f"Loading {model_id} with 4-bit quantization...")
-    bnb_config = BitsAndBytesConfig(
-        load_in_4bit=True,
-        bnb_4bit_compute_dtype=torch.float16,
-        bnb_4bit_quant_type="nf4",
-    )
-    tokenizer = AutoTokenizer.from_pretrained(model_id)
-    model = AutoModelForCausalLM.from_pretrained(
-        model_id,
-        quantization_config=bnb_config,
-        device_map="auto",
-    )
+    def put(self, code, relabeled):
+        self.entries[self.key(code)] = relabeled
+
+    def save(self):
+        """Merge with entries other processes (--workers) saved meanwhile, then replace the file."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if os.path.exists(self.path):
+                with open(self.path) as f:
+                    stored = json.load(f)
+                if stored.get("model") == self.model_id and stored.get("params") == self.params:
+                    self.entries = {**stored["entries"], **self.entries}
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"model": self.model_id, "params": self.params, "entries": self.entries}, f)
+            os.replace(tmp, self.path)
+
+
+def load_model(model_id, backend="auto", **options):
+    """Load through one of hf_backends.BACKENDS; options go to the backend (cpu_dtype, threads, cores)."""
+    model, tokenizer = hf_backends.load(model_id, backend, **options)
     print(f"Model loaded. Device: {model.device}")
     return model, tokenizer
 
 
+def add_backend_args(parser):
+    parser.add_argument("--backend", choices=hf_backends.BACKENDS, default="auto",
+                        help="cuda-nf4 (bitsandbytes 4-bit) or cpu; auto picks cuda-nf4 when a GPU is visible")
+    parser.add_argument("--cpu-dtype", choices=hf_backends.CPU_DTYPES, default="bfloat16",
+                        help="CPU backend weights; int8 dynamically quantizes every Linear layer")
+    parser.add_argument("--threads", type=int, default=None, help="CPU backend torch threads (default: usable cores)")
+    parser.add_argument("--cpu-cores", type=str, default=None, help="CPU backend core affinity, e.g. 0-15")
+    parser.add_argument("--snapshot-dir", type=str, default=hf_backends.SNAPSHOT_DIR,
+                        help="Where `snapshot` saves converted weights and where loading looks for them")
+    parser.add_argument("--no-snapshot", action="store_true", help="Load the original checkpoint even if a snapshot exists")
+
+
+def backend_options(args):
+    return {
+        "cpu_dtype": args.cpu_dtype,
+        "threads": args.threads,
+        "cores": args.cpu_cores,
+        "snapshot_dir": None if args.no_snapshot else args.snapshot_dir,
+    }
+
+
 def load_dataset(task):
     path = os.path.join("data", f"{task}.json")
     with open(path) as f:
         return json.load(f)
 
 
-def get_prompt(task, condition, row):
+def get_prompt(task, condition, row, molecule_last=False):
     mol = row["smiles"] if condition == "smiles" else row["code"]
-    return PROMPTS[task].format(molecule=mol)
+    template = MOLECULE_LAST_PROMPTS[task] if molecule_last else PROMPTS[task]
+    return template.format(molecule=mol)
 
 
-def generate(model, tokenizer, prompt):
+def chat_text(tokenizer, prompt):
     messages = [{"role": "user", "content": prompt}]
-    text = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-    inputs = tokenizer(text, return_tensors="pt").to(model.device)
+    return tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+
+
+class PrefixCache:
+    """
+    KV cache for the token prefix every prompt of a task/condition shares (chat template
+    header plus the instruction text before the molecule). Rows then prefill only their
+    own suffix; in a batch the suffixes are left-padded after the shared prefix.
+    """
+
+    def __init__(self, model, tokenizer, prompts):
+        import torch
+
+        ids = [tokenizer(chat_text(tokenizer, p)).input_ids for p in prompts]
+        shortest = min(len(row) for row in ids) if ids else 0
+        size = 0
+        # Leave at least one suffix token per row so generate() has something to prefill.
+        while size < shortest - 1 and len({row[size] for row in ids}) == 1:
+            size += 1
+        self.prefix_ids = ids[0][:size] if size else []
+        self.cache = None
+        if self.prefix_ids:
+            with torch.no_grad():
+                prefix = torch.tensor([self.prefix_ids], device=model.device)
+                self.cache = model(input_ids=prefix, use_cache=True).past_key_values
+
+    def inputs(self, tokenizer, texts, device):
+        """Prefix + left-padded suffix ids, or None if some text does not start with the prefix."""
+        import torch
+
+        if self.cache is None:
+            return None
+        size = len(self.prefix_ids)
+        ids = [tokenizer(t).input_ids for t in texts]
+        if any(row[:size] != self.prefix_ids or len(row) <= size for row in ids):
+            return None
+        width = max(len(row) for row in ids) - size
+        pad_id = tokenizer.pad_token_id
+        input_ids, attention_mask = [], []
+        for row in ids:
+            gap = width - (len(row) - size)
+            input_ids.append(self.prefix_ids + [pad_id] * gap + row[size:])
+            attention_mask.append([1] * size + [0] * gap + [1] * (len(row) - size))
+        cache = copy.deepcopy(self.cache)
+        cache.batch_repeat_interleave(len(texts))
+        return {
+            "input_ids": torch.tensor(input_ids, device=device),
+            "attention_mask": torch.tensor(attention_mask, device=device),
+            "past_key_values": cache,
+        }
+
+
+def generate(model, tokenizer, prompt, decoding=None, stats=None, prefix=None, perf=None, samples=1, draft_model=None,
+             token_ids=None):
+    token_ids = [token_ids] if token_ids is not None else None
+    return generate_batch(model, tokenizer, [prompt], decoding, stats, prefix, perf, samples, draft_model, token_ids)[0]
+
+
+def count_generated(tokens, eos_token_id):
+    """Decode steps spent on one row; rows that finished early are padded with EOS."""
+    hits = (tokens == eos_token_id).nonzero()
+    return int(hits[0]) + 1 if len(hits) else len(tokens)
+
+
+def share_prefill(model, inputs, samples):
+    """
+    Prefill each prompt once (all but its last token) and copy the KV cache `samples`
+    times, so generate() draws N completions without prefilling the prompt N times.
+    """
+    import torch
+
+    input_ids, attention_mask = inputs["input_ids"], inputs["attention_mask"]
+    cache = inputs.get("past_key_values")
+    cached = cache.get_seq_length() if cache is not None else 0
+    # Left padding shifts positions, so derive them from the mask as generate() does.
+    position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)
     with torch.no_grad():
-        outputs = model.generate(
-            **inputs,
-            max_new_tokens=MAX_TOKENS,
-            temperature=0.1,
-            do_sample=True,
-            pad_token_id=tokenizer.eos_token_id,
+        cache = model(
+            input_ids=input_ids[:, cached:-1],
+            attention_mask=attention_mask[:, :-1],
+            position_ids=position_ids[:, cached:-1],
+            past_key_values=cache,
+            use_cache=True,
+        ).past_key_values
+    cache.batch_repeat_interleave(samples)
+    return {
+        "input_ids": input_ids.repeat_interleave(samples, dim=0),
+        "attention_mask": attention_mask.repeat_interleave(samples, dim=0),
+        "past_key_values": cache,
+    }
+
+
+def left_pad(token_ids, pad_token_id, device):
+    """input_ids/attention_mask for pre-tokenized rows, laid out as tokenizer(..., padding=True) with left padding."""
+    import numpy as np
+    import torch
+
+    width = max(len(ids) for ids in token_ids)
+    input_ids = torch.full((len(token_ids), width), pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros_like(input_ids)
+    for j, ids in enumerate(token_ids):
+        if len(ids):
+            # Cached rows are read-only memmap slices; torch.tensor copies instead of aliasing them.
+            input_ids[j, width - len(ids):] = torch.tensor(np.asarray(ids), dtype=torch.long)
+            attention_mask[j, width - len(ids):] = 1
+    return {"input_ids": input_ids.to(device), "attention_mask": attention_mask.to(device)}
+
+
+def generate_batch(model, tokenizer, prompts, decoding=None, stats=None, prefix=None, perf=None, samples=1,
+                   draft_model=None, token_ids=None):
+    """
+    Generate one response per prompt in a single left-padded model.generate call.
+    With a PrefixCache, the shared prefix is taken from its KV cache instead of re-prefilled.
+    With samples > 1, each prompt gets a list of that many completions from one shared prefill.
+    With a draft_model, decoding is assisted (speculative); HF only supports this for a
+    single prompt without a precomputed cache.
+    Per-row perf dicts are appended to `perf` when a list is given.
+    token_ids, when given, are the prompts' cached chat-formatted ids (see hf_tokens.py).
+    """
+    import torch
+    from transformers import StoppingCriteriaList
+
+    from hf_perf import ForwardCounter, StepTimer, draft_perf, peak_memory_mb, row_perf
+
+    if draft_model is not None and (len(prompts) > 1 or samples > 1 or prefix is not None):
+        raise ValueError("Assisted decoding runs one prompt at a time, without prefix cache or samples")
+    texts = [chat_text(tokenizer, p) for p in prompts]
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    inputs = prefix.inputs(tokenizer, texts, model.device) if prefix is not None else None
+    if inputs is None and token_ids is not None:
+        inputs = left_pad(token_ids, tokenizer.pad_token_id, model.device)
+    elif inputs is None:
+        inputs = tokenizer(texts, return_tensors="pt", padding=True).to(model.device)
+    elif stats is not None:
+        stats["prefillTokensSaved"] = stats.get("prefillTokensSaved", 0) + len(prefix.prefix_ids) * len(prompts)
+    prompt_len = inputs["input_ids"].shape[1]
+    params = generation_params()
+    if decoding is not None:
+        params.update(decoding.generate_kwargs(prompt_len))
+    timer = StepTimer(model.device)
+    params["stopping_criteria"] = StoppingCriteriaList([*params.get("stopping_criteria", []), timer])
+    prompt_tokens = inputs["attention_mask"].sum(dim=1).tolist()
+    if draft_model is not None:
+        params["assistant_model"] = draft_model
+        counters = ForwardCounter(model), ForwardCounter(draft_model)
+    timer.begin()
+    if samples > 1:
+        inputs = share_prefill(model, inputs, samples)
+    try:
+        with torch.no_grad():
+            outputs = model.generate(
+                **inputs,
+                **params,
+                pad_token_id=tokenizer.eos_token_id,
+            )
+    finally:
+        if draft_model is not None:
+            for counter in counters:
+                counter.remove()
+    prefill_ms, decode_ms = timer.finish()
+    generated = [count_generated(out[prompt_len:], tokenizer.eos_token_id) for out in outputs]
+    if stats is not None:
+        stats["rows"] += len(outputs)
+        stats["decodeTokens"] += sum(generated)
+    if perf is not None:
+        peak_mb = peak_memory_mb(model.device)
+        perf.extend(
+            row_perf(n, sum(generated[k * samples:(k + 1) * samples]), prefill_ms, decode_ms, peak_mb)
+            for k, n in enumerate(prompt_tokens)
         )
-    response = tokenizer.decode(outputs[0][inputs.input_ids.shape[1]:], skip_special_tokens=True)
-    return response
+        if draft_model is not None:
+            perf[-1].update(draft_perf(generated[0], counters[0].calls, counters[1].calls))
+    texts = [tokenizer.decode(out[prompt_len:], skip_special_tokens=True) for out in outputs]
+    if samples == 1:
+        return texts
+    return [texts[k * samples:(k + 1) * samples] for k in range(len(prompts))]
 
 
-def run_task(model, tokenizer, task, condition, dataset):
-    results = []
+def score_candidates(model, tokenizer, prompt, candidates, perf=None, prompt_ids=None):
+    """
+    Probability of each candidate answer as the assistant's reply, from one batched
+    forward pass over prompt+candidate. Multi-token candidates sum their token log-probs.
+    Each candidate ends with the end-of-turn (EOS) token, so only complete replies are
+    compared: without it "1" would also collect the mass of "10", "12", ...
+    """
+    import torch
+
+    from hf_perf import StepTimer, peak_memory_mb, row_perf
+
+    if prompt_ids is None:
+        prompt_ids = tokenizer(chat_text(tokenizer, prompt)).input_ids
+    prompt_ids = [int(t) for t in prompt_ids]
+    candidate_ids = [tokenizer(c, add_special_tokens=False).input_ids + [tokenizer.eos_token_id] for c in candidates]
+    width = len(prompt_ids) + max(len(ids) for ids in candidate_ids)
+    pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+    input_ids = torch.full((len(candidates), width), pad_id, dtype=torch.long)
+    attention_mask = torch.zeros_like(input_ids)
+    for j, ids in enumerate(candidate_ids):
+        seq = prompt_ids + ids
+        input_ids[j, :len(seq)] = torch.tensor(seq)
+        attention_mask[j, :len(seq)] = 1
+
+    timer = StepTimer(model.device)
+    timer.begin()
+    with torch.no_grad():
+        logits = model(input_ids=input_ids.to(model.device), attention_mask=attention_mask.to(model.device)).logits
+    prefill_ms, _ = timer.finish()
+    if perf is not None:
+        perf.append(row_perf(len(prompt_ids), 0, prefill_ms, 0, peak_memory_mb(model.device)))
+    logprobs = torch.log_softmax(logits.float(), dim=-1)
+
+    totals = []
+    for j, ids in enumerate(candidate_ids):
+        positions = torch.arange(len(prompt_ids) - 1, len(prompt_ids) - 1 + len(ids), device=logprobs.device)
+        targets = torch.tensor(ids, device=logprobs.device)
+        totals.append(logprobs[j, positions, targets].sum())
+    probs = torch.softmax(torch.stack(totals), dim=0)
+    return dict(zip(candidates, probs.tolist()))
+
+
+def score_many(model, tokenizer, prompts, candidates, desc=None, on_response=None, perf=None, token_ids=None):
+    """
+    Candidate probabilities for {index: prompt}; a failed row maps to its Exception.
+    Row perf is stored in the `perf` dict by index when one is given.
+    """
+    from tqdm import tqdm
 
-    for i, row in enumerate(tqdm(dataset, desc=f"{task}/{condition}", unit="row")):
+    scores = {}
+    for i, prompt in tqdm(prompts.items(), desc=desc, unit="row"):
+        row_perfs = []
         try:
-            if condition == "code+relabel":
-                relabel_prompt = PROMPTS["relabel"].format(code=row["code"])
-                relabeled = generate(model, tokenizer, relabel_prompt)
-                task_prompt = get_prompt(task, "code", {**row, "code": relabeled})
-                answer = generate(model, tokenizer, task_prompt)
-                results.append({"index": i, "rawResponse": answer, "relabeled": relabeled, "parsed": None})
-            else:
-                prompt = get_prompt(task, condition, row)
-                answer = generate(model, tokenizer, prompt)
-                results.append({"index": i, "rawResponse": answer, "parsed": None})
+            ids = token_ids[i] if token_ids is not None else None
+            scores[i] = score_candidates(model, tokenizer, prompt, candidates, row_perfs, ids)
         except Exception as e:
-            print(f"  Error on row {i}: {e}", file=sys.stderr)
-            results.append({"index": i, "error": str(e), "parsed": None})
+            scores[i] = e
+        if perf is not None and row_perfs:
+            perf[i] = row_perfs[0]
+        if on_response:
+            on_response(i, scores[i])
+    return scores
+
+
+def length_buckets(tokenizer, prompts, batch_size, token_ids=None):
+    """Split {index: prompt} into batches of indices with similar tokenized length."""
+    if token_ids is not None:
+        lengths = {i: len(token_ids[i]) for i in prompts}
+    else:
+        lengths = {i: len(tokenizer(chat_text(tokenizer, p)).input_ids) for i, p in prompts.items()}
+    order = sorted(prompts, key=lambda i: (lengths[i], i))
+    return [order[k:k + batch_size] for k in range(0, len(order), batch_size)]
+
+
+def generate_many(model, tokenizer, prompts, batch_size=1, desc=None, decoding=None, stats=None, on_response=None,
+                  prefix=None, perf=None, samples=1, draft_model=None, token_ids=None):
+    """
+    Generate responses for {index: prompt}, batching prompts of similar length.
+    token_ids, when given, maps each index to the prompt's cached ids.
+    Returns {index: response}, where a failed row maps to its Exception instead.
+    A failing batch is retried row by row so one bad prompt only fails itself.
+    on_response(index, response) is called as soon as each row's batch finishes,
+    after its perf (if a `perf` dict is given) has been stored by index.
+    """
+    from tqdm import tqdm
+
+    responses = {}
+    with tqdm(total=len(prompts), desc=desc, unit="row") as bar:
+        for bucket in length_buckets(tokenizer, prompts, batch_size, token_ids):
+            try:
+                batch = [prompts[i] for i in bucket]
+                batch_ids = [token_ids[i] for i in bucket] if token_ids is not None else None
+                batch_perf = []
+                outputs = generate_batch(
+                    model, tokenizer, batch, decoding, stats, prefix, batch_perf, samples, draft_model, batch_ids
+                )
+                responses.update(zip(bucket, outputs))
+                if perf is not None:
+                    perf.update(zip(bucket, batch_perf))
+            except Exception as e:
+                if len(bucket) == 1:
+                    responses[bucket[0]] = e
+                else:
+                    for i in bucket:
+                        single_perf = []
+                        try:
+                            responses[i] = generate(
+                                model, tokenizer, prompts[i], decoding, stats, prefix, single_perf, samples, draft_model,
+                                token_ids[i] if token_ids is not None else None,
+                            )
+                            if perf is not None and single_perf:
+                                perf[i] = single_perf[0]
+                        except Exception as row_error:
+                            responses[i] = row_error
+            if on_response:
+                for i in bucket:
+                    on_response(i, responses[i])
+            bar.update(len(bucket))
+    return responses
+
+
+def relabel_rows(model, tokenizer, dataset, batch_size=1, store=None, desc=None, prefix_cache=False, perf=None,
+                 draft_model=None):
+    """
+    Relabel each row's code, reusing and filling the store when one is given.
+    Perf is only recorded for rows that were generated, not store hits.
+    """
+    relabels = {}
+    if store is not None:
+        for i, row in dataset.items():
+            cached = store.get(row["code"])
+            if cached is not None:
+                relabels[i] = cached
+
+    missing = {i: PROMPTS["relabel"].format(code=row["code"]) for i, row in dataset.items() if i not in relabels}
+    if store is not None:
+        print(f"  Relabel cache: {len(relabels)} hits, {len(missing)} to generate")
+
+    def keep(i, relabeled):
+        if store is not None and not isinstance(relabeled, Exception):
+            store.put(dataset[i]["code"], relabeled)
+
+    if missing:
+        prefix = PrefixCache(model, tokenizer, list(missing.values())) if prefix_cache else None
+        relabels.update(generate_many(model, tokenizer, missing, batch_size, desc=desc, on_response=keep, prefix=prefix,
+                                      perf=perf, draft_model=draft_model))
+        if store is not None:
+            store.save()
+    return relabels
+
+
+def build_record(index, answer, relabeled=None, candidates=None, perf=None, relabel_perf=None):
+    """One result row from a response (text, list of samples, candidate probs, or Exception)."""
+    if isinstance(answer, Exception):
+        print(f"  Error on row {index}: {answer}", file=sys.stderr)
+        record = {"index": index, "error": str(answer), "parsed": None}
+    else:
+        record = {"index": index}
+        if candidates:
+            record["rawResponse"] = max(answer, key=answer.get)
+            record["candidateProbs"] = answer
+        elif isinstance(answer, list):
+            record["rawResponse"] = answer[0]
+            record["samples"] = answer
+        else:
+            record["rawResponse"] = answer
+        if relabeled is not None:
+            record["relabeled"] = relabeled
+        record["parsed"] = None
+    if perf is not None:
+        record["perf"] = perf
+    if relabel_perf is not None:
+        record["relabelPerf"] = relabel_perf
+    return record
+
+
+def result_filename(task, condition, model_tag, scoring="generate", molecule_last=False, samples=1, constrain=False,
+                    stop_on_answer=False):
+    scoring_tag = "_loglik" if scoring == "loglik" and task in LOGLIK_CANDIDATES else ""
+    layout_tag = "_molecule-last" if molecule_last else ""
+    samples_tag = f"_n{samples}" if samples > 1 and not scoring_tag else ""
+    # Decoding flags change the answers, so their runs must not share (or --resume into) a default run's file.
+    decoding_tag = "" if scoring_tag else ("_constrained" if constrain else "") + ("_stop" if stop_on_answer else "")
+    return (f"results/{task}_{condition.replace('+', '-')}_{model_tag}"
+            f"{scoring_tag}{layout_tag}{samples_tag}{decoding_tag}.json")
+
+
+def run_task(model, tokenizer, task, condition, dataset, batch_size=1, relabel_store=None, scoring="generate",
+             stop_on_answer=False, constrain=False, writer=None, prefix_cache=False, molecule_last=False, samples=1,
+             draft_model=None, indices=None, token_cache=None):
+    """
+    Run one task/condition over the dataset and return its records in index order.
+    Only rows in `indices` (default: all) are run, and rows listed in writer.done are
+    skipped; every new record is appended to the writer.
+    With samples > 1, records keep every completion in "samples" (the JS scorer
+    majority-votes over them) and rawResponse is the first one.
+    A draft_model turns on assisted decoding, which runs rows one at a time.
+    token_cache is a directory of pre-tokenized prompts (see hf_tokens.py) used for
+    the smiles and code conditions.
+    """
+    from hf_decoding import Decoding
+    from hf_perf import draft_summary
+
+    if draft_model is not None:
+        batch_size, prefix_cache, samples = 1, False, 1
+    desc = f"{task}/{condition}"
+    candidates = LOGLIK_CANDIDATES.get(task) if scoring == "loglik" else None
+    done = writer.done if writer else set()
+    indices = range(len(dataset)) if indices is None else indices
+    pending = {i: dataset[i] for i in indices if i not in done}
+    results = []
+    perf = {}
+    relabel_perf = {}
+
+    def finish(i, answer, relabeled=None):
+        record = build_record(i, answer, relabeled, candidates, perf.get(i), relabel_perf.get(i))
+        results.append(record)
+        if writer:
+            writer.write(record)
+
+    if condition == "code+relabel":
+        relabels = relabel_rows(model, tokenizer, pending, batch_size, relabel_store, desc=f"{desc} relabel",
+                                prefix_cache=prefix_cache, perf=relabel_perf, draft_model=draft_model)
+        prompts = {}
+        for i, row in pending.items():
+            if isinstance(relabels[i], Exception):
+                finish(i, relabels[i])
+            else:
+                prompts[i] = get_prompt(task, "code", {**row, "code": relabels[i]}, molecule_last)
+        on_response = lambda i, answer: finish(i, answer, relabels[i])
+    else:
+        prompts = {i: get_prompt(task, condition, row, molecule_last) for i, row in pending.items()}
+        on_response = finish
+
+    token_ids = None
+    if token_cache and condition != "code+relabel":
+        import hf_tokens
+        token_ids = hf_tokens.load_or_build(tokenizer, task, condition, dataset, molecule_last, token_cache)
+
+    if candidates:
+        score_many(model, tokenizer, prompts, candidates, desc=f"{desc} loglik", on_response=on_response, perf=perf,
+                   token_ids=token_ids)
+    else:
+        decoding = Decoding(tokenizer, task, MAX_TOKENS, stop_on_answer, constrain)
+        prefix = PrefixCache(model, tokenizer, list(prompts.values())) if prefix_cache and prompts else None
+        stats = {"rows": 0, "decodeTokens": 0, "prefillTokensSaved": 0}
+        generate_many(model, tokenizer, prompts, batch_size, desc=desc, decoding=decoding, stats=stats,
+                      on_response=on_response, prefix=prefix, perf=perf, samples=samples, draft_model=draft_model,
+                      token_ids=token_ids)
+        print(f"  Decoded {stats['decodeTokens']} tokens over {stats['rows']} rows "
+              f"(max_new_tokens={decoding.max_new_tokens})")
+        if decoding.pattern or decoding.trie:
+            # An upper bound: rows that would have hit EOS early anyway count as saved too.
+            saved = stats["rows"] * MAX_TOKENS - stats["decodeTokens"]
+            flags = " and ".join(f for f, on in (("--stop-on-answer", decoding.pattern), ("--constrain", decoding.trie))
+                                 if on)
+            print(f"  With {flags}: at most {saved} decode tokens saved vs the {MAX_TOKENS}-token default budget")
+        if prefix is not None:
+            print(f"  Shared prefix of {len(prefix.prefix_ids)} tokens saved "
+                  f"{stats['prefillTokensSaved']} prefill tokens")
 
-    return results
+    if draft_model is not None:
+        for stage, stage_perf in (("relabel", relabel_perf), ("answer", perf)):
+            drafted = draft_summary(stage_perf.values())
+            if drafted:
+                print(f"  Draft {stage}: acceptance {drafted['draftAcceptanceRate']:.1%}, "
+                      f"{drafted['tokensPerTargetForward']} tokens per target forward")
+
+    return sorted(results, key=lambda r: r["index"])
+
+
+def run_matrix(args, plan, model_id, use_relabel_store):
+    """--matrix: one deduplicated job queue over every planned file, then one compaction per file."""
+    import hf_planner
+    from hf_perf import run_summary
+
+    model, tokenizer = load_model(model_id, args.backend, **backend_options(args))
+    relabel_store = RelabelStore(model_id, generation_params(), args.relabel_cache) if use_relabel_store else None
+    os.makedirs("results", exist_ok=True)
+    if args.resume:
+        for filename in plan.files:
+            reopen_results(filename)
+    writers = {filename: JsonlResultWriter(jsonl_path(filename), resume=args.resume) for filename in plan.files}
+    try:
+        wall_seconds = hf_planner.run_matrix(
+            model, tokenizer, plan, writers,
+            batch_size=args.batch_size,
+            relabel_store=relabel_store,
+            stop_on_answer=args.stop_on_answer,
+            constrain=args.constrain,
+            samples=args.samples,
+        )
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    generated_tokens = 0
+    for filename in plan.files:
+        # Per-file throughput would divide one file's tokens by the whole matrix's time, so it is left out.
+        results = compact_results(jsonl_path(filename), filename, model_id, run_summary, args.results_format)
+        summary = run_summary(results)
+        generated_tokens += summary["generatedTokens"]
+        print(f"  Wrote {filename} (p50 {summary['latencyP50Ms']}ms, p95 {summary['latencyP95Ms']}ms)")
+    if wall_seconds > 0:
+        print(f"Matrix: {wall_seconds:.1f}s, {generated_tokens / wall_seconds:.2f} generated tok/s across all files")
 
 
 def main():
+    if sys.argv[1:2] == ["serve"]:
+        import hf_server
+        return hf_server.main(sys.argv[2:])
+    if sys.argv[1:2] == ["snapshot"]:
+        return hf_backends.main(sys.argv[2:])
+
     parser = argparse.ArgumentParser()
     parser.add_argument("--task", choices=TASKS, default=None)
     parser.add_argument("--condition", choices=CONDITIONS, default=None)
     parser.add_argument("--limit", type=int, default=None)
     parser.add_argument("--model", type=str, default=DEFAULT_MODEL)
     parser.add_argument("--skip-existing", action="store_true", help="Skip tasks whose result file already exists")
+    add_backend_args(parser)
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue from the rows already streamed to results/<file>.jsonl")
+    parser.add_argument("--batch-size", type=int, default=1, help="Prompts per generate call, bucketed by token length")
+    parser.add_argument("--scoring", choices=SCORING_MODES, default="generate",
+                        help="loglik ranks the closed answer set of bbbp/aromatic-rings instead of decoding")
+    parser.add_argument("--stop-on-answer", action="store_true",
+                        help="Stop each row as soon as its reply contains a complete answer for the task")
+    parser.add_argument("--constrain", action="store_true",
+                        help="Restrict decoding to the task's answer format (bounded integers, fixed group names)")
+    parser.add_argument("--prefix-cache", action="store_true",
+                        help="Prefill the prompt prefix shared by all rows once and reuse its KV cache")
+    parser.add_argument("--molecule-last", action="store_true",
+                        help="Put the instructions before the molecule so more of each prompt is shared")
+    parser.add_argument("--draft-model", type=str, default=None,
+                        help="Smaller model with the same tokenizer for assisted (speculative) decoding")
+    parser.add_argument("--samples", type=int, default=1,
+                        help="Completions per prompt from one shared prefill, majority-voted at scoring time")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes that each load the model and run one shard of every task/condition")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="List the result files this run would write, skip or resume, then exit")
+    parser.add_argument("--plan", action="store_true",
+                        help="Print the deduplicated job matrix and its estimated token volume, then exit")
+    parser.add_argument("--matrix", action="store_true",
+                        help="Run every task/condition as one deduplicated, length-bucketed job queue")
+    parser.add_argument("--results-format", choices=RESULT_FORMATS, default="json",
+                        help="columns writes results/<file>.cols/ (typed .npy columns, compressed text) "
+                             "instead of JSON; both writes both")
+    parser.add_argument("--token-cache", type=str, default=TOKEN_CACHE_DIR,
+                        help="Directory for pre-tokenized smiles/code prompts (see hf_tokens.py)")
+    parser.add_argument("--no-token-cache", action="store_true", help="Tokenize every prompt at run time")
+    parser.add_argument("--relabel-cache", type=str, default=RELABEL_CACHE_DIR, help="Directory for shared relabel outputs")
+    parser.add_argument("--no-relabel-cache", action="store_true", help="Regenerate relabels for every task")
     args = parser.parse_args()
 
     tasks = [args.task] if args.task else TASKS
     conditions = [args.condition] if args.condition else CONDITIONS
     model_id = args.model
 
-    model, tokenizer = load_model(model_id)
+    if args.draft_model and (args.batch_size > 1 or args.prefix_cache or args.samples > 1):
+        parser.error("--draft-model decodes one row at a time; drop --batch-size, --prefix-cache and --samples")
+
+    if args.matrix and (args.scoring == "loglik" or args.prefix_cache or args.draft_model or args.workers > 1):
+        parser.error("--matrix generates in one process; drop --scoring loglik, --prefix-cache, --draft-model "
+                     "and --workers")
+
     model_tag = model_id.split("/")[-1].lower()
-    os.makedirs("results", exist_ok=True)
+    if args.plan or args.matrix:
+        import hf_planner
 
-    for task in tasks:
-        print(f"\n=== Task: {task} ({model_tag}) ===")
-        dataset = load_dataset(task)
-        if args.limit:
-            dataset = dataset[:args.limit]
+        plan = hf_planner.plan_matrix(
+            tasks, conditions, load_dataset,
+            lambda task, condition: result_filename(task, condition, model_tag, args.scoring, args.molecule_last,
+                                                    args.samples, args.constrain, args.stop_on_answer),
+            limit=args.limit, skip_existing=args.skip_existing, resume=args.resume, molecule_last=args.molecule_last,
+        )
+        hf_planner.print_plan(plan, MAX_TOKENS)
+        if args.plan or args.dry_run or not plan.jobs():
+            return
+
+    run_options = {
+        "batch_size": args.batch_size,
+        "scoring": args.scoring,
+        "stop_on_answer": args.stop_on_answer,
+        "constrain": args.constrain,
+        "prefix_cache": args.prefix_cache,
+        "molecule_last": args.molecule_last,
+        "samples": args.samples,
+        "token_cache": None if args.no_token_cache else args.token_cache,
+    }
+    use_relabel_store = "code+relabel" in conditions and not args.no_relabel_cache
+    if args.matrix:
+        return run_matrix(args, plan, model_id, use_relabel_store)
 
+    files = []
+    for task in tasks:
+        rows = None
         for condition in conditions:
-            filename = f"results/{task}_{condition.replace('+', '-')}_{model_tag}.json"
-            if args.skip_existing and os.path.exists(filename):
-                print(f"\n--- Skipping {condition} (file exists: {filename}) ---")
+            filename = result_filename(task, condition, model_tag, args.scoring, args.molecule_last, args.samples,
+                                       args.constrain, args.stop_on_answer)
+            if args.skip_existing and result_exists(filename):
+                print(f"Skipping {task}/{condition} (file exists: {filename})")
                 continue
-            print(f"\n--- Condition: {condition} ---")
-            results = run_task(model, tokenizer, task, condition, dataset)
+            if args.resume and result_exists(filename):
+                if rows is None:
+                    rows = len(load_dataset(task)[:args.limit] if args.limit else load_dataset(task))
+                if result_complete(filename, rows):
+                    print(f"Skipping {task}/{condition} (complete: {filename})")
+                    continue
+            files.append((task, condition, filename))
+    if args.dry_run:
+        for task, condition, filename in files:
+            done = done_indices(filename) if args.resume else ()
+            action = f"resume ({len(done)} rows done)" if done else "run"
+            print(f"{task}/{condition}: {action} -> {filename}")
+        return
+    if not files:
+        print("Nothing to run")
+        return
+
+    from hf_perf import run_summary
+
+    pool = None
+    if args.workers > 1:
+        import hf_workers
+        pool = hf_workers.WorkerPool(args.workers, model_id, args.backend, backend_options(args), args.draft_model,
+                                     args.relabel_cache if use_relabel_store else None)
+    else:
+        model, tokenizer = load_model(model_id, args.backend, **backend_options(args))
+        draft_model = load_model(args.draft_model, args.backend, **backend_options(args))[0] if args.draft_model else None
+        relabel_store = RelabelStore(model_id, generation_params(), args.relabel_cache) if use_relabel_store else None
+    os.makedirs("results", exist_ok=True)
+
+    datasets = {}
+    for task, condition, filename in files:
+        if task not in datasets:
+            print(f"\n=== Task: {task} ({model_tag}) ===")
+            datasets[task] = load_dataset(task)[:args.limit] if args.limit else load_dataset(task)
+        dataset = datasets[task]
+
+        print(f"\n--- Condition: {condition} ---")
+        if args.scoring == "loglik" and task not in LOGLIK_CANDIDATES:
+            print(f"  {task} has no closed answer set, generating instead of loglik scoring")
+        partial = jsonl_path(filename)
+        if args.resume:
+            reopen_results(filename)
+        writer = JsonlResultWriter(partial, resume=args.resume)
+        if writer.done:
+            print(f"  Resuming: {len(writer.done)} rows already in {partial}")
+        started = time.perf_counter()
+        try:
+            if pool is not None:
+                pool.run(task, condition, dataset, writer, run_options)
+            else:
+                run_task(
+                    model, tokenizer, task, condition, dataset,
+                    relabel_store=relabel_store,
+                    writer=writer,
+                    draft_model=draft_model,
+                    **run_options,
+                )
+        finally:
+            writer.close()
+
+        wall_seconds = time.perf_counter() - started
+        results = compact_results(partial, filename, model_id, lambda records: run_summary(records, wall_seconds),
+                                  args.results_format)
+        print(f"  Wrote {filename}")
+        summary = run_summary(results, wall_seconds)
+        print(f"  p50 {summary['latencyP50Ms']}ms, p95 {summary['latencyP95Ms']}ms, "
+              f"{summary['generatedTokensPerSec']} generated tok/s")
 
-            with open(filename, "w") as f:
-                json.dump({"model": model_id, "results": results}, f, indent=2)
-            print(f"  Wrote {filename}")
+    if pool is not None:
+        pool.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,381 @@
+"""
+Vectorized scoring with paired bootstrap confidence intervals.
+
+Loads every results/<task>_<condition>[_<tag>].json at once, parses responses the
+way src/eval/parse-response.js does (rows the JS scorer already parsed keep their
+"parsed" value; --samples rows are majority-voted), and scores each task/condition
+on the rows every condition of that task has:
+
+  ring-count, aromatic-rings, hbond   exactMatch
+  bbbp                                exactMatch, balancedAccuracy, auc
+  func-group                          f1 (per-row, macro-averaged), exactMatch
+
+Unlike the JS point estimates, parse failures count as wrong answers here, so
+every condition is scored on the same rows and the comparison stays paired.
+smiles-repair needs RDKit for validity and is left to score-results.js.
+
+Each bootstrap resample is a row of a (resamples x rows) count matrix W, so every
+metric is a weighted sum over rows: a mean is W @ x / n, and AUC is
+W_pos @ M @ W_neg with M the fixed positive-vs-negative comparison matrix. All
+conditions of a task share W, which makes condition differences paired.
+
+Each result file's condition gets a "bootstrap" block in results/summary.json
+(results/summary_<tag>.json for tagged runs, as pipeline.js names them) with
+95% intervals, and differences against the smiles condition. A metric that is
+undefined on the scored rows (balanced accuracy or AUC when every row has one
+label) is null, and intervals use only the resamples where it is defined.
+
+Usage:
+  python src/eval/hf_scoring.py
+  python src/eval/hf_scoring.py --resamples 20000 --seed 1
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+
+import numpy as np
+
+RESAMPLES = 10_000
+BASELINE = "smiles"
+
+FG_CANONICAL = {
+    "hydroxyl": "hydroxyl",
+    "oh": "hydroxyl",
+    "carboxyl": "carboxyl",
+    "carboxylic": "carboxyl",
+    "carboxylic acid": "carboxyl",
+    "cooh": "carboxyl",
+    "amine": "amine",
+    "amino": "amine",
+    "nh2": "amine",
+    "amide": "amide",
+    "ester": "ester",
+    "ether": "ether",
+    "nitro": "nitro",
+    "no2": "nitro",
+    "halide": "halide",
+    "halogen": "halide",
+    "fluoride": "halide",
+    "chloride": "halide",
+    "bromide": "halide",
+    "iodide": "halide",
+    "fluoro": "halide",
+    "chloro": "halide",
+    "bromo": "halide",
+    "iodo": "halide",
+}
+
+
+# --- Response parsing (ports of src/eval/parse-response.js) ---
+
+def strip_fences(text):
+    return re.sub(r"```\w*\n?", "", text).replace("```", "").strip()
+
+
+def last_line(text):
+    lines = [line.strip() for line in text.split("\n") if line.strip()]
+    return lines[-1] if lines else ""
+
+
+def parse_integer(response):
+    matches = re.findall(r"(?<!\.)(\b-?\d+\b)(?!\.)", strip_fences(response))
+    return int(matches[-1]) if matches else None
+
+
+def parse_yes_no(response):
+    cleaned = strip_fences(response).lower()
+    line = last_line(cleaned)
+    if re.search(r"\byes\b", line):
+        return "yes"
+    if re.search(r"\bno\b", line):
+        return "no"
+    last_yes, last_no = cleaned.rfind("yes"), cleaned.rfind("no")
+    if last_yes == -1 and last_no == -1:
+        return None
+    return "yes" if last_yes > last_no else "no"
+
+
+def parse_functional_groups(response):
+    cleaned = strip_fences(response).lower()
+    line = last_line(cleaned)
+    candidates = line if "," in line else cleaned
+    found = {canonical for alias, canonical in FG_CANONICAL.items() if alias in candidates}
+    return sorted(found) if found else None
+
+
+def parse_hbond(response):
+    cleaned = strip_fences(response).lower()
+    for donor, acceptor in (
+        (r"donors?\s*[=:]\s*(\d+)", r"acceptors?\s*[=:]\s*(\d+)"),
+        (r"(\d+)\s*(?:hydrogen\s*bond\s*)?donors?", r"(\d+)\s*(?:hydrogen\s*bond\s*)?acceptors?"),
+        (r"hbd\s*[=:]\s*(\d+)", r"hba\s*[=:]\s*(\d+)"),
+    ):
+        d, a = re.search(donor, cleaned), re.search(acceptor, cleaned)
+        if d and a:
+            return {"hbd": int(d.group(1)), "hba": int(a.group(1))}
+    return None
+
+
+PARSERS = {
+    "ring-count": parse_integer,
+    "aromatic-rings": parse_integer,
+    "bbbp": parse_yes_no,
+    "func-group": parse_functional_groups,
+    "hbond": parse_hbond,
+}
+
+
+def majority_vote(samples, parser):
+    """Most common parsed answer (first seen wins ties), as in src/scoring/majority-vote.js."""
+    counts = {}
+    for sample in samples:
+        parsed = parser(sample)
+        if parsed is not None:
+            key = json.dumps(parsed, sort_keys=True)
+            counts[key] = (counts[key][0], counts[key][1] + 1) if key in counts else (parsed, 1)
+    if not counts:
+        return None
+    return max(counts.values(), key=lambda entry: entry[1])[0]
+
+
+def parsed_answer(record, parser):
+    if record.get("parsed") is not None:
+        return record["parsed"]
+    if record.get("samples"):
+        return majority_vote(record["samples"], parser)
+    if record.get("rawResponse"):
+        return parser(record["rawResponse"])
+    return None
+
+
+# --- Per-row arrays ---
+
+def row_arrays(task, records, dataset, indices):
+    """{name: float array over `indices`} of the per-row quantities the task's metrics need."""
+    parser = PARSERS[task]
+    by_index = {r["index"]: r for r in records}
+    answers = [parsed_answer(by_index[i], parser) for i in indices]
+    truths = [dataset[i] for i in indices]
+
+    if task == "bbbp":
+        labels = np.array([t["label"] == "yes" for t in truths], dtype=float)
+        predicted = np.array([a == "yes" for a in answers], dtype=float)
+        correct = np.array([a == t["label"] for a, t in zip(answers, truths)], dtype=float)
+        # P(yes) from loglik runs ranks rows; hard answers rank yes > unparsed > no.
+        scores = np.array([
+            by_index[i]["candidateProbs"]["yes"] if "candidateProbs" in by_index[i]
+            else 0.5 if a is None else p
+            for i, a, p in zip(indices, answers, predicted)
+        ])
+        return {"correct": correct, "label": labels, "score": scores}
+    if task == "func-group":
+        f1, exact = [], []
+        for a, t in zip(answers, truths):
+            pred, truth = set(a or ()), set(t["groups"])
+            tp = len(pred & truth)
+            precision = tp / len(pred) if pred else 0
+            recall = tp / len(truth) if truth else 0
+            f1.append(2 * precision * recall / (precision + recall) if precision + recall else 0)
+            exact.append(a is not None and pred == truth)
+        return {"f1": np.array(f1), "correct": np.array(exact, dtype=float)}
+    if task == "hbond":
+        correct = [a is not None and a.get("hbd") == t["hbd"] and a.get("hba") == t["hba"] for a, t in zip(answers, truths)]
+        return {"correct": np.array(correct, dtype=float)}
+    field = "ringCount" if task == "ring-count" else "aromaticRingCount"
+    return {"correct": np.array([a == t[field] for a, t in zip(answers, truths)], dtype=float)}
+
+
+# --- Weighted metrics: W is (resamples, rows) counts; W = ones((1, rows)) gives the point estimate ---
+
+def weighted_mean(W, x):
+    return W @ x / W.sum(axis=1)
+
+
+def balanced_accuracy(W, correct, label):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        tpr = W @ (correct * label) / (W @ label)
+        tnr = W @ (correct * (1 - label)) / (W @ (1 - label))
+    return (tpr + tnr) / 2
+
+
+def auc(W, score, label):
+    """Mann-Whitney AUC (ties count half) of every resample at once."""
+    pos, neg = label == 1, label == 0
+    M = (score[pos][:, None] > score[neg][None, :]) + 0.5 * (score[pos][:, None] == score[neg][None, :])
+    Wp, Wn = W[:, pos], W[:, neg]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.einsum("bi,ij,bj->b", Wp, M, Wn) / (Wp.sum(axis=1) * Wn.sum(axis=1))
+
+
+METRICS = {
+    "ring-count": {"exactMatch": lambda W, a: weighted_mean(W, a["correct"])},
+    "aromatic-rings": {"exactMatch": lambda W, a: weighted_mean(W, a["correct"])},
+    "hbond": {"exactMatch": lambda W, a: weighted_mean(W, a["correct"])},
+    "bbbp": {
+        "exactMatch": lambda W, a: weighted_mean(W, a["correct"]),
+        "balancedAccuracy": lambda W, a: balanced_accuracy(W, a["correct"], a["label"]),
+        "auc": lambda W, a: auc(W, a["score"], a["label"]),
+    },
+    "func-group": {
+        "f1": lambda W, a: weighted_mean(W, a["f1"]),
+        "exactMatch": lambda W, a: weighted_mean(W, a["correct"]),
+    },
+}
+
+
+def resample_counts(rows, resamples, rng):
+    """(resamples, rows) matrix: how often each row is drawn in each bootstrap resample."""
+    draws = rng.integers(0, rows, size=(resamples, rows))
+    flat = draws + (np.arange(resamples) * rows)[:, None]
+    return np.bincount(flat.ravel(), minlength=resamples * rows).reshape(resamples, rows).astype(float)
+
+
+def rounded(value):
+    """JSON-safe metric value: None where it is undefined (e.g. balanced accuracy with one class)."""
+    return round(float(value), 4) if np.isfinite(value) else None
+
+
+def interval(values):
+    """95% percentile interval over the resamples where the metric is defined; (None, None) if none are."""
+    finite = values[np.isfinite(values)]
+    if not finite.size:
+        return None, None
+    low, high = np.percentile(finite, [2.5, 97.5])
+    return rounded(low), rounded(high)
+
+
+def bootstrap_task(task, runs, dataset, resamples=RESAMPLES, seed=0):
+    """
+    {condition: bootstrap block} for one task's {condition: records}, scored on the
+    row indices every condition has. Conditions other than smiles also get paired
+    differences against it.
+    """
+    indices = sorted(set.intersection(*({r["index"] for r in records} for records in runs.values())))
+    if not indices:
+        return {}
+    arrays = {condition: row_arrays(task, records, dataset, indices) for condition, records in runs.items()}
+    W = resample_counts(len(indices), resamples, np.random.default_rng(seed))
+    ones = np.ones((1, len(indices)))
+
+    blocks, draws = {}, {}
+    for condition, a in arrays.items():
+        metrics = {}
+        for name, metric in METRICS[task].items():
+            draws[condition, name] = metric(W, a)
+            low, high = interval(draws[condition, name])
+            metrics[name] = {"value": rounded(metric(ones, a)[0]), "ciLow": low, "ciHigh": high}
+        blocks[condition] = {"rows": len(indices), "resamples": resamples, "metrics": metrics}
+
+    if BASELINE in arrays:
+        for condition in arrays:
+            if condition == BASELINE:
+                continue
+            versus = {}
+            for name, metric in METRICS[task].items():
+                diff = draws[condition, name] - draws[BASELINE, name]
+                low, high = interval(diff)
+                point = metric(ones, arrays[condition])[0] - metric(ones, arrays[BASELINE])[0]
+                # Two-sided: how often the resampled difference lands on the other side of zero.
+                diff = diff[np.isfinite(diff)]
+                p = min(1.0, 2 * min(np.mean(diff <= 0), np.mean(diff >= 0))) if diff.size else np.nan
+                versus[name] = {"diff": rounded(point), "ciLow": low, "ciHigh": high, "pValue": rounded(p)}
+            blocks[condition][f"vs{BASELINE.capitalize()}"] = versus
+    return blocks
+
+
+# --- Result files and summary.json ---
+
+def parse_filename(path):
+    """results/bbbp_code-relabel_qwen2.5-7b-instruct.json -> ('bbbp', 'code+relabel', 'qwen2.5-7b-instruct')"""
+    parts = os.path.splitext(os.path.basename(path.rstrip("/")))[0].split("_")
+    if len(parts) < 2:
+        return None
+    return parts[0], parts[1].replace("code-relabel", "code+relabel"), "_".join(parts[2:])
+
+
+def load_runs(results_dir="results"):
+    """
+    {tag: {task: {condition: records}}} for every scorable result file. Columnar
+    results (<name>.cols/, see hf_columns.py) are read when there is no JSON copy.
+    """
+    runs = {}
+    paths = sorted(glob.glob(os.path.join(results_dir, "*.json")))
+    paths += [p for p in sorted(glob.glob(os.path.join(results_dir, "*.cols"))) if p[:-len(".cols")] + ".json" not in paths]
+    for path in paths:
+        parsed = parse_filename(path)
+        if parsed is None or parsed[0] not in METRICS:
+            continue
+        task, condition, tag = parsed
+        if path.endswith(".cols"):
+            import hf_columns
+
+            records = hf_columns.ColumnStore(path).records()
+        else:
+            with open(path) as f:
+                data = json.load(f)
+            records = data["results"] if isinstance(data, dict) else data
+        runs.setdefault(tag, {}).setdefault(task, {})[condition] = records
+    return runs
+
+
+def summary_path(results_dir, tag):
+    return os.path.join(results_dir, f"summary_{tag}.json" if tag else "summary.json")
+
+
+def score_all(results_dir="results", data_dir="data", resamples=RESAMPLES, seed=0):
+    """Bootstrap every task/condition and merge the blocks into the summary files; returns {tag: summary}."""
+    summaries = {}
+    for tag, tasks in load_runs(results_dir).items():
+        path = summary_path(results_dir, tag)
+        summary = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                summary = json.load(f)
+        for task, runs in tasks.items():
+            with open(os.path.join(data_dir, f"{task}.json")) as f:
+                dataset = json.load(f)
+            for condition, block in bootstrap_task(task, runs, dataset, resamples, seed).items():
+                entry = summary.setdefault(task, {}).get(condition) or {}
+                entry["bootstrap"] = block
+                summary[task][condition] = entry
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(summary, f, indent=2, allow_nan=False)
+        os.replace(tmp, path)
+        summaries[tag] = summary
+    return summaries
+
+
+def fmt(value, spec=".3f"):
+    return "n/a" if value is None else format(value, spec)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--results", type=str, default="results")
+    parser.add_argument("--resamples", type=int, default=RESAMPLES)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    summaries = score_all(args.results, resamples=args.resamples, seed=args.seed)
+    print(f"{'run':<28} {'task':<16} {'condition':<14} {'metric':<18} {'value':>7} {'95% CI':>17} {'vs smiles':>24}")
+    for tag, summary in summaries.items():
+        for task, conditions in summary.items():
+            for condition, entry in conditions.items():
+                block = (entry or {}).get("bootstrap")
+                if not block:
+                    continue
+                versus = block.get("vsSmiles", {})
+                for name, m in block["metrics"].items():
+                    ci = f"[{fmt(m['ciLow'])}, {fmt(m['ciHigh'])}]"
+                    diff = versus.get(name)
+                    vs = f"{fmt(diff['diff'], '+.3f')} (p={fmt(diff['pValue'])})" if diff else ""
+                    print(f"{tag or 'default':<28} {task:<16} {condition:<14} {name:<18} {fmt(m['value']):>7} {ci:>17} {vs:>24}")
+        print(f"Wrote {summary_path(args.results, tag)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Persistent inference server for hf_runner.py models.
+
+Keeps one model resident and serves generation jobs over local HTTP, so the JS
+pipeline (src/eval/local-runner.js) can target a local model without reloading it.
+Requests that arrive while a batch is running queue up and are merged into the
+next batch, up to --batch-size prompts at a time.
+
+Usage:
+  conda run -n base python src/eval/hf_runner.py serve --model Qwen/Qwen2.5-1.5B-Instruct --port 8765
+
+Endpoints:
+  GET  /health    -> {"model": ..., "batches": ..., "requests": ...}
+  POST /generate  {"prompt": "..."} -> {"text": "..."}
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+
+import hf_runner
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_WAIT_MS = 20
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+
+
+class BatchingServer:
+    """Collects concurrent /generate requests into shared generate_batch calls."""
+
+    def __init__(self, model, tokenizer, model_id, batch_size=8, max_wait_ms=MAX_WAIT_MS):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.model_id = model_id
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = None
+        self.batches = 0
+        self.requests = 0
+
+    async def submit(self, prompt):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((prompt, future))
+        return await future
+
+    def run_batch(self, prompts):
+        """Responses for one merged batch; if the batch fails, each prompt is retried alone."""
+        try:
+            return hf_runner.generate_batch(self.model, self.tokenizer, prompts)
+        except Exception:
+            responses = []
+            for prompt in prompts:
+                try:
+                    responses.append(hf_runner.generate(self.model, self.tokenizer, prompt))
+                except Exception as e:
+                    responses.append(e)
+            return responses
+
+    async def next_batch(self):
+        """Wait for one job, then give others up to max_wait to join it."""
+        loop = asyncio.get_running_loop()
+        jobs = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(jobs) < self.batch_size:
+            if not self.queue.empty():
+                jobs.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                jobs.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return jobs
+
+    async def batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            jobs = await self.next_batch()
+            prompts = [prompt for prompt, _ in jobs]
+            # Generation blocks, so it runs off the event loop while new requests keep queueing.
+            responses = await loop.run_in_executor(None, self.run_batch, prompts)
+            self.batches += 1
+            self.requests += len(jobs)
+            for (_, future), response in zip(jobs, responses):
+                if isinstance(response, Exception):
+                    future.set_exception(response)
+                else:
+                    future.set_result(response)
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                key, _, value = line.partition(":")
+                headers[key.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            status, payload = await self.route(*request_line[:2], body)
+        except Exception as e:
+            status, payload = 500, {"error": str(e)}
+
+        data = json.dumps(payload).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1") + data
+        )
+        await writer.drain()
+        writer.close()
+
+    async def route(self, method, path, body):
+        if method == "GET" and path == "/health":
+            return 200, {"model": self.model_id, "batches": self.batches, "requests": self.requests}
+        if method == "POST" and path == "/generate":
+            try:
+                prompt = json.loads(body)["prompt"]
+            except (ValueError, KeyError, TypeError):
+                return 400, {"error": 'Expected JSON body {"prompt": "..."}'}
+            try:
+                return 200, {"text": await self.submit(prompt)}
+            except Exception as e:
+                return 500, {"error": str(e)}
+        return 404, {"error": f"No route for {method} {path}"}
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+        self.queue = asyncio.Queue()
+        server = await asyncio.start_server(self.handle, host, port)
+        batcher = asyncio.create_task(self.batch_loop())
+        print(f"Serving {self.model_id} on http://{host}:{server.sockets[0].getsockname()[1]}")
+        if ready:
+            ready(server)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="hf_runner.py serve")
+    parser.add_argument("--model", type=str, default=hf_runner.DEFAULT_MODEL)
+    parser.add_argument("--host", type=str, default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--batch-size", type=int, default=8, help="Most requests merged into one generate call")
+    hf_runner.add_backend_args(parser)
+    parser.add_argument("--max-wait-ms", type=int, default=MAX_WAIT_MS,
+                        help="How long the first queued request waits for others to join its batch")
+    args = parser.parse_args(argv)
+
+    model, tokenizer = hf_runner.load_model(args.model, args.backend, **hf_runner.backend_options(args))
+    server = BatchingServer(model, tokenizer, args.model, args.batch_size, args.max_wait_ms)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("Server stopped", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Pre-tokenized prompt cache for hf_runner.py.
+
+The chat-formatted prompt of every row of a (task, condition) is tokenized once
+and stored as two NumPy arrays under cache/tokens/<task>_<condition>_<key>/:
+
+  ids.npy      every row's token ids, concatenated (int32)
+  offsets.npy  row i is ids[offsets[i]:offsets[i + 1]] (int64)
+
+Runs memory-map both, so length bucketing and batching read ids instead of
+re-running the chat template and tokenizer. The key hashes the dataset rows, the
+prompt template and the tokenizer (vocab, merges, special tokens, chat template),
+so a change to any of them builds a new entry; the build command below also
+removes the stale ones.
+
+Only smiles and code prompts are cached: code+relabel prompts contain the
+model's relabeled code, which is not known ahead of the run.
+
+Usage:
+  python src/eval/hf_tokens.py --model Qwen/Qwen2.5-7B-Instruct    # build all tasks, print length stats
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+import hf_runner
+
+CACHEABLE_CONDITIONS = ["smiles", "code"]
+
+
+def tokenizer_hash(tokenizer):
+    """Hash of everything that decides the ids of a chat-formatted prompt."""
+    h = hashlib.sha256()
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    if backend is not None:
+        h.update(backend.to_str().encode("utf-8"))
+    else:
+        h.update(json.dumps(sorted(tokenizer.get_vocab().items())).encode("utf-8"))
+    h.update(json.dumps([tokenizer.chat_template, tokenizer.special_tokens_map], sort_keys=True, default=str)
+             .encode("utf-8"))
+    return h.hexdigest()
+
+
+def cache_key(tokenizer, task, condition, dataset, molecule_last=False):
+    template = hf_runner.MOLECULE_LAST_PROMPTS[task] if molecule_last else hf_runner.PROMPTS[task]
+    h = hashlib.sha256()
+    for part in (json.dumps(dataset, sort_keys=True), template, condition, tokenizer_hash(tokenizer)):
+        h.update(hashlib.sha256(part.encode("utf-8")).digest())
+    return h.hexdigest()[:16]
+
+
+class TokenTable:
+    """Memory-mapped token ids of one cache entry; table[i] is row i's prompt ids."""
+
+    def __init__(self, path):
+        self.path = path
+        self.ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.ids[self.offsets[i]:self.offsets[i + 1]]
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def stats(self):
+        lengths = self.lengths()
+        return {
+            "rows": len(lengths),
+            "tokens": int(lengths.sum()),
+            "min": int(lengths.min(initial=0)),
+            "mean": round(float(lengths.mean()), 1) if len(lengths) else 0,
+            "p50": int(np.percentile(lengths, 50)) if len(lengths) else 0,
+            "p95": int(np.percentile(lengths, 95)) if len(lengths) else 0,
+            "max": int(lengths.max(initial=0)),
+        }
+
+
+def build(path, tokenizer, prompts):
+    """Tokenize the chat-formatted prompts into a new entry at `path`, written atomically."""
+    encoded = [tokenizer(hf_runner.chat_text(tokenizer, p)).input_ids for p in prompts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(ids) for ids in encoded])
+    ids = np.fromiter((t for row in encoded for t in row), dtype=np.int32, count=int(offsets[-1]))
+    tmp = f"{path}.tmp{os.getpid()}"
+    os.makedirs(tmp, exist_ok=True)
+    np.save(os.path.join(tmp, "ids.npy"), ids)
+    np.save(os.path.join(tmp, "offsets.npy"), offsets)
+    try:
+        os.rename(tmp, path)
+    except OSError:
+        # Another process built the same entry first.
+        shutil.rmtree(tmp, ignore_errors=True)
+    return TokenTable(path)
+
+
+def load_or_build(tokenizer, task, condition, dataset, molecule_last=False, cache_dir=hf_runner.TOKEN_CACHE_DIR,
+                  prune=False):
+    """
+    TokenTable for the dataset's prompts, or None for conditions whose prompts are not
+    known up front. prune removes other entries of the same task/condition; runs
+    leave them, so a --limit run does not evict the full dataset's entry.
+    """
+    if condition not in CACHEABLE_CONDITIONS:
+        return None
+    layout = "_molecule-last" if molecule_last else ""
+    name = f"{task}_{condition}{layout}"
+    path = os.path.join(cache_dir, f"{name}_{cache_key(tokenizer, task, condition, dataset, molecule_last)}")
+    if os.path.exists(os.path.join(path, "offsets.npy")):
+        return TokenTable(path)
+    if prune:
+        for stale in glob.glob(os.path.join(cache_dir, f"{name}_" + "[0-9a-f]" * 16)):
+            shutil.rmtree(stale, ignore_errors=True)
+    os.makedirs(cache_dir, exist_ok=True)
+    prompts = [hf_runner.get_prompt(task, condition, row, molecule_last) for row in dataset]
+    return build(path, tokenizer, prompts)
+
+
+def main():
+    from transformers import AutoTokenizer
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", type=str, default=hf_runner.DEFAULT_MODEL)
+    parser.add_argument("--molecule-last", action="store_true")
+    parser.add_argument("--cache-dir", type=str, default=hf_runner.TOKEN_CACHE_DIR)
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    print(f"{'task':<16} {'condition':<10} {'rows':>6} {'tokens':>9} {'min':>6} {'mean':>8} {'p50':>6} "
+          f"{'p95':>6} {'max':>6}")
+    for task in hf_runner.TASKS:
+        dataset = hf_runner.load_dataset(task)
+        for condition in CACHEABLE_CONDITIONS:
+            table = load_or_build(tokenizer, task, condition, dataset, args.molecule_last, args.cache_dir, prune=True)
+            s = table.stats()
+            print(f"{task:<16} {condition:<10} {s['rows']:>6} {s['tokens']:>9} {s['min']:>6} {s['mean']:>8} "
+                  f"{s['p50']:>6} {s['p95']:>6} {s['max']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Multi-process sharding for hf_runner.py --workers N.
+
+A pool of N spawned processes each loads its own model copy once (safetensors
+checkpoints are memory-mapped, so read-only weight pages are shared through the
+OS page cache). Each task/condition is split into N interleaved shards of pending
+row indices; every worker streams its rows to results/<file>.jsonl.shard<k> and
+the parent merges the shards into the main JSONL, which compaction then orders
+by index. Shards a crashed run left behind are merged on --resume and deleted
+otherwise. One tqdm bar in the parent tracks rows finished across all workers.
+
+With the cpu backend the usable cores are split into N contiguous ranges and each
+worker pins itself to one of them.
+
+Workers report on a queue whether their model loaded; a failed load stops the
+pool with the worker's error instead of letting the pool respawn it forever.
+"""
+
+import glob
+import multiprocessing
+import os
+import queue
+
+import torch
+from tqdm import tqdm
+
+import hf_backends
+import hf_runner
+from hf_results import JsonlResultWriter, read_jsonl
+
+# Per-process model state, filled by init_worker in each worker.
+_worker = {}
+# How long a worker waits for its core range; the parent queues them all before starting the pool.
+CORE_RANGE_TIMEOUT = 30
+
+
+class ProgressWriter(JsonlResultWriter):
+    """Shard writer that reports each finished row to the parent's progress queue."""
+
+    def __init__(self, path, progress):
+        super().__init__(path)
+        self.progress = progress
+
+    def write(self, record):
+        super().write(record)
+        self.progress.put(1)
+
+
+def split_cores(workers, cores=None):
+    """Contiguous core ranges, one per worker, e.g. ['0,1,2,3', '4,5,6,7']."""
+    available = sorted(hf_backends.parse_cores(cores) if cores else os.sched_getaffinity(0))
+    size = max(1, len(available) // workers)
+    return [",".join(map(str, available[k * size:(k + 1) * size] or available)) for k in range(workers)]
+
+
+def init_worker(model_id, backend, options, draft_model_id, relabel_cache, core_ranges, progress, ready):
+    # The parent owns the only progress bar.
+    os.environ["TQDM_DISABLE"] = "1"
+    # Errors go to the parent rather than up: the pool would respawn a worker whose initializer raised.
+    try:
+        if core_ranges is not None:
+            try:
+                cores = core_ranges.get(timeout=CORE_RANGE_TIMEOUT)
+            except queue.Empty:
+                raise RuntimeError("no core range left, a worker died while loading") from None
+            options = {**options, "cores": cores, "threads": None}
+        model, tokenizer = hf_runner.load_model(model_id, backend, **options)
+        draft_model = hf_runner.load_model(draft_model_id, backend, **options)[0] if draft_model_id else None
+        relabel_store = None
+        if relabel_cache:
+            relabel_store = hf_runner.RelabelStore(model_id, hf_runner.generation_params(), relabel_cache)
+    except Exception as err:
+        ready.put(f"{type(err).__name__}: {err}")
+        return
+    _worker.update(model=model, tokenizer=tokenizer, draft_model=draft_model, relabel_store=relabel_store,
+                   progress=progress)
+    ready.put(None)
+
+
+def run_shard(task, condition, dataset, indices, shard_path, run_options):
+    writer = ProgressWriter(shard_path, _worker["progress"])
+    try:
+        hf_runner.run_task(
+            _worker["model"], _worker["tokenizer"], task, condition, dataset,
+            relabel_store=_worker["relabel_store"],
+            writer=writer,
+            draft_model=_worker["draft_model"],
+            indices=indices,
+            **run_options,
+        )
+    finally:
+        writer.close()
+
+
+def shard_paths(writer):
+    return sorted(glob.glob(f"{writer.path}.shard*"))
+
+
+def merge_shards(writer):
+    """Append every shard file of this writer and remove them."""
+    for path in shard_paths(writer):
+        for record in read_jsonl(path):
+            writer.write(record)
+            if "error" not in record:
+                writer.done.add(record["index"])
+        writer.sync()
+        os.remove(path)
+
+
+class WorkerPool:
+    def __init__(self, workers, model_id, backend="auto", options=None, draft_model_id=None, relabel_cache=None):
+        ctx = multiprocessing.get_context("spawn")
+        self.workers = workers
+        self.progress = ctx.Queue()
+        core_ranges = None
+        if backend == "cpu" or (backend == "auto" and not torch.cuda.is_available()):
+            core_ranges = ctx.Queue()
+            for cores in split_cores(workers, (options or {}).get("cores")):
+                core_ranges.put(cores)
+        ready = ctx.Queue()
+        print(f"Starting {workers} workers for {model_id}...")
+        self.pool = ctx.Pool(
+            workers,
+            initializer=init_worker,
+            initargs=(model_id, backend, options or {}, draft_model_id, relabel_cache, core_ranges, self.progress,
+                      ready),
+        )
+        for _ in range(workers):
+            error = ready.get()
+            if error is not None:
+                self.pool.terminate()
+                raise RuntimeError(f"A worker failed to load {model_id}: {error}")
+
+    def run(self, task, condition, dataset, writer, run_options):
+        """Run the rows not yet in writer.done across all workers and merge them into the writer."""
+        # Shards left by a crashed run are only reused on --resume; a fresh run must not skip their rows.
+        if writer.resume:
+            merge_shards(writer)
+        else:
+            for path in shard_paths(writer):
+                os.remove(path)
+        pending = [i for i in range(len(dataset)) if i not in writer.done]
+        shards = [pending[k::self.workers] for k in range(self.workers)]
+        jobs = [
+            self.pool.apply_async(run_shard, (task, condition, dataset, shard, f"{writer.path}.shard{k}", run_options))
+            for k, shard in enumerate(shards)
+            if shard
+        ]
+        try:
+            with tqdm(total=len(pending), desc=f"{task}/{condition} x{self.workers}", unit="row") as bar:
+                while not all(job.ready() for job in jobs):
+                    try:
+                        bar.update(self.progress.get(timeout=0.2))
+                    except queue.Empty:
+                        pass
+                while True:
+                    try:
+                        bar.update(self.progress.get_nowait())
+                    except queue.Empty:
+                        break
+            for job in jobs:
+                job.get()
+        finally:
+            merge_shards(writer)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
@@ -0,0 +1,67 @@
+/**
+ * Client for the local model server (`python src/eval/hf_runner.py serve`).
+ * Mirrors callClaude/callClaudeTwoTurn from runner.js so the pipeline can swap backends.
+ */
+
+const SERVER_URL = process.env.HF_SERVER_URL || "http://127.0.0.1:8765";
+const RETRY_DELAYS = [1000, 2000, 4000];
+
+async function sleep(ms) {
+  return new Promise((resolve) => setTimeout(resolve, ms));
+}
+
+/** Node/undici puts the code on err.cause ("ECONNREFUSED"); Bun puts it on err itself ("ConnectionRefused"). */
+function isConnectionRefused(err) {
+  return [err.code, err.cause?.code].some((code) => code === "ECONNREFUSED" || code === "ConnectionRefused");
+}
+
+/** Run fn, retrying while the connection is refused because the server is still loading the model. */
+async function withRetry(fn) {
+  for (let attempt = 0; ; attempt++) {
+    try {
+      return await fn();
+    } catch (err) {
+      if (attempt < RETRY_DELAYS.length && isConnectionRefused(err)) {
+        console.warn(`Local server unavailable, retrying in ${RETRY_DELAYS[attempt]}ms...`);
+        await sleep(RETRY_DELAYS[attempt]);
+        continue;
+      }
+      throw err;
+    }
+  }
+}
+
+/** Model id the server has loaded, e.g. "Qwen/Qwen2.5-1.5B-Instruct". */
+export async function localModelId() {
+  return withRetry(async () => {
+    const response = await fetch(`${SERVER_URL}/health`);
+    const { model } = await response.json();
+    return model;
+  });
+}
+
+/** Send a single prompt to the local model and get the text response. */
+export async function callLocal(prompt) {
+  return withRetry(async () => {
+    const response = await fetch(`${SERVER_URL}/generate`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ prompt }),
+    });
+    const body = await response.json();
+    if (!response.ok) throw new Error(body.error || `Local server returned ${response.status}`);
+    return body.text;
+  });
+}
+
+/**
+ * Two-turn call for code+relabel condition:
+ * Turn 1: relabel prompt → get relabeled code
+ * Turn 2: task prompt with relabeled code
+ */
+export async function callLocalTwoTurn(relabelPrompt, taskPromptFn) {
+  const relabeled = await callLocal(relabelPrompt);
+  const taskPrompt = taskPromptFn(relabeled);
+  const answer = await callLocal(taskPrompt);
+  return { relabeled, answer };
+}
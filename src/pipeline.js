@@ -1,6 +1,7 @@
 import "./load-env.js";
 import { readFileSync, writeFileSync, mkdirSync } from "fs";
 import { callClaude, callClaudeTwoTurn } from "./eval/runner.js";
+import { callLocal, callLocalTwoTurn, localModelId } from "./eval/local-runner.js";
 import { parseInteger, parseYesNo, parseSmiles, parseFunctionalGroups, parseHBond } from "./eval/parse-response.js";
 import { ringCountPrompt } from "./prompts/ring-count.js";
 import { bbbpPrompt } from "./prompts/bbbp.js";
@@ -62,41 +63,57 @@ function getParser(task) {
   throw new Error(`Unknown task: ${task}`);
 }
 
-async function runTask(task, condition, dataset) {
+const BACKENDS = {
+  claude: { call: callClaude, callTwoTurn: callClaudeTwoTurn },
+  local: { call: callLocal, callTwoTurn: callLocalTwoTurn },
+};
+
+async function runTask(task, condition, dataset, backend = BACKENDS.claude, concurrency = 1) {
   const parser = getParser(task);
-  const results = [];
+  const results = new Array(dataset.length);
   const total = dataset.length;
+  let next = 0;
+  let finished = 0;
 
-  for (let i = 0; i < total; i++) {
+  async function runRow(i) {
     const row = dataset[i];
     let rawResponse, parsed;
 
     try {
       if (condition === "code+relabel") {
         const relabel = relabelPrompt(row.code);
-        const { relabeled, answer } = await callClaudeTwoTurn(
+        const { relabeled, answer } = await backend.callTwoTurn(
           relabel,
           (relabeledCode) => getPrompt(task, "code", { ...row, code: relabeledCode }),
         );
         rawResponse = answer;
         parsed = parser(answer);
-        results.push({ index: i, rawResponse, relabeled, parsed });
+        results[i] = { index: i, rawResponse, relabeled, parsed };
       } else {
         const prompt = getPrompt(task, condition, row);
-        rawResponse = await callClaude(prompt);
+        rawResponse = await backend.call(prompt);
         parsed = parser(rawResponse);
-        results.push({ index: i, rawResponse, parsed });
+        results[i] = { index: i, rawResponse, parsed };
       }
     } catch (err) {
       console.error(`Error on row ${i}: ${err.message}`);
-      results.push({ index: i, error: err.message, parsed: null });
+      results[i] = { index: i, error: err.message, parsed: null };
     }
 
-    if ((i + 1) % 10 === 0) {
-      console.log(`  ${task}/${condition}: ${i + 1}/${total}`);
+    finished++;
+    if (finished % 10 === 0) {
+      console.log(`  ${task}/${condition}: ${finished}/${total}`);
     }
   }
 
+  // Keep up to `concurrency` rows in flight so the local server can batch them
+  async function worker() {
+    while (next < total) {
+      await runRow(next++);
+    }
+  }
+  await Promise.all(Array.from({ length: Math.min(concurrency, total) }, worker));
+
   return results;
 }
 
@@ -212,6 +229,27 @@ async function main() {
     limit = parseInt(args[limitIdx + 1], 10);
   }
 
+  const backendIdx = args.indexOf("--backend");
+  const backendName = backendIdx !== -1 && args[backendIdx + 1] ? args[backendIdx + 1] : "claude";
+  const backend = BACKENDS[backendName];
+  if (!backend) {
+    throw new Error(`Unknown backend: ${backendName}. Valid: ${Object.keys(BACKENDS).join(", ")}`);
+  }
+
+  let concurrency = 1;
+  const concurrencyIdx = args.indexOf("--concurrency");
+  if (concurrencyIdx !== -1 && args[concurrencyIdx + 1]) {
+    concurrency = parseInt(args[concurrencyIdx + 1], 10);
+  }
+
+  // Local runs are tagged with the served model, like hf_runner.py result files
+  let fileTag = "";
+  if (backendName === "local") {
+    const modelId = await localModelId();
+    fileTag = `_${modelId.split("/").pop().toLowerCase()}`;
+    console.log(`Using local server model ${modelId}`);
+  }
+
   mkdirSync("results", { recursive: true });
 
   const allResults = {};
@@ -223,14 +261,14 @@ async function main() {
 
     for (const condition of conditions) {
       console.log(`\n--- Condition: ${condition} ---`);
-      const results = await runTask(task, condition, dataset);
+      const results = await runTask(task, condition, dataset, backend, concurrency);
       const scores = await scoreResults(task, condition, dataset, results);
 
       allResults[task][condition] = { scores, results };
       console.log(`Scores:`, JSON.stringify(scores, null, 2));
 
       // Save per-task-condition results
-      const filename = `results/${task}_${condition.replace("+", "-")}.json`;
+      const filename = `results/${task}_${condition.replace("+", "-")}${fileTag}.json`;
       writeFileSync(filename, JSON.stringify({ scores, results }, null, 2));
     }
   }
@@ -243,7 +281,7 @@ async function main() {
       summary[task][condition] = allResults[task]?.[condition]?.scores;
     }
   }
-  writeFileSync("results/summary.json", JSON.stringify(summary, null, 2));
+  writeFileSync(`results/summary${fileTag}.json`, JSON.stringify(summary, null, 2));
   console.log("\n=== Summary ===");
   console.log(JSON.stringify(summary, null, 2));
   console.log("\nResults saved to results/");
@@ -29,3 +29,26 @@ export function binaryMetrics(predictions, groundTruths) {
     total: predictions.length,
   };
 }
+
+/**
+ * Compute the true AUC-ROC from continuous scores (e.g. P("yes") from loglik scoring).
+ * Uses the Mann-Whitney rank formulation; tied scores count as half a win.
+ */
+export function aucRoc(scores, groundTruths) {
+  const positives = [];
+  const negatives = [];
+  for (let i = 0; i < scores.length; i++) {
+    if (groundTruths[i] === "yes") positives.push(scores[i]);
+    else if (groundTruths[i] === "no") negatives.push(scores[i]);
+  }
+  if (positives.length === 0 || negatives.length === 0) return 0;
+
+  let wins = 0;
+  for (const p of positives) {
+    for (const n of negatives) {
+      if (p > n) wins++;
+      else if (p === n) wins += 0.5;
+    }
+  }
+  return wins / (positives.length * negatives.length);
+}
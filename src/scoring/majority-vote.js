@@ -0,0 +1,24 @@
+/**
+ * Self-consistency vote over several sampled completions of one prompt.
+ * Each sample is parsed with the task parser; the most common parsed answer wins
+ * (ties go to the answer seen first). voteShare is the winner's fraction of all
+ * samples, usable as a per-row confidence.
+ */
+export function majorityVote(samples, parser) {
+  const counts = new Map();
+  for (const sample of samples) {
+    const parsed = parser(sample);
+    if (parsed === null) continue;
+    const key = JSON.stringify(parsed);
+    const entry = counts.get(key) || { parsed, count: 0 };
+    entry.count++;
+    counts.set(key, entry);
+  }
+
+  let best = null;
+  for (const entry of counts.values()) {
+    if (!best || entry.count > best.count) best = entry;
+  }
+  if (!best) return { parsed: null, voteShare: 0 };
+  return { parsed: best.parsed, voteShare: best.count / samples.length };
+}
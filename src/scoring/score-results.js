@@ -2,9 +2,10 @@ import "./../../src/load-env.js";
 import { readFileSync, writeFileSync } from "fs";
 import { parseInteger, parseYesNo, parseSmiles, parseFunctionalGroups, parseHBond } from "../eval/parse-response.js";
 import { exactMatchAccuracy } from "./exact-match.js";
-import { binaryMetrics } from "./auc-roc.js";
+import { binaryMetrics, aucRoc } from "./auc-roc.js";
 import { smilesRepairMetrics } from "./validity.js";
 import { f1Score } from "./f1.js";
+import { majorityVote } from "./majority-vote.js";
 
 const args = process.argv.slice(2);
 const resultsFile = args[0];
@@ -33,7 +34,12 @@ if (!parser) {
   process.exit(1);
 }
 for (const r of results) {
-  if (r.rawResponse && r.parsed === null) {
+  if (r.samples && r.parsed === null) {
+    // --samples runs: score the majority answer across all completions
+    const { parsed, voteShare } = majorityVote(r.samples, parser);
+    r.parsed = parsed;
+    r.voteShare = voteShare;
+  } else if (r.rawResponse && r.parsed === null) {
     r.parsed = parser(r.rawResponse);
   }
 }
@@ -65,6 +71,14 @@ async function score() {
       }
     }
     scores = { ...binaryMetrics(validPreds, validTruths), parseFailures };
+    // Loglik runs carry P(yes) per row, which gives a real AUC instead of balanced accuracy
+    const probRows = results.filter((r) => r.candidateProbs);
+    if (probRows.length > 0) {
+      scores.auc = aucRoc(
+        probRows.map((r) => r.candidateProbs.yes),
+        probRows.map((r) => groundTruths[r.index]),
+      );
+    }
   } else if (task === "smiles-repair") {
     const originals = dataset.map((r) => r.original);
     const validPreds = [];
@@ -116,6 +130,11 @@ async function score() {
     };
   }
 
+  const voted = results.filter((r) => r.voteShare !== undefined);
+  if (voted.length > 0) {
+    scores.meanVoteShare = voted.reduce((sum, r) => sum + r.voteShare, 0) / voted.length;
+  }
+
   console.log(JSON.stringify(scores, null, 2));
 
   // Write scored results back
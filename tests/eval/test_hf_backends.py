@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+hf_backends = pytest.importorskip("hf_backends")
+hf_runner = pytest.importorskip("hf_runner")
+
+
+def test_parse_cores():
+    assert hf_backends.parse_cores("0-3,8") == {0, 1, 2, 3, 8}
+
+
+@pytest.mark.parametrize("cpu_dtype", hf_backends.CPU_DTYPES)
+def test_cpu_backend_output_matches_record_format(tiny_checkpoint, short_generation, cpu_dtype):
+    model, tokenizer = hf_runner.load_model(tiny_checkpoint, "cpu", cpu_dtype=cpu_dtype, threads=1)
+    assert model.device.type == "cpu"
+    results = hf_runner.run_task(model, tokenizer, "bbbp", "smiles", [{"smiles": "CCO", "code": ""}])
+    assert set(results[0]) == {"index", "rawResponse", "parsed", "perf"}
+
+
+def test_cpu_backend_pins_cores():
+    import torch
+
+    before, threads = os.sched_getaffinity(0), torch.get_num_threads()
+    try:
+        core = min(before)
+        assert hf_backends.configure_cpu(cores=str(core)) == 1
+        assert os.sched_getaffinity(0) == {core}
+    finally:
+        os.sched_setaffinity(0, before)
+        torch.set_num_threads(threads)
+
+
+def test_snapshot_is_loaded_instead_of_the_checkpoint(tiny_checkpoint, tmp_path):
+    import torch
+
+    path = hf_backends.save_snapshot(tiny_checkpoint, "cpu", "bfloat16", str(tmp_path))
+    assert os.path.exists(os.path.join(path, "model.safetensors"))
+
+    model, _ = hf_backends.load(tiny_checkpoint, "cpu", "bfloat16", threads=1, snapshot_dir=str(tmp_path))
+    direct, _ = hf_backends.load(tiny_checkpoint, "cpu", "bfloat16", threads=1, snapshot_dir=None)
+    assert model.name_or_path == path
+    assert model.dtype == torch.bfloat16
+    for (name, weight), (_, expected) in zip(model.state_dict().items(), direct.state_dict().items()):
+        assert torch.equal(weight, expected), name
+
+
+def test_snapshot_key_tracks_quantization_and_versions(monkeypatch):
+    bf16 = hf_backends.snapshot_path("org/tiny", "cpu", "bfloat16")
+    assert hf_backends.snapshot_path("org/tiny", "cpu", "float32") != bf16
+    # int8 quantizes float32 weights after loading, so it shares their snapshot.
+    assert hf_backends.snapshot_path("org/tiny", "cpu", "int8") == hf_backends.snapshot_path("org/tiny", "cpu", "float32")
+    assert hf_backends.snapshot_path("org/tiny", "cuda-nf4") != bf16
+
+    monkeypatch.setattr(hf_backends, "library_versions", lambda: {"torch": "0.0", "transformers": "0.0"})
+    assert hf_backends.snapshot_path("org/tiny", "cpu", "bfloat16") != bf16
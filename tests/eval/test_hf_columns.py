@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+hf_columns = pytest.importorskip("hf_columns")
+hf_results = pytest.importorskip("hf_results")
+
+PERF = {"promptTokens": 40, "generatedTokens": 3, "prefillMs": 1.5, "decodeMs": 2.0, "tokensPerSec": 1500.0,
+        "peakMemoryMb": 100.0}
+RECORDS = [
+    {"index": 0, "rawResponse": "Thinking...\n**yes**", "candidateProbs": {"yes": 0.75, "no": 0.25}, "parsed": "yes",
+     "perf": PERF},
+    {"index": 1, "error": "CUDA out of memory", "parsed": None},
+    {"index": 2, "rawResponse": "donors=1", "samples": ["donors=1", "dönors=2"], "relabeled": "export const x = 1;",
+     "parsed": {"hbd": 1, "hba": 2}, "perf": {**PERF, "prefillMs": 2.25}, "deduplicated": True},
+]
+
+
+def test_round_trip_rebuilds_records(tmp_path):
+    path = str(tmp_path / "bbbp_smiles.cols")
+    hf_columns.write_columns(RECORDS, path, "org/tiny", perf={"rows": 3})
+    store = hf_columns.ColumnStore(path)
+    assert store.records() == RECORDS
+    assert store.to_dict() == {"model": "org/tiny", "results": RECORDS, "perf": {"rows": 3}}
+
+
+def test_numeric_columns_are_typed_and_memory_mapped(tmp_path):
+    path = str(tmp_path / "bbbp_smiles.cols")
+    hf_columns.write_columns(RECORDS, path)
+    store = hf_columns.ColumnStore(path)
+    prefill = store.array("perf.prefillMs")
+    assert isinstance(prefill, np.memmap) and prefill.dtype == np.float64
+    assert store.array("index").dtype == np.int64
+    assert store.state("perf.prefillMs").tolist() == [2, 0, 2]
+    assert store.values("perf.prefillMs") == [1.5, None, 2.25]
+    assert store.by_name["parsed"]["kind"] == "category"
+    assert store.by_name["rawResponse"]["kind"] == "text"
+    with pytest.raises(ValueError):
+        store.array("rawResponse")
+
+
+def test_compact_results_writes_both_formats(tmp_path):
+    partial = str(tmp_path / "bbbp_smiles.jsonl")
+    writer = hf_results.JsonlResultWriter(partial)
+    for record in reversed(RECORDS):
+        writer.write(record)
+    writer.close()
+
+    json_path = str(tmp_path / "bbbp_smiles.json")
+    hf_results.compact_results(partial, json_path, "org/tiny", lambda records: {"rows": len(records)}, "both")
+    assert hf_results.result_exists(json_path)
+    store = hf_columns.ColumnStore(hf_results.columns_path(json_path))
+    with open(json_path) as f:
+        assert store.to_dict() == json.load(f)
+
+
+def test_columns_only_then_json_export(tmp_path):
+    partial = str(tmp_path / "hbond_code.jsonl")
+    writer = hf_results.JsonlResultWriter(partial)
+    writer.write(RECORDS[0])
+    writer.close()
+    json_path = str(tmp_path / "hbond_code.json")
+    hf_results.compact_results(partial, json_path, "org/tiny", result_format="columns")
+    assert not (tmp_path / "hbond_code.json").exists()
+    assert hf_results.result_exists(json_path)
+
+    assert hf_columns.main(["to-json", str(tmp_path / "hbond_code.cols")]) == 0
+    with open(json_path) as f:
+        assert json.load(f) == {"model": "org/tiny", "results": [RECORDS[0]]}
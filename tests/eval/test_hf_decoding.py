@@ -0,0 +1,69 @@
+import re
+
+import pytest
+
+hf_decoding = pytest.importorskip("hf_decoding")
+hf_runner = pytest.importorskip("hf_runner")
+
+DATASET = [{"smiles": "CCO", "code": "const molecule1 = Linear(['C', 'C', 'O']);"}] * 3
+
+
+@pytest.mark.parametrize("task,text,complete", [
+    ("bbbp", "yes", False),
+    ("bbbp", "no.", True),
+    ("bbbp", "not sure", False),
+    ("aromatic-rings", "1", False),
+    ("aromatic-rings", "12\n", True),
+    ("hbond", "donors=2, acceptors=", False),
+    ("hbond", "Donors=2, acceptors=5.", True),
+    ("func-group", "hydroxyl, amine", False),
+    ("func-group", "hydroxyl, amine\n", True),
+    ("bbbp", "**Yes**\n", True),
+    ("aromatic-rings", " 3.\n", True),
+])
+def test_stop_patterns_need_a_complete_answer(task, text, complete):
+    assert bool(hf_decoding.STOP_PATTERNS[task].fullmatch(text)) == complete
+
+
+@pytest.mark.parametrize("task,text", [
+    ("bbbp", "There is no "),
+    ("bbbp", "There is no evidence of polar groups, but I lean yes."),
+    ("bbbp", "No evidence either way.\n"),
+    ("ring-count", "Ring 1 "),
+    ("ring-count", "Ring 1 is a benzene.\nTotal: 2\n"),
+    ("aromatic-rings", "I count 3 "),
+    ("aromatic-rings", "I count 3 rings but only 2 are aromatic.\n"),
+    ("aromatic-rings", "3.5"),
+    ("hbond", "With donors=2, acceptors=5 in mind, "),
+    ("func-group", "The amine\n"),
+])
+def test_stop_patterns_ignore_answers_inside_prose(task, text):
+    # Every prefix of the reply is checked as it is generated.
+    pattern = hf_decoding.STOP_PATTERNS[task]
+    assert not any(pattern.fullmatch(text[:n]) for n in range(1, len(text) + 1))
+
+
+def test_answer_trie_walks_to_eos(tiny_tokenizer):
+    trie = hf_decoding.AnswerTrie(tiny_tokenizer, ["1", "12"])
+    one = tiny_tokenizer("1", add_special_tokens=False).input_ids
+    two = tiny_tokenizer("2", add_special_tokens=False).input_ids
+    assert sorted(trie.allowed(one)) == sorted([tiny_tokenizer.eos_token_id, *two])
+    assert trie.allowed(one + two) == [tiny_tokenizer.eos_token_id]
+
+
+@pytest.mark.parametrize("task,pattern", [
+    ("bbbp", r"yes|no"),
+    ("aromatic-rings", r"\d+"),
+    ("hbond", r"donors=\d+, acceptors=\d+"),
+    ("func-group", r"[a-z]+(, [a-z]+)*"),
+])
+def test_constrained_run_task_only_emits_answers(tiny_model, tiny_tokenizer, task, pattern):
+    results = hf_runner.run_task(tiny_model, tiny_tokenizer, task, "smiles", DATASET, batch_size=2, constrain=True)
+    for r in results:
+        assert re.fullmatch(pattern, r["rawResponse"])
+        assert r["rawResponse"] in hf_decoding.answer_strings(task)
+
+
+def test_constraint_bounds_max_new_tokens(tiny_tokenizer):
+    decoding = hf_decoding.Decoding(tiny_tokenizer, "aromatic-rings", 1024, constrain=True)
+    assert decoding.max_new_tokens == 3
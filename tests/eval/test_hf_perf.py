@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+hf_perf = pytest.importorskip("hf_perf")
+
+
+def perf(prefill_ms, decode_ms, generated=10):
+    return hf_perf.row_perf(100, generated, prefill_ms, decode_ms, 512)
+
+
+def test_percentile_uses_nearest_rank():
+    values = list(range(1, 101))
+    assert (hf_perf.percentile(values, 50), hf_perf.percentile(values, 95)) == (50, 95)
+    assert hf_perf.percentile([], 50) == 0
+
+
+def test_run_summary_counts_relabel_and_task_calls():
+    records = [
+        {"index": 0, "perf": perf(10, 90), "relabelPerf": perf(20, 180)},
+        {"index": 1, "perf": perf(10, 40)},
+        {"index": 2, "error": "oom"},
+    ]
+    summary = hf_perf.run_summary(records, wall_seconds=2)
+    assert summary["rows"] == 3 and summary["calls"] == 3
+    assert summary["generatedTokens"] == 30
+    assert summary["generatedTokensPerSec"] == 15
+    assert (summary["latencyP50Ms"], summary["latencyP95Ms"]) == (100, 200)
+
+    # A --matrix file has no wall time of its own, so no throughput is reported for it.
+    matrix = hf_perf.run_summary(records)
+    assert "wallSeconds" not in matrix and "generatedTokensPerSec" not in matrix
+    assert matrix["generatedTokens"] == 30
+
+
+def test_cost_table_groups_by_run_task_condition(tmp_path):
+    summary = hf_perf.run_summary([{"index": 0, "perf": perf(10, 90)}], 1)
+    loglik = hf_perf.run_summary([{"index": 0, "perf": perf(10, 0)}], 1)
+    (tmp_path / "bbbp_code-relabel_tiny.json").write_text(json.dumps({"model": "org/tiny", "results": [], "perf": summary}))
+    (tmp_path / "bbbp_code-relabel_tiny_loglik.json").write_text(
+        json.dumps({"model": "org/tiny", "results": [], "perf": loglik}))
+    (tmp_path / "bbbp_code.json").write_text(json.dumps({"results": []}))
+    assert hf_perf.cost_table(str(tmp_path)) == {
+        "tiny": {"bbbp": {"code+relabel": summary}},
+        "tiny_loglik": {"bbbp": {"code+relabel": loglik}},
+    }
@@ -0,0 +1,87 @@
+import pytest
+
+hf_planner = pytest.importorskip("hf_planner")
+hf_runner = pytest.importorskip("hf_runner")
+from hf_results import JsonlResultWriter, compact_results  # noqa: E402
+
+DATASETS = {
+    "bbbp": [
+        {"smiles": "CCO", "code": "const molecule1 = Linear(['C', 'C', 'O']);"},
+        {"smiles": "N", "code": "const molecule1 = Linear(['N']);"},
+        {"smiles": "CCO", "code": "const molecule1 = Linear(['C', 'C', 'O']);"},
+    ],
+    "hbond": [
+        {"smiles": "CCO", "code": "const molecule1 = Linear(['C', 'C', 'O']);"},
+        {"smiles": "O", "code": "const molecule1 = Linear(['O']);"},
+    ],
+}
+
+
+def plan_for(conditions, tmp_path, **kwargs):
+    return hf_planner.plan_matrix(
+        list(DATASETS), conditions, DATASETS.get,
+        lambda task, condition: str(tmp_path / f"{task}_{condition.replace('+', '-')}.json"),
+        **kwargs,
+    )
+
+
+def test_plan_dedupes_prompts_within_and_relabels_across_tasks(tmp_path):
+    plan = plan_for(["smiles", "code+relabel"], tmp_path)
+    summary = plan.summary(decode_budget=8)
+    assert summary["files"] == 4
+    assert summary["jobs"] == 10
+    # CCO repeats within bbbp; the task prompts differ between bbbp and hbond.
+    assert len(plan.answers) == 4
+    # The relabel prompt only depends on the code, so CCO is relabeled once for both tasks.
+    assert summary["uniqueRelabels"] == 3
+    assert summary["relabelJobs"] == 5
+    assert summary["estPromptTokens"] > 0
+
+
+def test_plan_skips_rows_already_streamed(tmp_path):
+    writer = JsonlResultWriter(str(tmp_path / "bbbp_smiles.jsonl"))
+    writer.write({"index": 0, "rawResponse": "yes", "parsed": None})
+    writer.write({"index": 1, "error": "boom", "parsed": None})
+    writer.close()
+    plan = plan_for(["smiles"], tmp_path, resume=True)
+    assert sorted(i for f, i in plan.rows if f.endswith("bbbp_smiles.json")) == [1, 2]
+
+
+def test_run_matrix_fans_out_one_generation_per_unique_prompt(tiny_model, tiny_tokenizer, short_generation,
+                                                              tmp_path, monkeypatch):
+    plan = plan_for(["smiles", "code+relabel"], tmp_path)
+    generated = []
+    real_generate_batch = hf_runner.generate_batch
+    monkeypatch.setattr(hf_runner, "generate_batch",
+                        lambda model, tokenizer, prompts, *a: generated.extend(prompts) or
+                        real_generate_batch(model, tokenizer, prompts, *a))
+    writers = {f: JsonlResultWriter(hf_runner.jsonl_path(f)) for f in plan.files}
+    hf_planner.run_matrix(tiny_model, tiny_tokenizer, plan, writers, batch_size=4)
+    for writer in writers.values():
+        writer.close()
+
+    assert len(generated) == len(set(generated))
+    bbbp = compact_results(hf_runner.jsonl_path(str(tmp_path / "bbbp_smiles.json")), str(tmp_path / "bbbp_smiles.json"),
+                           "org/tiny")
+    assert [r["index"] for r in bbbp] == [0, 1, 2]
+    assert bbbp[2]["rawResponse"] == bbbp[0]["rawResponse"]
+    assert bbbp[2]["deduplicated"] and "perf" not in bbbp[2]
+    assert "perf" in bbbp[0]
+
+    relabel = compact_results(hf_runner.jsonl_path(str(tmp_path / "hbond_code-relabel.json")),
+                              str(tmp_path / "hbond_code-relabel.json"), "org/tiny")
+    assert [r["index"] for r in relabel] == [0, 1]
+    assert all("relabeled" in r for r in relabel)
+
+
+def test_plan_resumes_from_compacted_results(tmp_path):
+    for condition, rows in [("smiles", 3), ("code", 1)]:
+        filename = str(tmp_path / f"bbbp_{condition}.json")
+        writer = JsonlResultWriter(hf_runner.jsonl_path(filename))
+        for i in range(rows):
+            writer.write({"index": i, "rawResponse": "yes", "parsed": None})
+        writer.close()
+        compact_results(hf_runner.jsonl_path(filename), filename, "org/tiny")
+    plan = plan_for(["smiles", "code"], tmp_path, resume=True)
+    assert str(tmp_path / "bbbp_smiles.json") not in plan.files
+    assert sorted(i for f, i in plan.rows if f.endswith("bbbp_code.json")) == [1, 2]
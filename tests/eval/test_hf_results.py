@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+hf_results = pytest.importorskip("hf_results")
+hf_runner = pytest.importorskip("hf_runner")
+
+DATASET = [{"smiles": s, "code": f"const molecule1 = Linear(['{s}']);"} for s in ["C", "N", "O", "S"]]
+
+
+def test_resume_skips_done_rows_and_drops_torn_tail(tmp_path):
+    path = tmp_path / "bbbp_smiles.jsonl"
+    path.write_text(
+        json.dumps({"index": 2, "rawResponse": "yes", "parsed": None}) + "\n"
+        + json.dumps({"index": 0, "error": "oom", "parsed": None}) + "\n"
+        + '{"index": 1, "rawRes'
+    )
+    writer = hf_results.JsonlResultWriter(str(path), resume=True)
+    assert writer.done == {2}
+    writer.write({"index": 1, "rawResponse": "no", "parsed": None})
+    writer.close()
+    assert [r["index"] for r in hf_results.read_jsonl(str(path))] == [2, 0, 1]
+
+
+def test_compact_results_orders_by_index_and_keeps_latest(tmp_path):
+    path = tmp_path / "hbond_code.jsonl"
+    writer = hf_results.JsonlResultWriter(str(path))
+    for record in [
+        {"index": 1, "rawResponse": "b", "parsed": None},
+        {"index": 0, "error": "oom", "parsed": None},
+        {"index": 0, "rawResponse": "a", "parsed": None},
+    ]:
+        writer.write(record)
+    writer.close()
+
+    json_path = tmp_path / "hbond_code.json"
+    hf_results.compact_results(str(path), str(json_path), "org/tiny")
+    assert json.loads(json_path.read_text()) == {
+        "model": "org/tiny",
+        "results": [{"index": 0, "rawResponse": "a", "parsed": None}, {"index": 1, "rawResponse": "b", "parsed": None}],
+    }
+    assert not path.exists()
+
+
+def test_run_task_streams_rows_and_resumes(tiny_model, tiny_tokenizer, short_generation, tmp_path):
+    path = str(tmp_path / "bbbp_smiles.jsonl")
+    writer = hf_results.JsonlResultWriter(path)
+    hf_runner.run_task(tiny_model, tiny_tokenizer, "bbbp", "smiles", DATASET[:2], writer=writer)
+    writer.close()
+
+    writer = hf_results.JsonlResultWriter(path, resume=True)
+    new = hf_runner.run_task(tiny_model, tiny_tokenizer, "bbbp", "smiles", DATASET, batch_size=2, writer=writer)
+    writer.close()
+    assert [r["index"] for r in new] == [2, 3]
+    assert sorted(r["index"] for r in hf_results.read_jsonl(path)) == [0, 1, 2, 3]
+
+
+@pytest.mark.parametrize("result_format", ["json", "columns"])
+def test_resume_after_compaction_keeps_finished_rows(tiny_model, tiny_tokenizer, short_generation, tmp_path,
+                                                     result_format):
+    json_path = str(tmp_path / "bbbp_smiles.json")
+    partial = hf_results.jsonl_path(json_path)
+    writer = hf_results.JsonlResultWriter(partial)
+    hf_runner.run_task(tiny_model, tiny_tokenizer, "bbbp", "smiles", DATASET[:2], writer=writer)
+    writer.close()
+    hf_results.compact_results(partial, json_path, "org/tiny", result_format=result_format)
+    assert hf_results.done_indices(json_path) == {0, 1}
+    assert hf_results.result_complete(json_path, 2)
+    assert not hf_results.result_complete(json_path, 4)
+
+    hf_results.reopen_results(json_path)
+    writer = hf_results.JsonlResultWriter(partial, resume=True)
+    new = hf_runner.run_task(tiny_model, tiny_tokenizer, "bbbp", "smiles", DATASET, writer=writer)
+    writer.close()
+    assert [r["index"] for r in new] == [2, 3]
+    results = hf_results.compact_results(partial, json_path, "org/tiny", result_format=result_format)
+    assert [r["index"] for r in results] == [0, 1, 2, 3]
+    assert [r["index"] for r in hf_results.read_results(json_path)] == [0, 1, 2, 3]
+
+
+def test_dry_run_resume_reports_compacted_files(tmp_path, monkeypatch, capsys):
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "bbbp.json").write_text(json.dumps(DATASET))
+    (tmp_path / "results").mkdir()
+    rows = [{"index": i, "rawResponse": "yes", "parsed": None} for i in range(len(DATASET))]
+    (tmp_path / "results" / "bbbp_smiles_tiny.json").write_text(json.dumps({"model": "org/tiny", "results": rows}))
+    (tmp_path / "results" / "bbbp_code_tiny.json").write_text(json.dumps({"model": "org/tiny", "results": rows[:3]}))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("sys.argv", ["hf_runner.py", "--model", "org/tiny", "--task", "bbbp", "--dry-run", "--resume"])
+    hf_runner.main()
+    out = capsys.readouterr().out
+    assert "Skipping bbbp/smiles (complete: results/bbbp_smiles_tiny.json)" in out
+    assert "bbbp/code: resume (3 rows done)" in out
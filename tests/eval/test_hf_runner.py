@@ -0,0 +1,180 @@
+import pytest
+
+hf_runner = pytest.importorskip("hf_runner")
+
+DATASET = [
+    {"smiles": "CCO", "code": "const molecule1 = Linear(['C', 'C', 'O']);"},
+    {"smiles": "c1ccccc1C(=O)OCC", "code": "const molecule1 = Ring({ atoms: 'c', size: 6 });"},
+    {"smiles": "N", "code": "const molecule1 = Linear(['N']);"},
+]
+
+
+def test_length_buckets_sorts_by_token_length(tiny_tokenizer):
+    prompts = {0: "a" * 30, 1: "a", 2: "a" * 10}
+    assert hf_runner.length_buckets(tiny_tokenizer, prompts, 2) == [[1, 2], [0]]
+
+
+def test_batched_run_task_keeps_index_order(tiny_model, tiny_tokenizer, short_generation):
+    results = hf_runner.run_task(tiny_model, tiny_tokenizer, "bbbp", "smiles", DATASET, batch_size=2)
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert all(isinstance(r["rawResponse"], str) for r in results)
+
+
+def test_batch_error_is_isolated_to_its_row(tiny_model, tiny_tokenizer, short_generation, monkeypatch):
+    def flaky_generate_batch(model, tokenizer, prompts, *args):
+        if any("CCO" in p for p in prompts):
+            raise RuntimeError("bad row")
+        return ["yes"] * len(prompts)
+
+    monkeypatch.setattr(hf_runner, "generate_batch", flaky_generate_batch)
+    results = hf_runner.run_task(tiny_model, tiny_tokenizer, "bbbp", "smiles", DATASET, batch_size=3)
+    assert results[0] == {"index": 0, "error": "bad row", "parsed": None}
+    assert [r["rawResponse"] for r in results[1:]] == ["yes", "yes"]
+
+
+def test_relabel_feeds_task_prompt(tiny_model, tiny_tokenizer, short_generation):
+    results = hf_runner.run_task(tiny_model, tiny_tokenizer, "hbond", "code+relabel", DATASET, batch_size=2)
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert all("relabeled" in r for r in results)
+
+
+def test_relabel_store_is_shared_across_tasks(tiny_model, tiny_tokenizer, short_generation, tmp_path, monkeypatch):
+    store = hf_runner.RelabelStore("org/tiny", hf_runner.generation_params(), str(tmp_path))
+    first = hf_runner.run_task(tiny_model, tiny_tokenizer, "bbbp", "code+relabel", DATASET, relabel_store=store)
+
+    calls = []
+    real_generate_many = hf_runner.generate_many
+    monkeypatch.setattr(hf_runner, "generate_many", lambda *a, **kw: calls.append(kw["desc"]) or real_generate_many(*a, **kw))
+    reloaded = hf_runner.RelabelStore("org/tiny", hf_runner.generation_params(), str(tmp_path))
+    second = hf_runner.run_task(tiny_model, tiny_tokenizer, "hbond", "code+relabel", DATASET, relabel_store=reloaded)
+
+    assert calls == ["hbond/code+relabel"]
+    assert [r["relabeled"] for r in second] == [r["relabeled"] for r in first]
+
+
+def test_relabel_store_evicts_on_param_change(tmp_path):
+    store = hf_runner.RelabelStore("org/tiny", {"temperature": 0.1}, str(tmp_path))
+    store.put("CCO", "const ethanol = Linear(['C', 'C', 'O']);")
+    store.save()
+    assert hf_runner.RelabelStore("org/tiny", {"temperature": 0.1}, str(tmp_path)).get("CCO") is not None
+    assert hf_runner.RelabelStore("org/tiny", {"temperature": 0.7}, str(tmp_path)).get("CCO") is None
+
+
+def test_loglik_scoring_records_candidate_probs(tiny_model, tiny_tokenizer):
+    results = hf_runner.run_task(tiny_model, tiny_tokenizer, "bbbp", "smiles", DATASET, scoring="loglik")
+    for r in results:
+        assert set(r["candidateProbs"]) == {"yes", "no"}
+        assert sum(r["candidateProbs"].values()) == pytest.approx(1.0)
+        assert r["rawResponse"] == max(r["candidateProbs"], key=r["candidateProbs"].get)
+
+
+def test_score_candidates_matches_sequential_logprobs(tiny_model, tiny_tokenizer):
+    import torch
+
+    prompt = "How many aromatic rings?"
+    # "1" is a token prefix of "12"; the end-of-turn token keeps it from absorbing the longer answer.
+    probs = hf_runner.score_candidates(tiny_model, tiny_tokenizer, prompt, ["1", "12"])
+    prompt_ids = tiny_tokenizer(hf_runner.chat_text(tiny_tokenizer, prompt)).input_ids
+
+    totals = []
+    for candidate in ["1", "12"]:
+        ids = tiny_tokenizer(candidate, add_special_tokens=False).input_ids + [tiny_tokenizer.eos_token_id]
+        with torch.no_grad():
+            logits = tiny_model(torch.tensor([prompt_ids + ids])).logits[0]
+        logprobs = torch.log_softmax(logits, dim=-1)
+        totals.append(sum(logprobs[len(prompt_ids) - 1 + k, t] for k, t in enumerate(ids)))
+    expected = torch.softmax(torch.stack(totals), dim=0).tolist()
+    assert [probs["1"], probs["12"]] == pytest.approx(expected, abs=1e-5)
+
+    # Without the terminator "1", a token prefix of "12", could never score below it.
+    unterminated = []
+    for candidate in ["1", "12"]:
+        ids = tiny_tokenizer(candidate, add_special_tokens=False).input_ids
+        with torch.no_grad():
+            logits = tiny_model(torch.tensor([prompt_ids + ids])).logits[0]
+        logprobs = torch.log_softmax(logits, dim=-1)
+        unterminated.append(sum(logprobs[len(prompt_ids) - 1 + k, t] for k, t in enumerate(ids)))
+    assert unterminated[0] >= unterminated[1]
+    assert [probs["1"], probs["12"]] != pytest.approx(torch.softmax(torch.stack(unterminated), dim=0).tolist(), abs=1e-5)
+
+
+def test_prefix_cache_matches_full_prefill(tiny_model, tiny_tokenizer, monkeypatch):
+    monkeypatch.setattr(hf_runner, "generation_params", lambda: {"max_new_tokens": 6, "do_sample": False})
+    prompts = [hf_runner.get_prompt("func-group", "smiles", row, molecule_last=True) for row in DATASET]
+    prefix = hf_runner.PrefixCache(tiny_model, tiny_tokenizer, prompts)
+    stats = {"rows": 0, "decodeTokens": 0}
+
+    assert len(prefix.prefix_ids) > 100
+    cached = hf_runner.generate_batch(tiny_model, tiny_tokenizer, prompts, stats=stats, prefix=prefix)
+    assert cached == [hf_runner.generate(tiny_model, tiny_tokenizer, p) for p in prompts]
+    assert stats["prefillTokensSaved"] == 3 * len(prefix.prefix_ids)
+
+
+def test_prefix_cache_falls_back_for_unshared_prompts(tiny_model, tiny_tokenizer):
+    prefix = hf_runner.PrefixCache(tiny_model, tiny_tokenizer, ["Count rings in CCO", "Count rings in CCN"])
+    assert prefix.inputs(tiny_tokenizer, [hf_runner.chat_text(tiny_tokenizer, "Other")], tiny_model.device) is None
+
+
+def test_records_carry_perf(tiny_model, tiny_tokenizer, short_generation):
+    results = hf_runner.run_task(tiny_model, tiny_tokenizer, "hbond", "code+relabel", DATASET, batch_size=2)
+    for r in results:
+        for perf in (r["perf"], r["relabelPerf"]):
+            assert perf["promptTokens"] > 0
+            assert 0 < perf["generatedTokens"] <= 8
+            assert perf["prefillMs"] > 0 and perf["peakMemoryMb"] > 0
+
+
+@pytest.mark.parametrize("molecule_last", [False, True])
+def test_samples_share_one_prefill(tiny_model, tiny_tokenizer, monkeypatch, molecule_last):
+    monkeypatch.setattr(hf_runner, "generation_params", lambda: {"max_new_tokens": 6, "do_sample": False})
+    prompts = [hf_runner.get_prompt("hbond", "smiles", row, molecule_last) for row in DATASET]
+    prefix = hf_runner.PrefixCache(tiny_model, tiny_tokenizer, prompts) if molecule_last else None
+    perf = []
+
+    sampled = hf_runner.generate_batch(tiny_model, tiny_tokenizer, prompts, prefix=prefix, perf=perf, samples=3)
+    greedy = [hf_runner.generate(tiny_model, tiny_tokenizer, p) for p in prompts]
+    assert sampled == [[g] * 3 for g in greedy]
+    assert [p["generatedTokens"] for p in perf] == [18, 18, 18]
+
+
+def test_samples_are_stored_on_records(tiny_model, tiny_tokenizer, short_generation):
+    results = hf_runner.run_task(tiny_model, tiny_tokenizer, "bbbp", "smiles", DATASET, batch_size=2, samples=4)
+    for r in results:
+        assert len(r["samples"]) == 4 and r["rawResponse"] == r["samples"][0]
+
+
+def test_draft_model_keeps_greedy_output_and_logs_acceptance(tiny_model, tiny_tokenizer, monkeypatch):
+    import copy
+
+    from conftest import make_tiny_model
+
+    monkeypatch.setattr(hf_runner, "generation_params", lambda: {"max_new_tokens": 12, "do_sample": False})
+    prompt = hf_runner.get_prompt("bbbp", "code", DATASET[0])
+    greedy = hf_runner.generate(tiny_model, tiny_tokenizer, prompt)
+
+    # Weak draft: output must still match the target; an identical copy is always accepted.
+    weak_perf, same_perf = [], []
+    weak = make_tiny_model(tiny_tokenizer, seed=1, layers=1)
+    assert hf_runner.generate(tiny_model, tiny_tokenizer, prompt, perf=weak_perf, draft_model=weak) == greedy
+    same = copy.deepcopy(tiny_model)
+    assert hf_runner.generate(tiny_model, tiny_tokenizer, prompt, perf=same_perf, draft_model=same) == greedy
+    assert same_perf[0]["draftAcceptanceRate"] == 1
+    assert same_perf[0]["targetForwards"] < weak_perf[0]["targetForwards"]
+
+
+def test_draft_model_runs_rows_one_at_a_time(tiny_model, tiny_tokenizer, short_generation):
+    results = hf_runner.run_task(tiny_model, tiny_tokenizer, "hbond", "code+relabel", DATASET, batch_size=4,
+                                 draft_model=tiny_model)
+    assert all("draftForwards" in r["perf"] and "draftForwards" in r["relabelPerf"] for r in results)
+
+
+def test_decoding_flags_get_their_own_result_file():
+    default = hf_runner.result_filename("bbbp", "code+relabel", "qwen")
+    assert default == "results/bbbp_code-relabel_qwen.json"
+    assert hf_runner.result_filename("bbbp", "code+relabel", "qwen", constrain=True) == \
+        "results/bbbp_code-relabel_qwen_constrained.json"
+    assert hf_runner.result_filename("ring-count", "smiles", "qwen", samples=3, constrain=True,
+                                     stop_on_answer=True) == "results/ring-count_smiles_qwen_n3_constrained_stop.json"
+    # Log-likelihood scoring never decodes, so the flags do not apply.
+    assert hf_runner.result_filename("bbbp", "smiles", "qwen", "loglik", stop_on_answer=True) == \
+        "results/bbbp_smiles_qwen_loglik.json"
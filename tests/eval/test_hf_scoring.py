@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+hf_scoring = pytest.importorskip("hf_scoring")
+
+BBBP = [{"label": label} for label in ["yes", "no", "yes", "no", "yes", "no"]]
+
+
+def records(responses):
+    return [{"index": i, "rawResponse": r, "parsed": None} for i, r in enumerate(responses)]
+
+
+def test_parsers_match_the_js_parsers():
+    assert hf_scoring.parse_integer("There are **3** rings") == 3
+    assert hf_scoring.parse_integer("pi is 3.14") is None
+    assert hf_scoring.parse_yes_no("Some analysis\nno") == "no"
+    assert hf_scoring.parse_yes_no("Yes, it crosses. Well... maybe not: unknown") == "yes"
+    assert hf_scoring.parse_functional_groups("Groups:\nHydroxyl, amine") == ["amine", "hydroxyl"]
+    assert hf_scoring.parse_hbond("donors=2, acceptors=5") == {"hbd": 2, "hba": 5}
+    assert hf_scoring.parse_hbond("no numbers") is None
+    assert hf_scoring.majority_vote(["2", "3", "3", "nothing"], hf_scoring.parse_integer) == 3
+
+
+def test_weighted_auc_matches_pairwise_count():
+    score = np.array([0.9, 0.2, 0.6, 0.6, 0.1, 0.4])
+    label = np.array([1, 0, 1, 0, 1, 0], dtype=float)
+    pairs = [(p, n) for p in score[label == 1] for n in score[label == 0]]
+    expected = sum(1 if p > n else 0.5 if p == n else 0 for p, n in pairs) / len(pairs)
+    assert hf_scoring.auc(np.ones((1, 6)), score, label)[0] == pytest.approx(expected)
+
+    # Weights act like repeated rows.
+    W = np.array([[2, 1, 1, 1, 1, 1]], dtype=float)
+    repeated = hf_scoring.auc(np.ones((1, 7)), np.append(score, 0.9), np.append(label, 1))
+    assert hf_scoring.auc(W, score, label) == pytest.approx(repeated)
+
+
+def test_resample_counts_draw_every_row_count_once():
+    W = hf_scoring.resample_counts(5, 1000, np.random.default_rng(0))
+    assert W.shape == (1000, 5)
+    assert (W.sum(axis=1) == 5).all()
+
+
+def test_paired_bootstrap_against_smiles():
+    runs = {
+        "smiles": records(["yes", "no", "yes", "no", "yes", "no"]),
+        "code": records(["yes", "no", "yes", "no", "yes", "no"]),
+        "code+relabel": records(["no", "yes", "no", "yes", "no", "yes"]),
+    }
+    blocks = hf_scoring.bootstrap_task("bbbp", runs, BBBP, resamples=2000)
+    assert blocks["smiles"]["metrics"]["exactMatch"]["value"] == 1.0
+    assert blocks["smiles"]["metrics"]["auc"]["value"] == 1.0
+    assert "vsSmiles" not in blocks["smiles"]
+    same = blocks["code"]["vsSmiles"]["exactMatch"]
+    assert (same["diff"], same["ciLow"], same["ciHigh"]) == (0, 0, 0)
+    worse = blocks["code+relabel"]["vsSmiles"]["balancedAccuracy"]
+    assert worse["diff"] == -1.0 and worse["ciHigh"] < 0 and worse["pValue"] == 0
+
+
+def test_single_class_metrics_are_null_not_nan(tmp_path):
+    # The first rows of a --limit run can all share one label, leaving balanced accuracy and AUC undefined.
+    dataset = [{"label": "yes"}] * 4
+    runs = {"smiles": records(["yes", "no", "yes", "yes"]), "code": records(["yes"] * 4)}
+    blocks = hf_scoring.bootstrap_task("bbbp", runs, dataset, resamples=200)
+    for name in ("balancedAccuracy", "auc"):
+        assert blocks["smiles"]["metrics"][name] == {"value": None, "ciLow": None, "ciHigh": None}
+        assert blocks["code"]["vsSmiles"][name] == {"diff": None, "ciLow": None, "ciHigh": None, "pValue": None}
+    assert blocks["code"]["metrics"]["exactMatch"]["value"] == 1.0
+    # Strict JSON, as JSON.parse in the JS tools reads it.
+    json.loads(json.dumps(blocks, allow_nan=False))
+
+
+def test_score_all_extends_summary(tmp_path):
+    (tmp_path / "data").mkdir()
+    (tmp_path / "results").mkdir()
+    (tmp_path / "data" / "bbbp.json").write_text(json.dumps(BBBP))
+    for condition, responses in (("smiles", ["yes"] * 6), ("code-relabel", ["no"] * 6)):
+        (tmp_path / "results" / f"bbbp_{condition}.json").write_text(json.dumps({"results": records(responses)}))
+    (tmp_path / "results" / "summary.json").write_text(json.dumps({"bbbp": {"smiles": {"accuracy": 0.5}, "code": None}}))
+
+    hf_scoring.score_all(str(tmp_path / "results"), str(tmp_path / "data"), resamples=500)
+
+    summary = json.loads((tmp_path / "results" / "summary.json").read_text())
+    assert summary["bbbp"]["smiles"]["accuracy"] == 0.5
+    assert summary["bbbp"]["smiles"]["bootstrap"]["metrics"]["exactMatch"]["value"] == 0.5
+    assert summary["bbbp"]["code+relabel"]["bootstrap"]["vsSmiles"]["auc"]["diff"] == 0
+    assert summary["bbbp"]["code"] is None
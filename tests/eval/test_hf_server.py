@@ -0,0 +1,52 @@
+import asyncio
+import json
+
+import pytest
+
+hf_server = pytest.importorskip("hf_server")
+
+
+async def request(port, method, path, payload=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, data = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(data)
+
+
+def run_against_server(server, scenario):
+    async def main():
+        started = asyncio.get_running_loop().create_future()
+        task = asyncio.create_task(server.serve(port=0, ready=started.set_result))
+        port = (await started).sockets[0].getsockname()[1]
+        try:
+            return await scenario(port)
+        finally:
+            task.cancel()
+
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_share_a_batch(tiny_model, tiny_tokenizer, short_generation):
+    server = hf_server.BatchingServer(tiny_model, tiny_tokenizer, "org/tiny", batch_size=4, max_wait_ms=200)
+
+    async def scenario(port):
+        replies = await asyncio.gather(*[request(port, "POST", "/generate", {"prompt": f"ring {i}"}) for i in range(4)])
+        return replies, await request(port, "GET", "/health")
+
+    replies, (status, health) = run_against_server(server, scenario)
+    assert all(status == 200 and isinstance(body["text"], str) for status, body in replies)
+    assert health == {"model": "org/tiny", "batches": 1, "requests": 4}
+
+
+def test_bad_requests_get_errors(tiny_model, tiny_tokenizer):
+    server = hf_server.BatchingServer(tiny_model, tiny_tokenizer, "org/tiny")
+
+    async def scenario(port):
+        return await request(port, "POST", "/generate", {"text": "x"}), await request(port, "GET", "/nope")
+
+    (bad_status, _), (missing_status, _) = run_against_server(server, scenario)
+    assert (bad_status, missing_status) == (400, 404)
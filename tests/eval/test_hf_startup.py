@@ -0,0 +1,49 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+SRC = os.path.join(os.path.dirname(__file__), "..", "..", "src", "eval")
+HEAVY_MODULES = ["torch", "transformers", "tqdm", "numpy"]
+# Import + argument handling, excluding interpreter startup. Importing torch alone takes longer.
+STARTUP_BUDGET_SECONDS = 1.0
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {src!r})
+sys.argv = ["hf_runner.py", *{argv!r}]
+import hf_runner
+try:
+    hf_runner.main()
+except SystemExit:
+    pass
+print(json.dumps({{"seconds": time.perf_counter() - start,
+                  "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def startup(argv, cwd):
+    code = PROBE.format(src=os.path.abspath(SRC), argv=argv, heavy=HEAVY_MODULES)
+    out = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("argv", [
+    ["--help"],
+    ["--task", "no-such-task"],
+    ["--dry-run"],
+    ["--task", "bbbp", "--condition", "smiles", "--skip-existing"],
+    ["--task", "bbbp", "--matrix", "--dry-run"],
+    ["--task", "bbbp", "--plan"],
+], ids=["help", "bad-args", "dry-run", "all-skipped", "matrix-dry-run", "plan"])
+def test_paths_without_a_model_skip_heavy_imports(argv, tmp_path):
+    (tmp_path / "results").mkdir()
+    (tmp_path / "results" / "bbbp_smiles_qwen2.5-7b-instruct.json").write_text("{}")
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "bbbp.json").write_text(json.dumps([{"smiles": "CCO", "code": ""}]))
+    probe = startup(argv, str(tmp_path))
+    assert probe["heavy"] == []
+    assert probe["seconds"] < STARTUP_BUDGET_SECONDS
@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip("numpy")
+hf_tokens = pytest.importorskip("hf_tokens")
+hf_runner = pytest.importorskip("hf_runner")
+
+DATASET = [
+    {"smiles": "CCO", "code": "export const molecule1 = Linear(['C', 'C', 'O']);"},
+    {"smiles": "c1ccccc1C(=O)OCC", "code": "export const molecule1 = Ring({ atoms: 'c', size: 6 });"},
+    {"smiles": "N", "code": "export const molecule1 = Linear(['N']);"},
+]
+
+
+def test_table_matches_runtime_tokenization(tiny_tokenizer, tmp_path):
+    table = hf_tokens.load_or_build(tiny_tokenizer, "hbond", "code", DATASET, cache_dir=str(tmp_path))
+    assert len(table) == len(DATASET)
+    for i, row in enumerate(DATASET):
+        text = hf_runner.chat_text(tiny_tokenizer, hf_runner.get_prompt("hbond", "code", row))
+        assert table[i].tolist() == tiny_tokenizer(text).input_ids
+    assert table.stats()["rows"] == 3
+    assert table.stats()["max"] == max(len(table[i]) for i in range(3))
+
+
+def test_entry_is_reused_until_inputs_change(tiny_tokenizer, tmp_path):
+    first = hf_tokens.load_or_build(tiny_tokenizer, "hbond", "smiles", DATASET, cache_dir=str(tmp_path))
+    assert hf_tokens.load_or_build(tiny_tokenizer, "hbond", "smiles", DATASET, cache_dir=str(tmp_path)).path == first.path
+
+    changed = hf_tokens.load_or_build(tiny_tokenizer, "hbond", "smiles", DATASET[:2], cache_dir=str(tmp_path),
+                                      prune=True)
+    assert changed.path != first.path
+    assert not (tmp_path / first.path.split("/")[-1]).exists()
+    assert hf_tokens.load_or_build(tiny_tokenizer, "hbond", "code+relabel", DATASET, cache_dir=str(tmp_path)) is None
+
+
+def test_cached_ids_give_the_same_batch_as_the_tokenizer(tiny_tokenizer, tmp_path):
+    table = hf_tokens.load_or_build(tiny_tokenizer, "bbbp", "smiles", DATASET, cache_dir=str(tmp_path))
+    texts = [hf_runner.chat_text(tiny_tokenizer, hf_runner.get_prompt("bbbp", "smiles", row)) for row in DATASET]
+    tiny_tokenizer.padding_side = "left"
+    expected = tiny_tokenizer(texts, return_tensors="pt", padding=True)
+    padded = hf_runner.left_pad([table[i] for i in range(3)], tiny_tokenizer.pad_token_id, "cpu")
+    assert padded["input_ids"].tolist() == expected["input_ids"].tolist()
+    assert padded["attention_mask"].tolist() == expected["attention_mask"].tolist()
+
+
+def test_run_task_with_token_cache_matches_loglik(tiny_model, tiny_tokenizer, tmp_path):
+    expected = hf_runner.run_task(tiny_model, tiny_tokenizer, "bbbp", "smiles", DATASET, scoring="loglik")
+    cached = hf_runner.run_task(tiny_model, tiny_tokenizer, "bbbp", "smiles", DATASET, scoring="loglik",
+                                token_cache=str(tmp_path))
+    assert [r["candidateProbs"] for r in cached] == pytest.approx([r["candidateProbs"] for r in expected])
+    assert list(tmp_path.iterdir())
+
+
+def test_batched_generation_reads_cached_ids(tiny_model, tiny_tokenizer, short_generation, tmp_path):
+    results = hf_runner.run_task(tiny_model, tiny_tokenizer, "hbond", "code", DATASET, batch_size=2,
+                                 token_cache=str(tmp_path))
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert [r["perf"]["promptTokens"] for r in results] == [
+        len(tiny_tokenizer(hf_runner.chat_text(tiny_tokenizer, hf_runner.get_prompt("hbond", "code", row))).input_ids)
+        for row in DATASET
+    ]
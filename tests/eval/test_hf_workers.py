@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+hf_workers = pytest.importorskip("hf_workers")
+hf_runner = pytest.importorskip("hf_runner")
+from hf_results import JsonlResultWriter, compact_results  # noqa: E402
+
+DATASET = [{"smiles": s, "code": ""} for s in ["C", "CC", "CCO", "c1ccccc1", "N", "CCN", "O=C=O"]]
+OPTIONS = {"scoring": "loglik", "batch_size": 2}
+
+
+def test_split_cores_gives_each_worker_its_own_range():
+    assert hf_workers.split_cores(2, "0-3") == ["0,1", "2,3"]
+    assert hf_workers.split_cores(3, "0-1") == ["0", "1", "0,1"]
+
+
+def test_merge_shards_picks_up_leftovers(tmp_path):
+    writer = JsonlResultWriter(str(tmp_path / "bbbp_smiles.jsonl"), resume=True)
+    (tmp_path / "bbbp_smiles.jsonl.shard1").write_text(json.dumps({"index": 3, "rawResponse": "no", "parsed": None}) + "\n")
+    hf_workers.merge_shards(writer)
+    writer.close()
+    assert writer.done == {3}
+    assert not (tmp_path / "bbbp_smiles.jsonl.shard1").exists()
+
+
+def test_fresh_run_discards_leftover_shards(tiny_checkpoint, tmp_path):
+    path = str(tmp_path / "bbbp_smiles.jsonl")
+    (tmp_path / "bbbp_smiles.jsonl.shard0").write_text(json.dumps({"index": 0, "rawResponse": "no", "parsed": None}) + "\n")
+    writer = JsonlResultWriter(path)
+    pool = hf_workers.WorkerPool(1, tiny_checkpoint, "cpu", {"cpu_dtype": "float32"})
+    try:
+        pool.run("bbbp", "smiles", DATASET[:2], writer, OPTIONS)
+    finally:
+        writer.close()
+        pool.close()
+    results = compact_results(path, str(tmp_path / "bbbp_smiles.json"), tiny_checkpoint)
+    assert [r["index"] for r in results] == [0, 1]
+    assert all("candidateProbs" in r for r in results)
+
+
+def test_sharded_run_matches_single_process(tiny_checkpoint, tmp_path):
+    model, tokenizer = hf_runner.load_model(tiny_checkpoint, "cpu", cpu_dtype="float32")
+    expected = hf_runner.run_task(model, tokenizer, "bbbp", "smiles", DATASET, **OPTIONS)
+
+    path = str(tmp_path / "bbbp_smiles.jsonl")
+    writer = JsonlResultWriter(path)
+    pool = hf_workers.WorkerPool(2, tiny_checkpoint, "cpu", {"cpu_dtype": "float32"})
+    try:
+        pool.run("bbbp", "smiles", DATASET, writer, OPTIONS)
+    finally:
+        writer.close()
+        pool.close()
+
+    results = compact_results(path, str(tmp_path / "bbbp_smiles.json"), tiny_checkpoint)
+    assert [r["index"] for r in results] == list(range(len(DATASET)))
+    assert [r["candidateProbs"] for r in results] == pytest.approx([r["candidateProbs"] for r in expected], abs=1e-4)
+
+
+def test_failed_load_raises_instead_of_hanging(tmp_path):
+    with pytest.raises(RuntimeError, match="failed to load"):
+        hf_workers.WorkerPool(1, str(tmp_path / "no-such-model"), "cpu", {"cpu_dtype": "float32"})
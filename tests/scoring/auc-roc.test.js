@@ -1,5 +1,5 @@
 import { describe, it, expect } from "bun:test";
-import { binaryMetrics } from "../../src/scoring/auc-roc.js";
+import { binaryMetrics, aucRoc } from "../../src/scoring/auc-roc.js";
 
 describe("binaryMetrics", () => {
   it("computes perfect classification", () => {
@@ -50,3 +50,21 @@ describe("binaryMetrics", () => {
     });
   });
 });
+
+describe("aucRoc", () => {
+  it("is 1 when every positive outranks every negative", () => {
+    expect(aucRoc([0.9, 0.8, 0.2, 0.1], ["yes", "yes", "no", "no"])).toBe(1);
+  });
+
+  it("counts ties as half", () => {
+    expect(aucRoc([0.5, 0.5], ["yes", "no"])).toBe(0.5);
+  });
+
+  it("computes partial ranking", () => {
+    expect(aucRoc([0.9, 0.3, 0.6, 0.1], ["yes", "yes", "no", "no"])).toBe(0.75);
+  });
+
+  it("returns 0 without both classes", () => {
+    expect(aucRoc([0.9, 0.3], ["yes", "yes"])).toBe(0);
+  });
+});
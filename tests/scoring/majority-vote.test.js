@@ -0,0 +1,31 @@
+import { describe, it, expect } from "bun:test";
+import { majorityVote } from "../../src/scoring/majority-vote.js";
+import { parseInteger, parseHBond, parseYesNo } from "../../src/eval/parse-response.js";
+
+describe("majorityVote", () => {
+  it("picks the most common parsed answer", () => {
+    expect(majorityVote(["2", "The answer is 3", "3"], parseInteger)).toEqual({
+      parsed: 3,
+      voteShare: 2 / 3,
+    });
+  });
+
+  it("compares structured answers by value", () => {
+    const samples = ["donors=1, acceptors=2", "donors=1, acceptors=2", "donors=2, acceptors=2"];
+    expect(majorityVote(samples, parseHBond)).toEqual({
+      parsed: { hbd: 1, hba: 2 },
+      voteShare: 2 / 3,
+    });
+  });
+
+  it("breaks ties by first appearance and ignores parse failures", () => {
+    expect(majorityVote(["no", "???", "yes"], parseYesNo)).toEqual({
+      parsed: "no",
+      voteShare: 1 / 3,
+    });
+  });
+
+  it("returns null when nothing parses", () => {
+    expect(majorityVote(["hmm", "unsure"], parseInteger)).toEqual({ parsed: null, voteShare: 0 });
+  });
+});
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+pptx = pytest.importorskip("pptx")
+make_pptx = pytest.importorskip("make_pptx")
+
+
+def write_run(results, name, scores, **blocks):
+    (results / name).write_text(json.dumps({**blocks, "results": [], "scores": scores}))
+
+
+@pytest.fixture
+def results(tmp_path):
+    results = tmp_path / "results"
+    results.mkdir()
+    write_run(results, "ring-count_smiles.json", {"accuracy": 0.92, "total": 100})
+    write_run(results, "ring-count_code.json", {"accuracy": 0.76, "total": 100})
+    write_run(results, "bbbp_smiles_qwen2.5-7b-instruct.json", {"balancedAccuracy": 0.5, "total": 100},
+              model="Qwen/Qwen2.5-7B-Instruct")
+    return results
+
+
+def slide_names(path):
+    return [slide.name for slide in pptx.Presentation(str(path)).slides]
+
+
+def test_results_table_prefers_bootstrap_intervals(results):
+    (results / "summary.json").write_text(json.dumps({"ring-count": {"code": {"bootstrap": {"metrics": {
+        "exactMatch": {"value": 0.75, "ciLow": 0.66, "ciHigh": 0.83}}}}}}))
+    run = make_pptx.load_results(str(results))[""]
+    data, winners = make_pptx.results_table(run)
+    assert data[1] == ["Ring Count", "92%", "75% [66–83]", "—", "SMILES"]
+    assert winners == ["SMILES"]
+
+
+def test_undefined_bootstrap_metric_falls_back_to_js_score():
+    undefined = {"value": None, "ciLow": None, "ciHigh": None}
+    scores = {"balancedAccuracy": 0.5, "bootstrap": {"metrics": {"balancedAccuracy": undefined}}}
+    assert make_pptx.format_cell(make_pptx.headline("bbbp", scores)) == "50%"
+    assert make_pptx.headline("bbbp", {"bootstrap": {"metrics": {"balancedAccuracy": undefined}}}) is None
+
+
+def test_rebuilds_only_slides_whose_inputs_changed(results, tmp_path):
+    out = tmp_path / "deck.pptx"
+    first = make_pptx.build_deck(str(out), str(results))
+    assert slide_names(out) == first
+    assert "results:default" in first and "across-models" in first
+    assert make_pptx.build_deck(str(out), str(results)) == []
+
+    write_run(results, "bbbp_code_qwen2.5-7b-instruct.json", {"balancedAccuracy": 0.55, "total": 100})
+    assert make_pptx.build_deck(str(out), str(results)) == ["results:qwen2.5-7b-instruct", "across-models"]
+    assert slide_names(out) == first
+
+    (results / "bbbp_smiles_qwen2.5-7b-instruct.json").unlink()
+    (results / "bbbp_code_qwen2.5-7b-instruct.json").unlink()
+    assert make_pptx.build_deck(str(out), str(results)) == []
+    assert slide_names(out) == [k for k in first if k not in ("results:qwen2.5-7b-instruct", "across-models")]
+    assert len(make_pptx.build_deck(str(out), str(results), force=True)) == len(slide_names(out))